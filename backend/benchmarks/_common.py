@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# Benchmarks import the backend modules directly; the connectors only need
+# the URIs to be present, no server is contacted at import time.
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("REDIS_URI", "redis://localhost:6379")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Return p50/p95/p99/max of latency samples, in milliseconds"""
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1] * 1000,
+        "mean": statistics.fmean(ordered) * 1000,
+    }
+
+
+def report(title: str, rows: Dict[str, Dict[str, float]]) -> None:
+    """Print a small aligned table of benchmark results"""
+    print(f"\n{title}")
+    columns = list(next(iter(rows.values())).keys())
+    print(f"{'':<28}" + "".join(f"{c:>14}" for c in columns))
+    for name, values in rows.items():
+        print(f"{name:<28}" + "".join(f"{values[c]:>14.2f}" for c in columns))
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+class StandInRedis:
+    """
+    In-memory stand-in for the subset of redis.asyncio.Redis the backend
+    uses, with an optional simulated round-trip latency per command.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.commands = 0
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    async def _round_trip(self):
+        self.commands += 1
+        await asyncio.sleep(self.latency)
+
+    def _live(self, key: str) -> bool:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _get(self, key: str) -> Optional[Any]:
+        return self._data[key] if self._live(key) else None
+
+    def _set(self, key: str, value: Any, px: Optional[int] = None, nx: bool = False) -> bool:
+        if nx and self._live(key):
+            return False
+        self._data[key] = value.encode() if isinstance(value, str) else value
+        self._expires.pop(key, None)
+        if px is not None:
+            self._expires[key] = time.monotonic() + px / 1000
+        return True
+
+    def _pttl(self, key: str) -> int:
+        if not self._live(key):
+            return -2
+        expires_at = self._expires.get(key)
+        return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+
+    async def get(self, key):
+        await self._round_trip()
+        return self._get(key)
+
+    async def mget(self, keys):
+        await self._round_trip()
+        return [self._get(key) for key in keys]
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        await self._round_trip()
+        return self._set(key, value, px=px if ex is None else ex * 1000, nx=nx)
+
+    async def setex(self, key, seconds, value):
+        await self._round_trip()
+        return self._set(key, value, px=int(seconds * 1000))
+
+    async def pttl(self, key):
+        await self._round_trip()
+        return self._pttl(key)
+
+    async def delete(self, *keys):
+        await self._round_trip()
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    async def publish(self, channel, message):
+        await self._round_trip()
+        return 0
+
+    async def eval(self, script, numkeys, *args):
+        await self._round_trip()
+        return self._eval(script, numkeys, *args)
+
+    def _eval(self, script, numkeys, *args):
+        """The document cache's scripts, in Python"""
+        from src.services.cache_service import RELEASE_LEASE_SCRIPT, SET_IF_NEWER_SCRIPT
+        if script == RELEASE_LEASE_SCRIPT:
+            key, owner = args
+            if self._get(key) != owner.encode():
+                return 0
+            return int(self._data.pop(key, None) is not None)
+        if script == SET_IF_NEWER_SCRIPT:
+            key, version_key, version, seconds, value, info = args
+            current = self._get(version_key)
+            if current is not None and json.loads(current)["version"] > version:
+                return 0
+            self._set(key, value, px=int(seconds * 1000))
+            self._set(version_key, info, px=int(seconds * 1000))
+            return 1
+        raise NotImplementedError("StandInRedis does not run this script")
+
+    def _zincrby(self, key, amount, member):
+        scores = self._data.setdefault(key, {})
+        scores[member] = scores.get(member, 0) + amount
+        return scores[member]
+
+    def _zremrangebyscore(self, key, low, high):
+        scores = self._data.get(key, {})
+        low, high = float(low), float(high)
+        removed = [member for member, score in scores.items() if low <= score <= high]
+        for member in removed:
+            del scores[member]
+        return len(removed)
+
+    async def zscore(self, key, member):
+        await self._round_trip()
+        return self._data.get(key, {}).get(member)
+
+    def pipeline(self, transaction: bool = True):
+        return _StandInPipeline(self)
+
+    def expire_all(self):
+        """Drop every key, as if all TTLs ran out at once"""
+        self._data.clear()
+        self._expires.clear()
+
+
+class _StandInPipeline:
+    def __init__(self, redis: StandInRedis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        handler = {"get": self.redis._get, "pttl": self.redis._pttl,
+                   "setex": lambda key, seconds, value: self.redis._set(key, value, px=int(seconds * 1000)),
+                   "set": self.redis._set,
+                   "eval": self.redis._eval,
+                   "publish": lambda channel, message: 0,
+                   "zincrby": self.redis._zincrby,
+                   "zremrangebyscore": self.redis._zremrangebyscore}[name]
+
+        def queue(*args, **kwargs):
+            self.calls.append((handler, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        await self.redis._round_trip()
+        results = [handler(*args, **kwargs) for handler, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
+class StandInMongoHandler:
+    """In-memory stand-in for MongoHandler with a fixed latency per call"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.collections = {}
+        self.round_trips = 0
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+
+    async def insert_one(self, collection, document):
+        await self._round_trip()
+        self.collections.setdefault(collection, []).append(dict(document))
+        return "stand-in"
+
+    async def insert_many(self, collection, documents, ordered=False):
+        await self._round_trip()
+        self.collections.setdefault(collection, []).extend(dict(d) for d in documents)
+        return ["stand-in"] * len(documents)
+
+    @staticmethod
+    def _matches(doc, query):
+        # Equality and $in only
+        return all(
+            doc.get(key) in value["$in"] if isinstance(value, dict) else doc.get(key) == value
+            for key, value in query.items()
+        )
+
+    async def find_one(self, collection, query, projection=None):
+        await self._round_trip()
+        return next((d for d in self.collections.get(collection, []) if self._matches(d, query)), None)
+
+    async def find_many(self, collection, query, skip=0, limit=100, sort=None, projection=None):
+        await self._round_trip()
+        docs = [d for d in self.collections.get(collection, []) if self._matches(d, query)]
+        for key, direction in reversed(sort or []):
+            docs.sort(key=lambda d: (d.get(key) is not None, d.get(key)), reverse=direction < 0)
+        return docs[skip:skip + limit] if limit else docs[skip:]
+
+    async def update_one(self, collection, query, update):
+        await self._round_trip()
+        doc = next((d for d in self.collections.get(collection, []) if self._matches(d, query)), None)
+        if doc is None:
+            return False
+        doc.update(update)
+        return True
+
+    async def replace_many(self, collection, documents, key="id", version_key=None):
+        await self._round_trip()
+        current = {d[key]: d for d in self.collections.get(collection, [])}
+        skipped = [d[key] for d in documents
+                   if version_key and d[key] in current and current[d[key]][version_key] > d[version_key]]
+        documents = [d for d in documents if d[key] not in skipped]
+        replaced = {d[key] for d in documents}
+        stored = [d for d in self.collections.get(collection, []) if d[key] not in replaced]
+        self.collections[collection] = stored + [dict(d) for d in documents]
+        return skipped
+
+
+def stand_in_document_service(mongo_latency: float = 0.0, redis_latency: float = 0.0):
+    """A DocumentService wired to fresh stand-in Mongo and Redis instances"""
+    from src.services.cache_service import DocumentCache
+    from src.services.document_service import DocumentService
+    from src.services.history_service import HistoryService
+    from src.services.history_writer import HistoryWriter
+
+    mongo = StandInMongoHandler(mongo_latency)
+    cache = DocumentCache()
+    cache.redis_client = StandInRedis(redis_latency)
+    writer = HistoryWriter()
+    writer.mongo_handler = mongo
+    history = HistoryService()
+    history.mongo_handler = mongo
+    history.writer = writer
+    service = DocumentService()
+    service.cache = cache
+    service.mongo_handler = mongo
+    service.history_service = history
+    service.tag_service.redis_client = cache.redis_client
+    return service
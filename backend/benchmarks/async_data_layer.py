@@ -0,0 +1,102 @@
+"""
+p99 latency of concurrent requests through MongoHandler, before and after
+moving to the async driver.
+
+Stand-in collections emulate driver round trips: the "blocking" variant
+sleeps with time.sleep (what the sync pymongo client did inside our async
+handlers), the "async" variant awaits asyncio.sleep behind a bounded pool.
+A fraction of the queries are slow to show head-of-line blocking.
+
+    python -m benchmarks.async_data_layer
+"""
+import asyncio
+import random
+import time
+
+from benchmarks._common import percentiles, report
+from src.utils.database.mongo_handler import MongoHandler
+
+FAST_QUERY = 0.002
+SLOW_QUERY = 0.050
+SLOW_RATIO = 0.05
+REQUESTS = 400
+ARRIVAL_INTERVAL = 0.004
+POOL_SIZE = 50
+
+
+class _InsertResult:
+    inserted_id = "stand-in"
+
+
+class BlockingCollection:
+    def _round_trip(self):
+        time.sleep(SLOW_QUERY if random.random() < SLOW_RATIO else FAST_QUERY)
+
+    def find_one(self, query):
+        self._round_trip()
+        return {"id": 1}
+
+    def insert_one(self, document):
+        self._round_trip()
+        return _InsertResult()
+
+
+class BlockingHandler(MongoHandler):
+    """The pre-change handler: async signatures around blocking calls"""
+
+    def __init__(self):
+        self.db = {"documents": BlockingCollection()}
+
+    async def find_one(self, collection, query):
+        return self.db[collection].find_one(query)
+
+
+class AsyncCollection:
+    def __init__(self, pool: asyncio.Semaphore):
+        self.pool = pool
+
+    async def _round_trip(self):
+        async with self.pool:
+            await asyncio.sleep(SLOW_QUERY if random.random() < SLOW_RATIO else FAST_QUERY)
+
+    async def find_one(self, query):
+        await self._round_trip()
+        return {"id": 1}
+
+    async def insert_one(self, document):
+        await self._round_trip()
+        return _InsertResult()
+
+
+async def _run(handler: MongoHandler) -> list:
+    """Open-loop load: latency is measured from each request's arrival time"""
+    latencies = []
+    t0 = time.perf_counter()
+
+    async def request(arrival: float):
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+        await handler.find_one("documents", {"id": 1})
+        latencies.append(time.perf_counter() - arrival)
+
+    await asyncio.gather(*(request(t0 + i * ARRIVAL_INTERVAL) for i in range(REQUESTS)))
+    return latencies
+
+
+async def main():
+    random.seed(7)
+    blocking = await _run(BlockingHandler())
+
+    random.seed(7)
+    handler = MongoHandler.__new__(MongoHandler)
+    handler.db = {"documents": AsyncCollection(asyncio.Semaphore(POOL_SIZE))}
+    non_blocking = await _run(handler)
+
+    report(
+        f"{REQUESTS} find_one calls, one every {ARRIVAL_INTERVAL * 1000:.0f} ms (latency in ms)",
+        {"blocking (sync pymongo)": percentiles(blocking),
+         "async driver": percentiles(non_blocking)},
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+Throughput of the bulk endpoints against the single-item path, through
+DocumentService with stand-in Mongo and Redis that add a fixed latency per
+round trip.
+
+    python -m benchmarks.bulk_documents
+"""
+import asyncio
+
+from benchmarks._common import Timer, stand_in_document_service
+from src.models.document import Document
+
+DOCUMENTS = 500
+BATCH_SIZE = 100
+MONGO_LATENCY = 0.001
+REDIS_LATENCY = 0.0003
+
+
+def _documents():
+    return [
+        Document(id=i, title=f"Document {i}", content="lorem ipsum " * 200,
+                 version=1, tags=["bench"], created_at=None, updated_at=None)
+        for i in range(DOCUMENTS)
+    ]
+
+
+async def main():
+    rows = []
+
+    service = stand_in_document_service(MONGO_LATENCY, REDIS_LATENCY)
+    with Timer() as timer:
+        for document in _documents():
+            await service.create(document)
+    rows.append(("create (one by one)", DOCUMENTS / timer.elapsed))
+
+    service = stand_in_document_service(MONGO_LATENCY, REDIS_LATENCY)
+    payload = [document.model_dump() for document in _documents()]
+    with Timer() as timer:
+        for start in range(0, DOCUMENTS, BATCH_SIZE):
+            await service.create_many(payload[start:start + BATCH_SIZE])
+    rows.append((f"bulk create (batches of {BATCH_SIZE})", DOCUMENTS / timer.elapsed))
+
+    ids = [str(i) for i in range(DOCUMENTS)]
+    for label, read in (("get (one by one)", None), (f"batch get ({BATCH_SIZE} ids)", BATCH_SIZE)):
+        service.cache.local.clear()
+        service.cache.redis_client.expire_all()
+        with Timer() as timer:
+            if read is None:
+                for document_id in ids:
+                    await service.get(document_id)
+            else:
+                for start in range(0, DOCUMENTS, read):
+                    await service.get_many(ids[start:start + read])
+        rows.append((label + ", cold cache", DOCUMENTS / timer.elapsed))
+
+    print(f"\n{DOCUMENTS} documents, Mongo {MONGO_LATENCY * 1000:.1f} ms / Redis {REDIS_LATENCY * 1000:.1f} ms per round trip")
+    for label, rate in rows:
+        print(f"{label:<36} {rate:>10.0f} docs/sec")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
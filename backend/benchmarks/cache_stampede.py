@@ -0,0 +1,93 @@
+"""
+Thundering herd on an expired document key: Mongo lookups per expiry with
+the plain read-through path versus DocumentCache.get_or_load, for one and
+for several processes sharing the same Redis.
+
+    python -m benchmarks.cache_stampede
+"""
+import asyncio
+
+from benchmarks._common import StandInRedis
+from src.models.document import Document
+from src.services.cache_service import DocumentCache
+
+CONCURRENT_READERS = 500
+PROCESSES = 4
+MONGO_LATENCY = 0.020
+REDIS_LATENCY = 0.0005
+
+DOCUMENT = Document(id=1, title="Hot document", content="x" * 2048, version=1,
+                    tags=["hot"], created_at=None, updated_at=None)
+
+
+class StandInMongo:
+    def __init__(self):
+        self.queries = 0
+
+    async def find_one(self) -> Document:
+        self.queries += 1
+        await asyncio.sleep(MONGO_LATENCY)
+        return DOCUMENT
+
+
+def _cache(redis: StandInRedis) -> DocumentCache:
+    cache = DocumentCache()
+    cache.redis_client = redis
+    return cache
+
+
+async def naive(redis: StandInRedis, mongo: StandInMongo) -> None:
+    """The previous DocumentService.get: every miss queries Mongo"""
+    cache = _cache(redis)
+
+    async def read():
+        cached = await redis.get(cache.key(1))
+        if cached:
+            return Document.model_validate_json(cached)
+        document = await mongo.find_one()
+        await redis.setex(cache.key(1), 3600, document.model_dump_json())
+        return document
+
+    await asyncio.gather(*(read() for _ in range(CONCURRENT_READERS)))
+
+
+async def coalesced(redis: StandInRedis, mongo: StandInMongo, processes: int) -> None:
+    caches = [_cache(redis) for _ in range(processes)]
+    await asyncio.gather(*(
+        caches[i % processes].get_or_load(1, mongo.find_one)
+        for i in range(CONCURRENT_READERS)
+    ))
+
+
+async def early_refresh() -> None:
+    """Steady reads of a hot key whose Redis TTL is about to run out"""
+    redis, mongo = StandInRedis(REDIS_LATENCY), StandInMongo()
+    cache = _cache(redis)
+    cache.redis_ttl = 1
+    cache.local.ttl = 0
+    await cache.get_or_load(1, mongo.find_one)
+    for _ in range(600):
+        await cache.get_or_load(1, mongo.find_one)
+        await asyncio.sleep(0.005)
+    stats = cache.stats()
+    print(f"{'early refresh, 1 s TTL, 3 s of reads':<38} mongo queries: {mongo.queries:>4}   "
+          f"redis misses: {stats['redis']['misses']}   early refreshes: {stats['fill']['early_refreshes']}")
+
+
+async def main():
+    print(f"\n{CONCURRENT_READERS} concurrent reads of one expired key "
+          f"(Mongo {MONGO_LATENCY * 1000:.0f} ms)")
+    scenarios = [
+        ("naive read-through", lambda r, m: naive(r, m)),
+        ("single-flight, 1 process", lambda r, m: coalesced(r, m, 1)),
+        (f"single-flight, {PROCESSES} processes", lambda r, m: coalesced(r, m, PROCESSES)),
+    ]
+    for name, scenario in scenarios:
+        redis, mongo = StandInRedis(REDIS_LATENCY), StandInMongo()
+        await scenario(redis, mongo)
+        print(f"{name:<38} mongo queries: {mongo.queries:>4}   redis commands: {redis.commands:>5}")
+    await early_refresh()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,186 @@
+"""
+Load test for collaborative editing: `--editors` WebSocket clients per
+document against a running server (`--url`), each making a small random
+edit every 1/`--rate` seconds for `--duration` seconds.
+
+Editors are OT clients like a browser editor would be: one op in flight,
+edits made before its acknowledgement combined into the next op, and
+incoming ops transformed against both. Reports
+  - ack latency: op sent to its own acknowledgement in a broadcast batch
+  - fan-out latency: op sent to its arrival at every other editor
+  - ops per broadcast frame (how much the batching window coalesces)
+  - whether every editor and the persisted document end up identical,
+    and how many Mongo writes the session made for its ops
+
+    python -m benchmarks.collab_load [--url http://localhost:8000] [--editors 200] [--rate 1] [--duration 20]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import httpx
+from websockets.asyncio.client import connect
+
+from benchmarks._common import percentiles
+from src.utils.text_delta import apply_delta, compose_delta, delta_to_patch, patch_to_delta, transform_delta
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+# When each (client, seq) was sent, shared by the editors in this process
+SENT = {}
+
+
+class Editor:
+    def __init__(self, url: str, rng: random.Random, stats: dict):
+        self.url = url
+        self.rng = rng
+        self.stats = stats
+        self.seq = 0
+        self.outstanding = None
+        self.buffer = None
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.finished = False
+
+    async def run(self, stop: asyncio.Event, rate: float, started: asyncio.Event, done: asyncio.Event):
+        async with connect(self.url, max_size=None) as self.socket:
+            init = json.loads(await self.socket.recv())
+            self.client, self.revision, self.content = init["client"], init["revision"], init["content"]
+            receiver = asyncio.create_task(self.receive())
+            await started.wait()
+            while True:
+                await asyncio.sleep(self.rng.expovariate(rate))
+                if stop.is_set():
+                    break
+                await self.edit()
+            self.finished = True
+            # Keep receiving until every editor's ops have been broadcast
+            await done.wait()
+            receiver.cancel()
+
+    async def edit(self):
+        position = self.rng.randrange(len(self.content) + 1)
+        if self.rng.random() < 0.7 or position == len(self.content):
+            patch = [("insert", position, self.rng.choice(WORDS) + " ")]
+        else:
+            patch = [("delete", position, min(4, len(self.content) - position))]
+        delta = patch_to_delta(len(self.content), patch)
+        self.content = apply_delta(self.content, delta)
+        if self.outstanding is None:
+            await self.send(delta)
+        else:
+            self.buffer = delta if self.buffer is None else compose_delta(self.buffer, delta)
+            self.stats["combined"] += 1
+
+    async def send(self, delta):
+        self.seq += 1
+        self.outstanding = (self.seq, delta)
+        self.idle.clear()
+        SENT[(self.client, self.seq)] = time.perf_counter()
+        await self.socket.send(json.dumps({
+            "type": "op",
+            "revision": self.revision,
+            "seq": self.seq,
+            "ops": [{"op": op, "pos": pos, "text": arg} if op == "insert" else {"op": op, "pos": pos, "length": arg}
+                    for op, pos, arg in delta_to_patch(delta)],
+        }))
+        self.stats["sent"] += 1
+
+    async def receive(self):
+        async for message in self.socket:
+            frame = json.loads(message)
+            if frame["type"] != "ops":
+                self.stats["errors"] += 1
+                continue
+            now = time.perf_counter()
+            self.stats["frames"] += 1
+            self.stats["entries"] += len(frame["ops"])
+            for entry in frame["ops"]:
+                self.revision += 1
+                sent = SENT.get((entry["client"], entry["seq"]))
+                if entry["client"] == self.client and self.outstanding and entry["seq"] == self.outstanding[0]:
+                    self.stats["ack"].append(now - sent)
+                    self.outstanding = None
+                    continue
+                if sent is not None:
+                    self.stats["fanout"].append(now - sent)
+                delta = entry["delta"]
+                if self.outstanding is not None:
+                    delta, mine = transform_delta(delta, self.outstanding[1])
+                    self.outstanding = (self.outstanding[0], mine)
+                if self.buffer is not None:
+                    delta, self.buffer = transform_delta(delta, self.buffer)
+                self.content = apply_delta(self.content, delta)
+            if self.outstanding is None:
+                if self.buffer is not None:
+                    buffered, self.buffer = self.buffer, None
+                    await self.send(buffered)
+                else:
+                    self.idle.set()
+
+
+async def run_document(args, rng: random.Random):
+    document_id = uuid.uuid4().int % 10**9
+    content = "\n".join(" ".join(rng.choices(WORDS, k=12)) for _ in range(args.lines)) + "\n"
+    async with httpx.AsyncClient(base_url=args.url, timeout=30) as http:
+        response = await http.post("/v1/documents/", json={
+            "id": document_id, "title": "Load test", "content": content, "version": 1,
+            "tags": ["bench"], "created_at": None, "updated_at": None,
+        })
+        response.raise_for_status()
+
+        stats = {"sent": 0, "combined": 0, "frames": 0, "entries": 0, "errors": 0, "ack": [], "fanout": []}
+        url = args.url.replace("http", "ws", 1) + f"/v1/documents/{document_id}/ws"
+        editors = [Editor(url, random.Random(rng.random()), stats) for _ in range(args.editors)]
+        stop, started, done = asyncio.Event(), asyncio.Event(), asyncio.Event()
+        tasks = [asyncio.create_task(editor.run(stop, args.rate, started, done)) for editor in editors]
+        # Connect everyone before editing starts
+        while any(not hasattr(editor, "content") for editor in editors):
+            await asyncio.sleep(0.1)
+        began = time.perf_counter()
+        started.set()
+        await asyncio.sleep(args.duration)
+        stop.set()
+        elapsed = time.perf_counter() - began
+        while (not all(editor.finished and editor.idle.is_set() for editor in editors)
+               or len({editor.revision for editor in editors}) > 1):
+            await asyncio.sleep(0.1)
+        done.set()
+        await asyncio.gather(*tasks)
+
+        contents = {editor.content for editor in editors}
+        for _ in range(100):
+            stored = (await http.get(f"/v1/documents/{document_id}")).json()
+            if stored["content"] in contents:
+                break
+            await asyncio.sleep(0.1)
+    return stats, elapsed, len(contents) == 1, stored["content"] in contents, stored["version"] - 1
+
+
+async def main(args):
+    rng = random.Random(0)
+    print(f"{args.editors} editors per document, {args.rate:g} edits/s each, {args.duration}s, "
+          f"{args.lines} line document")
+    for document in range(args.documents):
+        stats, elapsed, converged, persisted, writes = await run_document(args, rng)
+        ack, fanout = percentiles(stats["ack"]), percentiles(stats["fanout"])
+        print(f"\nDocument {document + 1}: {stats['sent']:,} ops sent ({stats['sent'] / elapsed:,.0f}/s), "
+              f"{stats['combined']:,} edits combined while waiting for an ack, {stats['errors']} errors")
+        print(f"  ack latency      p50 {ack['p50']:8.1f} ms  p95 {ack['p95']:8.1f} ms  p99 {ack['p99']:8.1f} ms")
+        print(f"  fan-out latency  p50 {fanout['p50']:8.1f} ms  p95 {fanout['p95']:8.1f} ms  p99 {fanout['p99']:8.1f} ms")
+        print(f"  {stats['entries'] / max(stats['frames'], 1):.1f} ops per broadcast frame; "
+              f"editors converged: {converged}; persisted matches: {persisted}; "
+              f"{writes} Mongo writes for {stats['sent']:,} ops")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--documents", type=int, default=1)
+    parser.add_argument("--editors", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=1.0, help="Edits per second per editor")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--lines", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+"""
+Compression ratio and CPU cost of the stored-body codec, and the bytes it
+saves in Redis and in history snapshots.
+
+Documents are generated Markdown (headings, prose, lists and code blocks)
+so ratios are in the range real notes reach, not the best case of a
+repeated string.
+
+    python -m benchmarks.compression
+"""
+import asyncio
+import random
+import timeit
+
+import bson
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+from benchmarks._common import StandInRedis
+from src.models.document import Document
+from src.utils.compression import Codec, get_codec, zstandard
+
+WORDS = (
+    "sync document cursor version history cache index vector search redis mongo "
+    "latency batch shard replica commit merge branch token parser schema field"
+).split()
+SIZES = (("1 KB", 1024), ("16 KB", 16 * 1024), ("256 KB", 256 * 1024), ("1 MB", 1024 * 1024))
+
+
+def _markdown(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    while sum(map(len, parts)) < size:
+        kind = rng.random()
+        if kind < 0.1:
+            parts.append(f"\n## {' '.join(rng.choices(WORDS, k=4)).title()}\n\n")
+        elif kind < 0.3:
+            parts.append("".join(f"- {' '.join(rng.choices(WORDS, k=6))}\n" for _ in range(rng.randint(2, 5))))
+        elif kind < 0.4:
+            parts.append(f"```python\nresult = {rng.choice(WORDS)}({rng.randint(0, 999)})\n```\n")
+        else:
+            parts.append(" ".join(rng.choices(WORDS, k=rng.randint(20, 60))) + f" {rng.randint(0, 10**6)}.\n\n")
+    return "".join(parts)[:size]
+
+
+def _document(document_id: int, size: int) -> Document:
+    return Document(
+        id=document_id,
+        title=f"Document {document_id}",
+        content=_markdown(size, seed=document_id),
+        version=1,
+        tags=["bench"],
+        created_at="2024-01-01T00:00:00",
+        updated_at="2024-01-01T00:00:00"
+    )
+
+
+def codec_costs():
+    codecs = {"zlib": Codec(threshold=0, level=3, algorithm="zlib")}
+    if zstandard is not None:
+        codecs["zstd"] = Codec(threshold=0, level=3, algorithm="zstd")
+    print(f"{'size':<8} {'codec':<6} {'ratio':>7} {'compress us':>13} {'decompress us':>15}")
+    for label, size in SIZES:
+        data = _document(1, size).model_dump_json().encode()
+        number = 200 if size <= 16 * 1024 else 10
+        for name, codec in codecs.items():
+            encoded = codec.encode(data)
+            compress = min(timeit.repeat(lambda: codec.encode(data), number=number, repeat=3)) / number
+            decompress = min(timeit.repeat(lambda: codec.decode(encoded), number=number, repeat=3)) / number
+            print(f"{label:<8} {name:<6} {len(data) / len(encoded):>7.2f} "
+                  f"{compress * 1e6:>13.1f} {decompress * 1e6:>15.1f}")
+
+
+async def redis_bytes(documents, threshold: float) -> int:
+    from src.services.cache_service import DocumentCache
+
+    codec = get_codec()
+    codec.threshold, previous = threshold, codec.threshold
+    try:
+        cache = DocumentCache()
+        cache.redis_client = StandInRedis()
+        await cache.set_many(documents)
+        return sum(
+            len(value) for key, value in cache.redis_client._data.items()
+            if key.startswith("document:")
+        )
+    finally:
+        codec.threshold = previous
+
+
+def history_bytes(documents, codec: Codec) -> int:
+    return sum(
+        len(bson.encode({
+            "document_id": document.id,
+            "version": document.version,
+            "kind": "snapshot",
+            "content": codec.encode_text(document.content)
+        }))
+        for document in documents
+    )
+
+
+def main():
+    print(f"codec: {get_codec().algorithm} (zstandard installed: {zstandard is not None}), "
+          f"threshold {get_codec().threshold} bytes")
+    print("\nPer-document cost")
+    codec_costs()
+
+    # Sizes from short notes up to long design documents
+    rng = random.Random(7)
+    documents = [
+        _document(document_id, rng.choice((512, 2048, 8192, 32768, 131072)))
+        for document_id in range(200)
+    ]
+    plain = asyncio.run(redis_bytes(documents, float("inf")))
+    compressed = asyncio.run(redis_bytes(documents, get_codec().threshold))
+    print(f"\nRedis document values, {len(documents)} mixed-size documents")
+    print(f"uncompressed {plain / 1024:>10.1f} KB")
+    print(f"compressed   {compressed / 1024:>10.1f} KB   ({1 - compressed / plain:.0%} less)")
+
+    disabled = Codec(threshold=0, level=3, algorithm="none")
+    before, after = history_bytes(documents, disabled), history_bytes(documents, get_codec())
+    print("\nHistory snapshot entries (BSON)")
+    print(f"uncompressed {before / 1024:>10.1f} KB")
+    print(f"compressed   {after / 1024:>10.1f} KB   ({1 - after / before:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Small edits to large documents: PATCH with ranged ops against sending the
+whole document back (a full replace), through DocumentService with
+stand-in Mongo and Redis. Reports request bytes, server CPU per edit
+(body parsing, applying the edit, the history delta, cache write-through
+and search indexing), the part of it that differs between the two (body
+parsing, applying the edit and producing the history delta) and the size
+of the history delta each edit stores.
+
+The full replace runs the same service steps as PATCH, except that the
+client sends the new content and the history delta has to be diffed out
+of the old and new text.
+
+    python -m benchmarks.document_patch [--edits 50]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks._common import percentiles, stand_in_document_service
+from src.models.document import Document, DocumentPatch
+from src.utils.text_delta import apply_delta, compute_delta, patch_to_delta
+
+SIZES = [10 * 1024, 100 * 1024, 1024 * 1024]
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+
+
+def make_content(size: int, rng: random.Random) -> str:
+    lines = []
+    total = 0
+    while total < size:
+        line = " ".join(rng.choices(WORDS, k=12)) + "\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)
+
+
+def small_edit(content: str, rng: random.Random):
+    """Replace one word somewhere in the text: (position, deleted length, inserted text)"""
+    position = content.index(" ", rng.randrange(len(content) // 2)) + 1
+    length = content.index(" ", position) - position
+    return position, length, rng.choice(WORDS).upper()
+
+
+async def full_replace(service, document_id: str, body: bytes) -> Document:
+    """What a PUT of the whole document would cost in this service"""
+    document = Document.model_validate_json(body)
+    current = await service.get(document_id)
+    await service.mongo_handler.update_one(
+        service.collection,
+        {"id": current.id, "version": current.version},
+        document.model_dump()
+    )
+    await service.cache.set(document, invalidate_peers=True)
+    await service.add_to_history(document, current.content)
+    await service.search_service.index_document(document)
+    service.embedding_pipeline.enqueue(document)
+    return document
+
+
+async def run(size: int, edits: int, mode: str):
+    rng = random.Random(size)
+    service = stand_in_document_service()
+    document = Document(id=size, title="Large", content=make_content(size, rng), version=1,
+                        tags=["bench"], created_at=None, updated_at=None)
+    await service.create(document)
+    history = service.history_service.mongo_handler.collections.setdefault("document_history", [])
+
+    request_bytes, cpu, edit_cpu, delta_bytes = [], [], [], []
+    for _ in range(edits):
+        position, length, text = small_edit(document.content, rng)
+        if mode == "patch":
+            body = json.dumps({"version": document.version, "ops": [
+                {"op": "delete", "pos": position, "length": length},
+                {"op": "insert", "pos": position, "text": text},
+            ]}).encode()
+        else:
+            content = document.content[:position] + text + document.content[position + length:]
+            body = document.model_copy(update={"content": content, "version": document.version + 1}).model_dump_json().encode()
+        previous = document.content
+        started = time.process_time()
+        if mode == "patch":
+            patch = DocumentPatch.model_validate_json(body)
+            apply_delta(previous, patch_to_delta(len(previous), [(op.op, op.pos, op.text if op.op == "insert" else op.length) for op in patch.ops]))
+        else:
+            compute_delta(previous, Document.model_validate_json(body).content)
+        edit_cpu.append(time.process_time() - started)
+
+        started = time.process_time()
+        if mode == "patch":
+            document = await service.patch(str(document.id), DocumentPatch.model_validate_json(body))
+        else:
+            document = await full_replace(service, str(document.id), body)
+        cpu.append(time.process_time() - started)
+        request_bytes.append(len(body))
+        delta_bytes.append(len(json.dumps(history[-1].get("delta", ""))))
+    return sum(request_bytes) / edits, percentiles(cpu), percentiles(edit_cpu), sum(delta_bytes) / edits
+
+
+async def main(args):
+    print(f"{args.edits} one-word edits per document size")
+    print(f"{'':<20}{'request bytes':>15}{'CPU p50 ms':>12}{'CPU p99 ms':>12}"
+          f"{'edit+delta p50 ms':>19}{'history delta bytes':>21}")
+    for size in SIZES:
+        for mode in ("full replace", "patch"):
+            request, cpu, edit, delta = await run(size, args.edits, "patch" if mode == "patch" else "replace")
+            label = f"{size // 1024} KB {mode}"
+            print(f"{label:<20}{request:>15,.0f}{cpu['p50']:>12.2f}{cpu['p99']:>12.2f}"
+                  f"{edit['p50']:>19.3f}{delta:>21,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--edits", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
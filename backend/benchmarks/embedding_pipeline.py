@@ -0,0 +1,157 @@
+"""
+Embedding pipeline: hashing embedder throughput, backfill docs/sec through
+the pipeline into FAISS, enqueue-to-searchable lag under a steady write
+rate, and how much work content hashing saves when documents are enqueued
+again unchanged or with one paragraph edited. Ends with search latency
+and how often a document is the top hit for one of its own paragraphs.
+
+Mongo is the in-memory stand-in; the FAISS service runs in-process through
+httpx's ASGI transport.
+
+    python -m benchmarks.embedding_pipeline [--documents 2000] [--paragraphs 12] [--rate 100]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks._common import StandInMongoHandler, Timer, percentiles
+
+os.environ.setdefault("FAISS_SERVICE_URL", "http://faiss")
+os.environ.setdefault("FAISS_INDEX_DIR", tempfile.mkdtemp(prefix="faiss-bench-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+import faiss_service  # noqa: E402
+from src.models.document import Document  # noqa: E402
+from src.services.embedding_pipeline import EmbeddingPipeline  # noqa: E402
+from src.utils.chunking import chunk_text  # noqa: E402
+
+VOCABULARY = [f"term{i}" for i in range(5000)]
+
+
+def paragraph(rng: random.Random) -> str:
+    sentences = [" ".join(rng.choices(VOCABULARY, k=rng.randint(8, 16))).capitalize() + "." for _ in range(4)]
+    return " ".join(sentences)
+
+
+def make_documents(count: int, paragraphs: int, start_id: int = 0, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        Document(
+            id=start_id + i,
+            title=f"Document {start_id + i}",
+            content="\n\n".join(paragraph(rng) for _ in range(paragraphs)),
+            version=1,
+            tags=[],
+            created_at=None,
+            updated_at=None,
+        )
+        for i in range(count)
+    ]
+
+
+def counters(pipeline: EmbeddingPipeline):
+    return dict(pipeline.metrics)
+
+
+def delta(before, after, key):
+    return after[key] - before[key]
+
+
+async def drain(pipeline: EmbeddingPipeline) -> None:
+    """Wait until everything enqueued so far is indexed"""
+    await pipeline.stop()
+    await pipeline.start()
+
+
+async def main(args):
+    pipeline = EmbeddingPipeline()
+    pipeline.mongo_handler = StandInMongoHandler()
+    transport = httpx.ASGITransport(app=faiss_service.app)
+    pipeline.faiss_handler.client = httpx.AsyncClient(transport=transport, base_url="http://faiss", timeout=None)
+    await pipeline.start()
+
+    documents = make_documents(args.documents, args.paragraphs)
+    chunks = [chunk for document in documents[:500] for chunk in chunk_text(document.content, pipeline.chunk_chars)]
+    with Timer() as timer:
+        pipeline.embedder.embed(chunks)
+    print(f"{type(pipeline.embedder).__name__}: {len(chunks) / timer.elapsed:,.0f} chunks/s "
+          f"({pipeline.chunk_chars} chars, dimension {pipeline.embedder.dimension})")
+
+    before = counters(pipeline)
+    with Timer() as timer:
+        pipeline.enqueue_many(documents)
+        await drain(pipeline)
+    after = counters(pipeline)
+    total_chunks = delta(before, after, "chunks_embedded")
+    print(f"Backfill {args.documents} documents ({total_chunks} chunks): "
+          f"{args.documents / timer.elapsed:,.0f} docs/s, {total_chunks / timer.elapsed:,.0f} chunks/s")
+
+    # Steady arrivals of new documents; lag is enqueue -> upserted into FAISS
+    pipeline._lags.clear()
+    arrivals = make_documents(int(args.rate * args.seconds), args.paragraphs, start_id=args.documents, seed=1)
+    started = time.perf_counter()
+    for position, document in enumerate(arrivals):
+        delay = started + position / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        pipeline.enqueue(document)
+    await drain(pipeline)
+    lag = pipeline.stats()["lag_ms"]
+    print(f"Steady {args.rate} docs/s for {args.seconds}s: lag p50 {lag['p50']:.1f} ms, "
+          f"p99 {lag['p99']:.1f} ms, max {lag['max']:.1f} ms")
+
+    before = counters(pipeline)
+    with Timer() as timer:
+        pipeline.enqueue_many(documents)
+        await drain(pipeline)
+    after = counters(pipeline)
+    skipped = delta(before, after, "chunks_skipped")
+    embedded = delta(before, after, "chunks_embedded")
+    print(f"Re-enqueue unchanged: {skipped / max(skipped + embedded, 1):.1%} of chunks skipped, "
+          f"{args.documents / timer.elapsed:,.0f} docs/s")
+
+    rng = random.Random(2)
+    edited = []
+    for document in documents:
+        paragraphs = document.content.split("\n\n")
+        paragraphs[rng.randrange(len(paragraphs))] = paragraph(rng)
+        edited.append(document.model_copy(update={"content": "\n\n".join(paragraphs), "version": 2}))
+    before = counters(pipeline)
+    with Timer() as timer:
+        pipeline.enqueue_many(edited)
+        await drain(pipeline)
+    after = counters(pipeline)
+    skipped = delta(before, after, "chunks_skipped")
+    embedded = delta(before, after, "chunks_embedded")
+    print(f"One paragraph edited: {embedded / max(skipped + embedded, 1):.1%} of chunks re-embedded, "
+          f"{args.documents / timer.elapsed:,.0f} docs/s")
+
+    samples, top_hits = [], 0
+    probes = rng.sample(edited, min(200, len(edited)))
+    for document in probes:
+        query = rng.choice(document.content.split("\n\n"))
+        with Timer() as timer:
+            matches = await pipeline.search(query, 10)
+        samples.append(timer.elapsed)
+        top_hits += bool(matches) and matches[0][0] == document.id
+    latency = percentiles(samples)
+    print(f"Search k=10: p50 {latency['p50']:.2f} ms, p99 {latency['p99']:.2f} ms, "
+          f"own document first for {top_hits / len(probes):.1%} of paragraph queries")
+
+    await pipeline.stop()
+    await pipeline.faiss_handler.client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--paragraphs", type=int, default=12)
+    parser.add_argument("--rate", type=float, default=100, help="Steady-phase writes per second")
+    parser.add_argument("--seconds", type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""
+FAISS index types on a synthetic clustered dataset: build time (including
+deferred training), recall@k against exact search, /search_batch QPS and
+serialized bytes per vector, at several nprobe / efSearch settings.
+
+Requests run in-process through httpx's ASGI transport.
+
+    python -m benchmarks.faiss_index_types [--vectors 100000] [--dimension 64] [--queries 1000] [--k 10]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+
+os.environ.setdefault("FAISS_INDEX_DIR", tempfile.mkdtemp(prefix="faiss-bench-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+import faiss  # noqa: E402
+import faiss_service  # noqa: E402
+
+NLIST = 256
+
+# (label, create_index params, search option, values to sweep)
+CONFIGS = [
+    ("Flat", {"index_type": "Flat"}, None, [None]),
+    ("IVF", {"index_type": "IVF", "nlist": NLIST}, "nprobe", [1, 8, 32]),
+    ("IVFSQ8", {"index_type": "IVFSQ8", "nlist": NLIST}, "nprobe", [1, 8, 32]),
+    ("IVFPQ", {"index_type": "IVFPQ", "nlist": NLIST, "m": 16}, "nprobe", [1, 8, 32]),
+    ("OPQ+IVFPQ", {"index_type": "IVFPQ", "nlist": NLIST, "m": 16, "opq": "true"}, "nprobe", [1, 8, 32]),
+    ("HNSWFlat", {"index_type": "HNSWFlat", "hnsw_m": 32}, "ef_search", [16, 64, 128]),
+]
+
+
+def clustered(rng, count: int, dimension: int, centers: np.ndarray) -> np.ndarray:
+    """Points scattered around random cluster centres, closer to real embeddings than uniform noise"""
+    labels = rng.integers(0, len(centers), count)
+    return (centers[labels] + rng.normal(scale=0.15, size=(count, dimension))).astype(np.float32)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.random((1000, args.dimension), dtype=np.float32)
+    data = clustered(rng, args.vectors, args.dimension, centers)
+    queries = clustered(rng, args.queries, args.dimension, centers)
+    exact = faiss.IndexFlatL2(args.dimension)
+    exact.add(data)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{args.vectors} x {args.dimension} clustered vectors, {args.queries} queries, recall@{args.k}")
+    print(f"{'index':<11} {'build s':>8} {'bytes/vec':>10} {'setting':>14} {'recall':>7} {'QPS':>8}")
+    transport = httpx.ASGITransport(app=faiss_service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://faiss", timeout=None) as client:
+        for label, params, option, values in CONFIGS:
+            name = f"bench_{label.lower().replace('+', '_')}"
+            await client.delete("/delete_index", params={"index_name": name})
+            started = time.perf_counter()
+            response = await client.post("/create_index", params={"index_name": name, "dimension": args.dimension, **params})
+            response.raise_for_status()
+            response = await client.post("/add_vectors_binary", params={"index_name": name},
+                                         files={"vectors": ("vectors.f32", data.tobytes())})
+            response.raise_for_status()
+            build = time.perf_counter() - started
+            bytes_per_vector = len(faiss.serialize_index(faiss_service.indexes[name])) / args.vectors
+
+            for value in values:
+                found = []
+                started = time.perf_counter()
+                for offset in range(0, args.queries, 100):
+                    body = {"index_name": name, "query_vectors": queries[offset:offset + 100].tolist(), "k": args.k}
+                    if option is not None:
+                        body[option] = value
+                    response = await client.post("/search_batch", json=body)
+                    response.raise_for_status()
+                    found.extend([hit["id"] for hit in row] for row in response.json()["results"])
+                qps = args.queries / (time.perf_counter() - started)
+                recall = np.mean([len(set(ids) & set(expected)) / args.k for ids, expected in zip(found, truth.tolist())])
+                setting = f"{option}={value}" if option else "exact"
+                print(f"{label:<11} {build:>8.2f} {bytes_per_vector:>10.1f} {setting:>14} {recall:>7.3f} {qps:>8.0f}")
+
+            await client.delete("/delete_index", params={"index_name": name})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
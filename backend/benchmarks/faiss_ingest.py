@@ -0,0 +1,84 @@
+"""
+Ingest throughput of the FAISS service: JSON `/add_vectors` against the
+binary `/add_vectors_binary` endpoint with raw float32 and `.npy` bodies.
+
+Requests go through an in-process TestClient, so the numbers include the
+client encoding the body and the server parsing it, but no network.
+
+    python -m benchmarks.faiss_ingest [--count 10000] [--dimension 768]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+
+os.environ.setdefault("FAISS_INDEX_DIR", tempfile.mkdtemp(prefix="faiss-bench-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import faiss_service  # noqa: E402
+
+
+def _json_request(client, index_name, vectors, ids, metadata):
+    body = json.dumps({"vectors": vectors.tolist(), "ids": ids.tolist(), "metadata": metadata})
+    return client.post(
+        "/add_vectors",
+        params={"index_name": index_name},
+        content=body,
+        headers={"Content-Type": "application/json"}
+    )
+
+
+def _raw_request(client, index_name, vectors, ids, metadata):
+    return client.post("/add_vectors_binary", params={"index_name": index_name}, files={
+        "vectors": ("vectors.f32", vectors.astype("<f4").tobytes()),
+        "ids": ("ids.i64", ids.astype("<i8").tobytes()),
+        "metadata": ("metadata.ndjson", "\n".join(map(json.dumps, metadata))),
+    })
+
+
+def _npy_request(client, index_name, vectors, ids, metadata):
+    vectors_npy, ids_npy = io.BytesIO(), io.BytesIO()
+    np.save(vectors_npy, vectors.astype("<f4"))
+    np.save(ids_npy, ids.astype("<i8"))
+    return client.post("/add_vectors_binary", params={"index_name": index_name}, files={
+        "vectors": ("vectors.npy", vectors_npy.getvalue()),
+        "ids": ("ids.npy", ids_npy.getvalue()),
+        "metadata": ("metadata.ndjson", "\n".join(map(json.dumps, metadata))),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--dimension", type=int, default=768)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.random((args.count, args.dimension), dtype=np.float32)
+    ids = np.arange(args.count, dtype=np.int64)
+    metadata = [{"document_id": int(i), "chunk": 0} for i in ids]
+
+    print(f"{args.count} vectors of dimension {args.dimension}")
+    with TestClient(faiss_service.app) as client:
+        for name, send in (("json", _json_request), ("binary raw", _raw_request), ("binary npy", _npy_request)):
+            index_name = f"bench_{name.replace(' ', '_')}"
+            client.delete("/delete_index", params={"index_name": index_name})
+            client.post("/create_index", params={"index_name": index_name, "dimension": args.dimension})
+            started = time.perf_counter()
+            response = send(client, index_name, vectors, ids, metadata)
+            elapsed = time.perf_counter() - started
+            response.raise_for_status()
+            print(f"{name:<12} {args.count / elapsed:>12.0f} vectors/sec   ({elapsed:.2f} s)")
+            client.delete("/delete_index", params={"index_name": index_name})
+
+
+if __name__ == "__main__":
+    main()
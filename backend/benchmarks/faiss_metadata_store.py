@@ -0,0 +1,116 @@
+"""
+Per-vector metadata storage in the FAISS service: the old inline JSON
+dict against the SQLite metadata store, at 1M and 10M entries. Reports
+write time, file size, load time and resident memory after loading
+(each in a fresh subprocess), a 1000-id bulk get and a filter match.
+
+The JSON dict needs several GB of memory at 10M entries, so it is only
+run up to --max-json entries. Memory is read from /proc (Linux only).
+
+    python -m benchmarks.faiss_metadata_store [--entries 1000000 10000000] [--max-json 2000000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+
+FAISS_SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service")
+sys.path.insert(0, FAISS_SERVICE_DIR)
+
+from metadata_store import MetadataStore  # noqa: E402
+
+CHUNK = 100_000
+
+PROBE = textwrap.dedent("""
+    import json, random, sys, time
+
+    def rss_mb():
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+
+    kind, path, entries = sys.argv[1], sys.argv[2], int(sys.argv[3])
+    ids = random.Random(0).sample(range(entries), 1000)
+    baseline = rss_mb()
+    started = time.perf_counter()
+    if kind == "json":
+        with open(path) as f:
+            metadata = json.load(f)["metadata"]
+        load = time.perf_counter() - started
+        started = time.perf_counter()
+        found = {i: metadata[str(i)] for i in ids if str(i) in metadata}
+        get = time.perf_counter() - started
+        started = time.perf_counter()
+        matched = [int(i) for i, meta in metadata.items() if meta["owner"] == "u7"]
+        match = time.perf_counter() - started
+    else:
+        from metadata_store import MetadataStore
+        store = MetadataStore(path)
+        load = time.perf_counter() - started
+        started = time.perf_counter()
+        found = store.get_many(ids)
+        get = time.perf_counter() - started
+        started = time.perf_counter()
+        matched = store.match({"owner": "u7"})
+        match = time.perf_counter() - started
+    assert len(found) == 1000 and len(matched) == entries // 1000
+    print(json.dumps({"load": load, "rss": rss_mb() - baseline, "get": get, "match": match}))
+""")
+
+
+def entry(i: int) -> dict:
+    return {"owner": f"u{i % 1000}", "tags": ["even" if i % 2 == 0 else "odd", f"t{i % 7}"], "doc": f"document-{i}"}
+
+
+def probe(kind: str, path: str, entries: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, kind, path, str(entries)],
+        env={**os.environ, "PYTHONPATH": FAISS_SERVICE_DIR}, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--max-json", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="faiss-bench-")
+    print(f"{'store':<7} {'entries':>10} {'write s':>8} {'file MB':>8} {'load s':>8} {'RSS MB':>8} "
+          f"{'get 1000 ms':>12} {'match ms':>9}")
+    for entries in args.entries:
+        rows = []
+        if entries <= args.max_json:
+            path = os.path.join(directory, f"json_{entries}.metadata.json")
+            started = time.perf_counter()
+            with open(path, "w") as f:
+                json.dump({"metadata": {str(i): entry(i) for i in range(entries)}}, f)
+            rows.append(("json", path, time.perf_counter() - started))
+
+        path = os.path.join(directory, f"sqlite_{entries}.metadata.db")
+        store = MetadataStore(path)
+        started = time.perf_counter()
+        for start in range(0, entries, CHUNK):
+            ids = range(start, min(start + CHUNK, entries))
+            store.put_many(ids, (entry(i) for i in ids))
+        store.checkpoint()
+        store.close()
+        rows.append(("sqlite", path, time.perf_counter() - started))
+
+        for kind, path, write in rows:
+            result = probe(kind, path, entries)
+            print(f"{kind:<7} {entries:>10} {write:>8.1f} {os.path.getsize(path) / 2 ** 20:>8.0f} "
+                  f"{result['load']:>8.2f} {result['rss']:>8.0f} {result['get'] * 1000:>12.2f} {result['match'] * 1000:>9.2f}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Cost of persisting small appends to a growing FAISS index: rewriting the
+whole index after every add ("full") against the write-ahead log with
+background snapshots ("wal").
+
+    python -m benchmarks.faiss_persistence [--batches 200] [--batch-size 100] [--dimension 768]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+from benchmarks._common import percentiles
+
+os.environ.setdefault("FAISS_INDEX_DIR", tempfile.mkdtemp(prefix="faiss-bench-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import faiss_service  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dimension", type=int, default=768)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    batch_bytes = rng.random((args.batch_size, args.dimension), dtype=np.float32).tobytes()
+    print(f"{args.batches} appends of {args.batch_size} x {args.dimension} vectors (ms per append)")
+    print(f"{'mode':<6} {'first 20 p50':>13} {'last 20 p50':>12} {'total s':>9}")
+
+    for mode in ("full", "wal"):
+        faiss_service.PERSISTENCE_MODE = mode
+        with TestClient(faiss_service.app) as client:
+            index_name = f"bench_{mode}"
+            client.post("/create_index", params={"index_name": index_name, "dimension": args.dimension})
+            timings = []
+            started = time.perf_counter()
+            for _ in range(args.batches):
+                request_started = time.perf_counter()
+                client.post(
+                    "/add_vectors_binary",
+                    params={"index_name": index_name},
+                    files={"vectors": ("vectors.f32", batch_bytes)}
+                ).raise_for_status()
+                timings.append(time.perf_counter() - request_started)
+            total = time.perf_counter() - started
+            client.delete("/delete_index", params={"index_name": index_name})
+
+        first, last = percentiles(timings[:20])["p50"], percentiles(timings[-20:])["p50"]
+        print(f"{mode:<6} {first:>13.2f} {last:>12.2f} {total:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
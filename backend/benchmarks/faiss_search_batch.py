@@ -0,0 +1,106 @@
+"""
+FAISS search throughput: concurrent single-vector /search requests with
+micro-batching off and at several window sizes, and /search_batch.
+
+Requests run in-process through httpx's ASGI transport, so JSON encoding
+and routing are included but no network. With batching off the transport
+runs each request to completion in turn, so its latency column leaves out
+the queueing a real server would add under the same load; compare QPS.
+
+    python -m benchmarks.faiss_search_batch [--vectors 100000] [--dimension 128] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+from benchmarks._common import percentiles
+
+os.environ.setdefault("FAISS_INDEX_DIR", tempfile.mkdtemp(prefix="faiss-bench-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+import faiss_service  # noqa: E402
+from search_batcher import SearchBatcher  # noqa: E402
+
+INDEX = "bench_search"
+WINDOWS_MS = (0, 1, 2, 5, 10)
+
+
+async def single_queries(client, queries, concurrency: int, duration: float):
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post("/search", json={
+                "index_name": INDEX, "query_vector": queries[i % len(queries)], "k": 10
+            })
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+            i += concurrency
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    return len(latencies) / (time.perf_counter() - started), percentiles(latencies)
+
+
+async def batch_queries(client, queries, batch_size: int, duration: float):
+    done = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        response = await client.post("/search_batch", json={
+            "index_name": INDEX, "query_vectors": queries[:batch_size], "k": 10
+        })
+        response.raise_for_status()
+        done += batch_size
+    return done / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.random((args.vectors, args.dimension), dtype=np.float32)
+    queries = rng.random((1024, args.dimension), dtype=np.float32).tolist()
+
+    transport = httpx.ASGITransport(app=faiss_service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://faiss") as client:
+        await client.delete("/delete_index", params={"index_name": INDEX})
+        await client.post("/create_index", params={"index_name": INDEX, "dimension": args.dimension})
+        await client.post("/add_vectors_binary", params={"index_name": INDEX},
+                          files={"vectors": ("vectors.f32", data.tobytes())})
+
+        print(f"Flat index of {args.vectors} x {args.dimension}, {args.concurrency} concurrent clients, k=10")
+        print(f"{'window ms':<10} {'QPS':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+        for window in WINDOWS_MS:
+            faiss_service.search_batcher = (
+                SearchBatcher(faiss_service.run_search, window, faiss_service.SEARCH_MAX_BATCH) if window else None
+            )
+            qps, latency = await single_queries(client, queries, args.concurrency, args.duration)
+            mean_batch = faiss_service.search_batcher.report()["mean_batch"] if window else 1
+            print(f"{window:<10} {qps:>8.0f} {latency['p50']:>8.2f} {latency['p99']:>8.2f} {mean_batch:>11}")
+        faiss_service.search_batcher = None
+
+        print("\n/search_batch")
+        for batch_size in (1, 16, 64, 256):
+            qps = await batch_queries(client, queries, batch_size, args.duration)
+            print(f"batch of {batch_size:<4} {qps:>8.0f} queries/sec")
+
+        await client.delete("/delete_index", params={"index_name": INDEX})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+FAISS service startup time and resident memory with eager, lazy and
+memory-mapped index loading, plus the latency of the first search that
+has to load an index.
+
+Each mode runs in a fresh subprocess so resident memory is not shared.
+Memory is read from /proc, so this benchmark needs Linux.
+
+    python -m benchmarks.faiss_startup [--indexes 8] [--vectors 50000] [--dimension 128]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+import faiss
+import numpy as np
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+
+FAISS_SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service")
+
+PROBE = textwrap.dedent("""
+    import json
+    import time
+
+    def rss_mb():
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+
+    import faiss_service
+    from fastapi.testclient import TestClient
+
+    baseline = rss_mb()
+    started = time.perf_counter()
+    with TestClient(faiss_service.app) as client:
+        startup_ms = (time.perf_counter() - started) * 1000
+        after_startup = rss_mb()
+        started = time.perf_counter()
+        client.post("/search", json={"index_name": "bench_0", "query_vector": [0.0] * DIMENSION, "k": 10})
+        first_search_ms = (time.perf_counter() - started) * 1000
+        print(json.dumps({
+            "startup_ms": startup_ms,
+            "startup_rss_mb": after_startup - baseline,
+            "first_search_ms": first_search_ms,
+            "after_search_rss_mb": rss_mb() - baseline,
+        }))
+""")
+
+
+def build_indexes(directory: str, count: int, vectors: int, dimension: int):
+    rng = np.random.default_rng(0)
+    data = rng.random((vectors, dimension), dtype=np.float32)
+    for i in range(count):
+        index = faiss.IndexIDMap(faiss.IndexFlatL2(dimension))
+        index.add_with_ids(data, np.arange(vectors, dtype=np.int64))
+        faiss.write_index(index, os.path.join(directory, f"bench_{i}.index"))
+        with open(os.path.join(directory, f"bench_{i}.metadata.json"), "w") as f:
+            json.dump({"dimension": dimension, "index_type": "Flat", "count": vectors, "metadata": {}, "wal_lsn": 0}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--indexes", type=int, default=8)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=128)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="faiss-bench-")
+    build_indexes(directory, args.indexes, args.vectors, args.dimension)
+    total_mb = args.indexes * args.vectors * args.dimension * 4 / 2 ** 20
+    print(f"{args.indexes} Flat indexes of {args.vectors} x {args.dimension} ({total_mb:.0f} MB of vectors)")
+    print(f"{'mode':<8} {'startup ms':>11} {'startup RSS MB':>15} {'first search ms':>16} {'RSS after MB':>13}")
+
+    modes = {
+        "eager": {"FAISS_LAZY_LOAD": "false"},
+        "lazy": {"FAISS_LAZY_LOAD": "true"},
+        "mmap": {"FAISS_LAZY_LOAD": "true", "FAISS_MMAP_INDEXES": "true"},
+    }
+    for mode, env in modes.items():
+        result = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", PROBE.replace("DIMENSION", str(args.dimension))],
+            env={**os.environ, **env, "PYTHONPATH": FAISS_SERVICE_DIR, "FAISS_INDEX_DIR": directory},
+            capture_output=True, text=True, check=True
+        )
+        row = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{mode:<8} {row['startup_ms']:>11.1f} {row['startup_rss_mb']:>15.1f} "
+              f"{row['first_search_ms']:>16.1f} {row['after_search_rss_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
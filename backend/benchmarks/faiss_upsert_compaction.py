@@ -0,0 +1,134 @@
+"""
+FAISS vector mutations: upsert throughput by index type and batch size
+(against plain adds), then search latency on an HNSWFlat index before
+deletes, with tombstones, while a compaction rebuilds it and afterwards.
+
+Flat and IVF indexes remove replaced vectors with remove_ids; HNSWFlat
+tombstones them. During the compaction a client keeps searching and the
+p50/p99 of those searches is reported next to the rebuild time.
+
+Requests run in-process through httpx's ASGI transport.
+
+    python -m benchmarks.faiss_upsert_compaction [--vectors 100000] [--dimension 64] [--tombstones 0.2]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+
+os.environ.setdefault("FAISS_INDEX_DIR", tempfile.mkdtemp(prefix="faiss-bench-"))
+# Compaction is started explicitly below
+os.environ.setdefault("FAISS_COMPACT_TOMBSTONE_RATIO", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+import faiss_service  # noqa: E402
+
+BATCH_SIZES = (1, 100, 1000)
+CONFIGS = [
+    ("Flat", {"index_type": "Flat"}),
+    ("IVF", {"index_type": "IVF", "nlist": 256}),
+    ("HNSWFlat", {"index_type": "HNSWFlat", "hnsw_m": 32}),
+]
+
+
+async def create(client, name: str, params: dict, data: np.ndarray):
+    await client.delete("/delete_index", params={"index_name": name})
+    await client.post("/create_index", params={"index_name": name, "dimension": data.shape[1], **params})
+    response = await client.post("/add_vectors_binary", params={"index_name": name}, files={
+        "vectors": ("vectors.f32", data.tobytes()),
+    })
+    response.raise_for_status()
+
+
+async def write_rate(client, path: str, name: str, data: np.ndarray, batch: int, total: int, ids: bool) -> float:
+    """Vectors per second written through `path` in batches of `batch`"""
+    rng = np.random.default_rng(batch)
+    started = time.perf_counter()
+    for _ in range(total // batch):
+        chosen = rng.choice(len(data), batch, replace=False)
+        body = {"vectors": (data[chosen] + 0.01).tolist(), "ids": chosen.tolist() if ids else None}
+        (await client.post(path, params={"index_name": name}, json=body)).raise_for_status()
+    return total // batch * batch / (time.perf_counter() - started)
+
+
+async def search_latencies(client, name: str, queries: np.ndarray, until=None):
+    """Per-search seconds, over all queries or, with `until`, cycling through them until it is done"""
+    latencies = []
+    while True:
+        for query in queries:
+            started = time.perf_counter()
+            response = await client.post("/search", json={"index_name": name, "query_vector": query.tolist(), "k": 10})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+            if until is not None and until.done():
+                return latencies
+        if until is None:
+            return latencies
+
+
+def percentiles(latencies) -> str:
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return f"{p50:>8.2f} {p99:>8.2f}"
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=64)
+    parser.add_argument("--writes", type=int, default=2000, help="vectors written per batch size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--tombstones", type=float, default=0.2, help="fraction of the HNSW index deleted before compacting")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.random((args.vectors, args.dimension), dtype=np.float32)
+    queries = rng.random((args.queries, args.dimension), dtype=np.float32)
+
+    transport = httpx.ASGITransport(app=faiss_service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://faiss", timeout=None) as client:
+        print(f"{args.vectors} x {args.dimension} vectors, {args.writes} vectors written per batch size")
+        print(f"{'index':<9} {'batch':>6} {'add vec/s':>10} {'upsert vec/s':>13}")
+        for label, params in CONFIGS:
+            name = f"bench_upsert_{label.lower()}"
+            await create(client, name, params, data)
+            for batch in BATCH_SIZES:
+                writes = max(batch, min(args.writes, batch * 200))
+                added = await write_rate(client, "/add_vectors", name, data, batch, writes, ids=False)
+                upserted = await write_rate(client, "/upsert_vectors", name, data, batch, writes, ids=True)
+                print(f"{label:<9} {batch:>6} {added:>10.0f} {upserted:>13.0f}")
+            await client.delete("/delete_index", params={"index_name": name})
+
+        name = "bench_compaction"
+        await create(client, name, dict(CONFIGS[-1][1]), data)
+        print(f"\nHNSWFlat search latency, {args.tombstones:.0%} of vectors deleted before compacting")
+        print(f"{'phase':<20} {'p50 ms':>8} {'p99 ms':>8} {'searches':>9}")
+        latencies = await search_latencies(client, name, queries)
+        print(f"{'before deletes':<20} {percentiles(latencies)} {len(latencies):>9}")
+
+        deleted = rng.choice(args.vectors, int(args.vectors * args.tombstones), replace=False)
+        for offset in range(0, len(deleted), 10000):
+            await client.post("/delete_vectors", params={"index_name": name}, json={"ids": deleted[offset:offset + 10000].tolist()})
+        latencies = await search_latencies(client, name, queries)
+        print(f"{'with tombstones':<20} {percentiles(latencies)} {len(latencies):>9}")
+
+        started = time.perf_counter()
+        compaction = asyncio.ensure_future(client.post("/compact_index", params={"index_name": name}))
+        latencies = await search_latencies(client, name, queries, until=compaction)
+        (await compaction).raise_for_status()
+        rebuild = time.perf_counter() - started
+        print(f"{'during compaction':<20} {percentiles(latencies)} {len(latencies):>9}  ({rebuild:.1f} s rebuild)")
+
+        latencies = await search_latencies(client, name, queries)
+        print(f"{'after compaction':<20} {percentiles(latencies)} {len(latencies):>9}")
+        await client.delete("/delete_index", params={"index_name": name})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+FAISS service responsiveness while large adds are running: latency of
+/list_indexes (event loop only) and /search, with the blocking FAISS
+calls on worker pools of different sizes. Also prints the pool's
+per-operation queue wait and run time from /stats.
+
+Requests run in-process through httpx's ASGI transport.
+
+    python -m benchmarks.faiss_worker_pool [--vectors 200000] [--dimension 128] [--duration 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+from benchmarks._common import percentiles
+
+os.environ.setdefault("FAISS_INDEX_DIR", tempfile.mkdtemp(prefix="faiss-bench-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+import faiss  # noqa: E402
+import faiss_service  # noqa: E402
+from worker_pool import WorkerPool  # noqa: E402
+
+INDEX = "bench_pool"
+WORKERS = (1, 2, 4)
+
+
+async def timed(client, method: str, url: str, latencies: list, **kwargs):
+    started = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    response.raise_for_status()
+    latencies.append(time.perf_counter() - started)
+
+
+async def run(client, batch: bytes, queries, duration: float):
+    deadline = time.perf_counter() + duration
+    loop_latencies, search_latencies = [], []
+    added = 0
+
+    async def ingest():
+        nonlocal added
+        while time.perf_counter() < deadline:
+            await client.post("/add_vectors_binary", params={"index_name": INDEX},
+                              files={"vectors": ("vectors.f32", batch)})
+            added += 1
+
+    async def ping():
+        while time.perf_counter() < deadline:
+            await timed(client, "GET", "/list_indexes", loop_latencies)
+            await asyncio.sleep(0.005)
+
+    async def searcher(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            await timed(client, "POST", "/search", search_latencies, json={
+                "index_name": INDEX, "query_vector": queries[i % len(queries)], "k": 10
+            })
+            i += 4
+
+    await asyncio.gather(ingest(), ping(), *(searcher(offset) for offset in range(4)))
+    return added, percentiles(loop_latencies), percentiles(search_latencies)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dimension", type=int, default=128)
+    parser.add_argument("--batch", type=int, default=50000)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.random((args.vectors, args.dimension), dtype=np.float32)
+    batch = rng.random((args.batch, args.dimension), dtype=np.float32).tobytes()
+    queries = rng.random((256, args.dimension), dtype=np.float32).tolist()
+    cpus = os.cpu_count() or 1
+
+    transport = httpx.ASGITransport(app=faiss_service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://faiss", timeout=None) as client:
+        print(f"Flat index of {args.vectors} x {args.dimension}, adds of {args.batch} vectors, "
+              f"4 concurrent searchers, {cpus} CPUs")
+        print(f"{'workers':<8} {'adds':>5} {'loop p50':>9} {'loop p99':>9} {'search p50':>11} {'search p99':>11}")
+        reports = {}
+        for workers in WORKERS:
+            faiss_service.worker_pool = WorkerPool(workers)
+            faiss.omp_set_num_threads(max(1, cpus // workers))
+            await client.delete("/delete_index", params={"index_name": INDEX})
+            await client.post("/create_index", params={"index_name": INDEX, "dimension": args.dimension})
+            await client.post("/add_vectors_binary", params={"index_name": INDEX},
+                              files={"vectors": ("vectors.f32", data.tobytes())})
+
+            added, loop, search = await run(client, batch, queries, args.duration)
+            print(f"{workers:<8} {added:>5} {loop['p50']:>9.2f} {loop['p99']:>9.2f} "
+                  f"{search['p50']:>11.2f} {search['p99']:>11.2f}")
+            reports[workers] = (await client.get("/stats")).json()["operations"]
+
+        for workers, operations in reports.items():
+            print(f"\n{workers} worker(s), ms")
+            print(f"{'operation':<10} {'calls':>6} {'wait mean':>10} {'wait max':>9} {'exec mean':>10} {'exec max':>9}")
+            for operation, row in operations.items():
+                print(f"{operation:<10} {row['calls']:>6} {row['queue_wait_ms_mean']:>10.2f} {row['queue_wait_ms_max']:>9.2f} "
+                      f"{row['exec_ms_mean']:>10.2f} {row['exec_ms_max']:>9.2f}")
+
+        await client.delete("/delete_index", params={"index_name": INDEX})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+History storage size and reconstruction cost: full copies per version
+versus deltas with a snapshot every HISTORY_SNAPSHOT_INTERVAL versions.
+
+The workload is a ~20 KB Markdown document edited a few lines at a time.
+
+    python -m benchmarks.history_delta
+"""
+import random
+import time
+
+import bson
+
+from benchmarks._common import Timer
+from src.settings import BackendBaseSettings
+from src.utils.text_delta import compute_delta, apply_delta
+
+VERSIONS = 200
+LINES = 400
+
+
+def _edit(lines: list, rng: random.Random) -> list:
+    lines = list(lines)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randrange(len(lines))
+        action = rng.random()
+        if action < 0.6:
+            lines[position] = f"- edited item {rng.random():.6f} with some more words\n"
+        elif action < 0.8:
+            lines.insert(position, f"New paragraph {rng.random():.6f} added during editing.\n")
+        elif len(lines) > 1:
+            del lines[position]
+    return lines
+
+
+def main():
+    rng = random.Random(42)
+    interval = BackendBaseSettings.HISTORY_SNAPSHOT_INTERVAL
+    lines = [f"Line {i}: lorem ipsum dolor sit amet, consectetur adipiscing elit.\n" for i in range(LINES)]
+    versions = []
+    for _ in range(VERSIONS):
+        versions.append("".join(lines))
+        lines = _edit(lines, rng)
+
+    full_bytes = sum(len(bson.encode({"document_id": 1, "version": v, "content": c}))
+                     for v, c in enumerate(versions, 1))
+
+    entries = []
+    with Timer() as encode_timer:
+        for v, content in enumerate(versions, 1):
+            chain = (v - 1) % interval
+            if chain == 0:
+                entries.append({"document_id": 1, "version": v, "kind": "snapshot",
+                                "chain_length": 0, "content": content})
+            else:
+                entries.append({"document_id": 1, "version": v, "kind": "delta", "base_version": v - 1,
+                                "chain_length": chain, "delta": compute_delta(versions[v - 2], content)})
+    delta_bytes = sum(len(bson.encode(entry)) for entry in entries)
+
+    # Worst case reconstruction: the last delta before a snapshot
+    target = interval
+    with Timer() as replay_timer:
+        content = entries[0]["content"]
+        for entry in entries[1:target]:
+            content = apply_delta(content, entry["delta"])
+    assert content == versions[target - 1]
+
+    print(f"\n{VERSIONS} versions of a {len(versions[0]) / 1024:.1f} KB document, snapshot every {interval}")
+    print(f"full copies         {full_bytes / 1024:>10.1f} KB")
+    print(f"snapshots + deltas  {delta_bytes / 1024:>10.1f} KB  ({full_bytes / delta_bytes:.1f}x smaller)")
+    print(f"delta encode        {encode_timer.elapsed / VERSIONS * 1000:>10.3f} ms/version")
+    print(f"worst-case replay   {replay_timer.elapsed * 1000:>10.3f} ms ({target - 1} deltas)")
+
+
+if __name__ == "__main__":
+    main()
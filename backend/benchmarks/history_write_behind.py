@@ -0,0 +1,55 @@
+"""
+Create latency with synchronous history inserts versus write-behind
+batching, through DocumentService with stand-in Mongo and Redis.
+
+    python -m benchmarks.history_write_behind
+"""
+import asyncio
+import time
+
+from benchmarks._common import percentiles, report, stand_in_document_service
+from src.models.document import Document
+
+DOCUMENTS = 1000
+CONCURRENCY = 50
+MONGO_LATENCY = 0.002
+REDIS_LATENCY = 0.0003
+
+
+async def _run(mode: str):
+    service = stand_in_document_service(MONGO_LATENCY, REDIS_LATENCY)
+    writer = service.history_service.writer
+    writer.mode = mode
+    await writer.start()
+
+    gate = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def create(i: int):
+        document = Document(id=i, title=f"Document {i}", content="lorem ipsum " * 100,
+                            version=1, tags=[], created_at=None, updated_at=None)
+        async with gate:
+            started = time.perf_counter()
+            await service.create(document)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(create(i) for i in range(DOCUMENTS)))
+    await writer.stop()
+    history = service.mongo_handler.collections.get("document_history", [])
+    assert len(history) == DOCUMENTS, f"{mode}: {len(history)} history entries"
+    return latencies, writer.stats()
+
+
+async def main():
+    rows, stats = {}, {}
+    for mode in ("sync", "write_behind"):
+        latencies, stats[mode] = await _run(mode)
+        rows[mode] = percentiles(latencies)
+    report(f"{DOCUMENTS} creates, {CONCURRENCY} concurrent (latency in ms)", rows)
+    behind = stats["write_behind"]
+    print(f"\nwrite-behind: {behind['flushed']} entries in {behind['batches']} batches, "
+          f"max flush {behind['max_flush_ms']:.2f} ms, fallbacks {behind['backpressure_fallbacks']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
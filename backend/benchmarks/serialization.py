@@ -0,0 +1,61 @@
+"""
+Per-document serialization cost of the read paths, for a small document
+and a 1 MB document.
+
+Legacy paths are the pre-change chain: serialize_doc over the Mongo dict,
+Document(**doc) / parse_raw, then jsonable_encoder + json.dumps for the
+response. New paths validate with the compiled pydantic-core validators
+and serialize with model_dump_json, and cache hits send the stored bytes.
+
+    python -m benchmarks.serialization
+"""
+import json
+import timeit
+import warnings
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+import benchmarks._common  # noqa: F401  sets up the backend import path
+from src.models.document import Document
+from src.services.cache_service import CachedDocument
+from src.utils.serializers import serialize_doc
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+
+def _mongo_doc(content_bytes: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "id": 42,
+        "title": "Benchmark document",
+        "content": ("# Heading\n" + "lorem ipsum dolor sit amet " * (content_bytes // 27 + 1))[:content_bytes],
+        "version": 3,
+        "tags": ["bench", "markdown", "notes"],
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-02T00:00:00",
+    }
+
+
+def _paths(mongo_doc: dict):
+    projected = {key: value for key, value in mongo_doc.items() if key != "_id"}
+    raw = Document.model_validate(projected).model_dump_json().encode()
+    return {
+        "mongo read, legacy": lambda: json.dumps(jsonable_encoder(Document(**serialize_doc(mongo_doc)))).encode(),
+        "mongo read, compiled": lambda: Document.model_validate(projected).model_dump_json().encode(),
+        "cache hit, legacy": lambda: json.dumps(jsonable_encoder(Document.parse_raw(raw))).encode(),
+        "cache hit, raw bytes": lambda: CachedDocument(raw).raw,
+    }
+
+
+def main():
+    for label, size in (("1 KB", 1024), ("1 MB", 1024 * 1024)):
+        print(f"\n{label} document (microseconds per document)")
+        for name, path in _paths(_mongo_doc(size)).items():
+            number = 2000 if size < 65536 else 20
+            seconds = min(timeit.repeat(path, number=number, repeat=5)) / number
+            print(f"{name:<28} {seconds * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Tag-filtered listing and tag counts at scale, against a real MongoDB and
+Redis (MONGO_URI / REDIS_URI; a scratch collection and key are used and
+dropped afterwards).
+
+Seeds `--documents` documents with 1-3 Zipf-distributed tags, then:
+  - GET /v1/tags: the Redis sorted set read vs the $unwind/$group
+    aggregation it replaces, and the cost of keeping it current on writes
+  - GET /v1/documents/?tag=...: first and deep-cursor page latency for a
+    common, a mid and a rare tag, AND and OR of two tags, on the compound
+    (tags, id) index vs the single-field tags index (keys and documents
+    examined from explain)
+  - the page total: the counter vs count_documents
+
+    python -m benchmarks.tag_index [--documents 10000000] [--tags 1000]
+"""
+import argparse
+import asyncio
+import random
+import uuid
+
+from benchmarks._common import Timer, percentiles
+from src.services.document_service import DocumentService
+from src.services.tag_service import TagService
+from src.utils.cursor import encode_cursor
+
+SEED_BATCH = 10000
+REPEATS = 50
+
+
+def make_documents(start: int, count: int, tag_count: int, rng: random.Random):
+    weights = [1.0 / rank for rank in range(1, tag_count + 1)]
+    population = [f"tag{rank}" for rank in range(tag_count)]
+    return [
+        {
+            "id": document_id,
+            "title": f"Document {document_id}",
+            "content": "",
+            "version": 1,
+            "tags": list(dict.fromkeys(rng.choices(population, weights, k=rng.randint(1, 3)))),
+            "created_at": None,
+            "updated_at": None,
+        }
+        for document_id in range(start, start + count)
+    ]
+
+
+async def timed(call, repeats: int = REPEATS):
+    samples = []
+    for _ in range(repeats):
+        with Timer() as timer:
+            await call()
+        samples.append(timer.elapsed)
+    return percentiles(samples)
+
+
+async def examined(collection, query, hint):
+    plan = await collection.find(query).sort([("id", 1)]).limit(10).hint(hint).explain()
+    stats = plan["executionStats"]
+    return stats["totalKeysExamined"], stats["totalDocsExamined"]
+
+
+async def main(args):
+    suffix = uuid.uuid4().hex[:8]
+    service = DocumentService()
+    service.collection = f"bench_tag_documents_{suffix}"
+    tags = TagService()
+    tags.collection = service.collection
+    tags.key = f"bench:tags:counts:{suffix}"
+    service.tag_service = tags
+    collection = service.mongo_handler.db[service.collection]
+    rng = random.Random(0)
+
+    try:
+        record_seconds = 0.0
+        with Timer() as seed:
+            for start in range(0, args.documents, SEED_BATCH):
+                batch = make_documents(start, min(SEED_BATCH, args.documents - start), args.tags, rng)
+                await collection.insert_many(batch, ordered=False)
+                with Timer() as timer:
+                    await tags.record(added=[document["tags"] for document in batch])
+                record_seconds += timer.elapsed
+        print(f"Seeded {args.documents:,} documents in {seed.elapsed:.0f}s; keeping tag counts current "
+              f"cost {record_seconds * 1e6 / args.documents:.1f} us per created document")
+        with Timer() as build:
+            await collection.create_index([("tags", 1), ("id", 1)], name="tags_id")
+            await collection.create_index([("tags", 1)], name="tags_multikey")
+            await collection.create_index([("id", 1)], name="id_unique", unique=True)
+        print(f"Indexes built in {build.elapsed:.0f}s")
+
+        top = await timed(lambda: tags.top(100))
+        with Timer() as aggregation:
+            rebuilt = await tags.rebuild()
+        print(f"\nTag counts, top 100 of {rebuilt:,} tags: sorted set p50 {top['p50']:.2f} ms, "
+              f"p99 {top['p99']:.2f} ms; aggregation over every document {aggregation.elapsed * 1000:,.0f} ms")
+
+        ranked, _ = await tags.top(args.tags)
+        common, mid, rare = ranked[0][0], ranked[len(ranked) // 2][0], ranked[-1][0]
+        cases = {
+            f"common ({common})": ([common], "all"),
+            f"mid ({mid})": ([mid], "all"),
+            f"rare ({rare})": ([rare], "all"),
+            f"AND {ranked[0][0]}+{ranked[1][0]}": ([ranked[0][0], ranked[1][0]], "all"),
+            f"OR {mid}+{rare}": ([mid, rare], "any"),
+        }
+        # Deep pages start half way through the id range
+        middle = args.documents // 2
+        deep_cursor = encode_cursor({"id": middle})
+        print("\nListing, 10 per page (ms; keys/docs examined for the deep page)")
+        print(f"{'':<28}{'first p50':>11}{'deep p50':>10}{'deep p99':>10}{'(tags,id)':>16}{'(tags)':>18}")
+        for name, (filter_tags, match) in cases.items():
+            first = await timed(lambda: service.list_all(0, 10, None, "none", filter_tags, match))
+            deep = await timed(lambda: service.list_all(0, 10, deep_cursor, "none", filter_tags, match))
+            query = {"tags": {"$all" if match == "all" else "$in": filter_tags}, "id": {"$gt": middle}}
+            compound = await examined(collection, query, "tags_id")
+            single = await examined(collection, query, "tags_multikey")
+            print(f"{name:<28}{first['p50']:>11.2f}{deep['p50']:>10.2f}{deep['p99']:>10.2f}"
+                  f"{compound[0]:>9,}/{compound[1]:<6,}{single[0]:>11,}/{single[1]:<6,}")
+
+        count = await timed(lambda: tags.count(common))
+        with Timer() as exact:
+            total = await collection.count_documents({"tags": common})
+        print(f"\nTotal for {common} ({total:,} documents): counter p50 {count['p50']:.2f} ms, "
+              f"count_documents {exact.elapsed * 1000:,.0f} ms")
+    finally:
+        await collection.drop()
+        await tags.redis_client.delete(tags.key)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=10000000)
+    parser.add_argument("--tags", type=int, default=1000, help="Distinct tags")
+    asyncio.run(main(parser.parse_args()))
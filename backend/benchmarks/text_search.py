@@ -0,0 +1,189 @@
+"""
+Keyword search index on a synthetic corpus (Zipf-distributed words,
+1-3 tags per document): build docs/sec, memory and snapshot size,
+snapshot write and load time, query latency by query shape, and update
+throughput with a search every `--search-every` updates, which makes
+the index refresh and merge as it would under live traffic (small
+merges inline, large ones in a worker thread, like SearchService). A regex
+scan over every document body stands in for today's only option, a
+Mongo `$regex` collection scan.
+
+    python -m benchmarks.text_search [--documents 1000000] [--words 60] [--updates 20000]
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks._common import Timer, percentiles
+from src.services.search_service import INLINE_MERGE_DOCUMENTS
+from src.utils.inverted_index import (
+    InvertedIndex, analyze, load_snapshot, merge_segments, parse_query, write_snapshot
+)
+
+VOCABULARY_SIZE = 50000
+TAG_COUNT = 200
+BUILD_BATCH = 50000
+QUERIES = 200
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class Corpus:
+    def __init__(self, words_per_document: int, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.words = np.array([f"w{rank}x" for rank in range(VOCABULARY_SIZE)])
+        weights = 1.0 / np.arange(1, VOCABULARY_SIZE + 1) ** 1.05
+        self.word_p = weights / weights.sum()
+        tag_weights = 1.0 / np.arange(1, TAG_COUNT + 1)
+        self.tag_p = tag_weights / tag_weights.sum()
+        self.words_per_document = words_per_document
+
+    def documents(self, ids, version: int = 1):
+        count = len(ids)
+        content = self.words[self.rng.choice(VOCABULARY_SIZE, size=(count, self.words_per_document), p=self.word_p)]
+        titles = self.words[self.rng.choice(VOCABULARY_SIZE, size=(count, 5), p=self.word_p)]
+        tag_counts = self.rng.integers(1, 4, size=count)
+        tags = self.rng.choice(TAG_COUNT, size=(count, 3), p=self.tag_p)
+        for position, document_id in enumerate(ids):
+            yield (
+                int(document_id),
+                version,
+                " ".join(titles[position]),
+                " ".join(content[position]),
+                list(dict.fromkeys(f"tag{tag}" for tag in tags[position, :tag_counts[position]])),
+            )
+
+
+def timed_queries(index: InvertedIndex, queries, tags=(), facet_limit: int = 0):
+    samples = []
+    for query in queries:
+        terms, phrases = parse_query(query)
+        with Timer() as timer:
+            index.search(terms, phrases, list(tags), 10, facet_limit)
+        samples.append(timer.elapsed)
+    return percentiles(samples)
+
+
+def main(args):
+    corpus = Corpus(args.words)
+    index = InvertedIndex()
+    baseline = rss_mb()
+    bodies = []
+    analyze_seconds = build_seconds = 0.0
+    for start in range(0, args.documents, BUILD_BATCH):
+        batch = list(corpus.documents(range(start, min(start + BUILD_BATCH, args.documents))))
+        bodies.extend(document[3] for document in batch[::10])
+        with Timer() as timer:
+            analyzed = [analyze(*document) for document in batch]
+        analyze_seconds += timer.elapsed
+        with Timer() as timer:
+            for document in analyzed:
+                index.add(document)
+            index.refresh()
+            while index.merge():
+                pass
+        build_seconds += timer.elapsed
+    total = analyze_seconds + build_seconds
+    print(f"Build {args.documents:,} documents x {args.words} words: {args.documents / total:,.0f} docs/s "
+          f"(analyze {analyze_seconds:.1f}s, segments and merges {build_seconds:.1f}s), "
+          f"{len(index.segments)} segments")
+    arrays = sum(getattr(segment, key).nbytes for segment in index.segments for key in segment.ARRAYS)
+    print(f"Index arrays {arrays / 2**20:,.0f} MB; process RSS {rss_mb():,.0f} MB "
+          f"(+{rss_mb() - baseline:,.0f} MB, including the corpus and build garbage)")
+
+    directory = tempfile.mkdtemp(prefix="search-bench-")
+    try:
+        with Timer() as write:
+            write_snapshot(directory, index.snapshot_state())
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        with Timer() as load:
+            loaded = InvertedIndex(segments=load_snapshot(directory))
+        assert loaded.documents == index.documents
+        del loaded
+        print(f"Snapshot {size / 2**20:,.0f} MB: write {write.elapsed:.1f}s, load {load.elapsed:.1f}s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    rng = np.random.default_rng(1)
+
+    def ranked_words(low: int, high: int, count: int):
+        return [str(word) for word in corpus.words[rng.integers(low, high, size=count)]]
+
+    sample_bodies = [bodies[i].split() for i in rng.integers(0, len(bodies), size=QUERIES)]
+    shapes = {
+        "rare term": ranked_words(10000, VOCABULARY_SIZE, QUERIES),
+        "common term": ranked_words(0, 20, QUERIES),
+        "3 terms": [" ".join(words) for words in zip(*(ranked_words(0, 5000, QUERIES) for _ in range(3)))],
+        "2-word phrase": [f'"{words[i]} {words[i + 1]}"' for words, i in
+                          ((words, int(rng.integers(0, len(words) - 1))) for words in sample_bodies)],
+        "3-word phrase": [f'"{" ".join(words[i:i + 3])}"' for words, i in
+                          ((words, int(rng.integers(0, len(words) - 2))) for words in sample_bodies)],
+    }
+    rows = {name: timed_queries(index, queries) for name, queries in shapes.items()}
+    rows["3 terms + tag + facets"] = timed_queries(index, shapes["3 terms"], tags=["tag0"], facet_limit=20)
+    print(f"\nQuery latency over {index.documents:,} documents, top 10 (ms)")
+    print(f"{'':<26}{'p50':>9}{'p99':>9}{'max':>9}")
+    for name, row in rows.items():
+        print(f"{name:<26}{row['p50']:>9.2f}{row['p99']:>9.2f}{row['max']:>9.2f}")
+
+    word = shapes["rare term"][0]
+    pattern = re.compile(rf"\b{word}\b")
+    with Timer() as scan:
+        matches = sum(1 for body in bodies if pattern.search(body))
+    scan_ms = scan.elapsed * 1000 * len(range(0, args.documents)) / len(bodies)
+    print(f"\nRegex scan for one word: {scan_ms:,.0f} ms per {args.documents:,} documents "
+          f"(measured over {len(bodies):,}, {matches} matches)")
+
+    updates = list(corpus.documents(rng.integers(0, args.documents, size=args.updates), version=2))
+    for offset, document in enumerate(updates):
+        updates[offset] = (document[0], 2 + offset, *document[2:])
+    samples, background = [], []
+    pending = None
+    with Timer() as timer, ThreadPoolExecutor(max_workers=1) as executor:
+        for offset, document in enumerate(updates, start=1):
+            index.add(analyze(*document))
+            if offset % args.search_every == 0:
+                started = time.perf_counter()
+                index.search([shapes["3 terms"][offset % QUERIES].split()[0]], [], [], 10)
+                if pending is not None and pending[2].done():
+                    index.finish_merge(pending[0], pending[1], pending[2].result())
+                    background.append(time.perf_counter() - pending[3])
+                    pending = None
+                segments = index.merge_candidates()
+                if segments and sum(len(segment) for segment in segments) < INLINE_MERGE_DOCUMENTS:
+                    lives = index.begin_merge(segments)
+                    index.finish_merge(segments, lives, merge_segments(segments, lives))
+                elif segments and pending is None:
+                    lives = index.begin_merge(segments)
+                    merge_started = time.perf_counter()
+                    pending = (segments, lives, executor.submit(merge_segments, segments, lives), merge_started)
+                samples.append(time.perf_counter() - started)
+        if pending is not None:
+            index.finish_merge(pending[0], pending[1], pending[2].result())
+            background.append(time.perf_counter() - pending[3])
+    latency = percentiles(samples)
+    print(f"\n{args.updates:,} updates, search every {args.search_every}: {args.updates / timer.elapsed:,.0f} updates/s, "
+          f"refresh + search + merge p50 {latency['p50']:.2f} ms, p99 {latency['p99']:.2f} ms, "
+          f"{len(index.segments)} segments, {len(background)} background merges"
+          + (f" (max {max(background):.1f}s)" if background else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=1000000)
+    parser.add_argument("--words", type=int, default=60, help="Content words per document")
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--search-every", type=int, default=100)
+    main(parser.parse_args())
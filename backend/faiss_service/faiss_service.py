@@ -1,136 +1,986 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from starlette.datastructures import UploadFile
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 import numpy as np
 import faiss
 import os
 import json
+import asyncio
+import time
+import functools
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from wal import WriteAheadLog, ADD, DELETE, UPSERT
+from search_batcher import SearchBatcher
+from worker_pool import WorkerPool, RWLock
+from metadata_index import validate_filter, id_selector
+from metadata_store import MetadataStore
 
 app = FastAPI()
 
 # Directory to store FAISS indexes
-INDEX_DIR = "/app/faiss_indexes"
+INDEX_DIR = os.getenv("FAISS_INDEX_DIR", "/app/faiss_indexes")
 os.makedirs(INDEX_DIR, exist_ok=True)
 
-# In-memory storage of indexes and their metadata
+# Binary uploads are added to the index in chunks of about this many bytes
+INGEST_CHUNK_BYTES = int(os.getenv("FAISS_INGEST_CHUNK_BYTES", 8 * 1024 * 1024))
+NPY_MAGIC = b"\x93NUMPY"
+
+# "wal" appends each batch to a write-ahead log and snapshots in the
+# background; "full" rewrites the index files after every write
+PERSISTENCE_MODE = os.getenv("FAISS_PERSISTENCE_MODE", "wal")
+# A snapshot is taken when the WAL has pending records and either this many
+# seconds have passed since the last one or the WAL has reached WAL_MAX_BYTES
+SNAPSHOT_INTERVAL_S = float(os.getenv("FAISS_SNAPSHOT_INTERVAL_S", 60))
+WAL_MAX_BYTES = int(os.getenv("FAISS_WAL_MAX_BYTES", 256 * 1024 * 1024))
+WAL_FSYNC = os.getenv("FAISS_WAL_FSYNC", "true").lower() == "true"
+
+# Indexes are read on first use unless FAISS_LAZY_LOAD is false. With
+# FAISS_MMAP_INDEXES they are memory-mapped read-only until their first write.
+# When in-memory indexes exceed FAISS_MEMORY_BUDGET_BYTES (0 = no cap) the
+# least recently used ones are unloaded; they reload from snapshot and WAL.
+LAZY_LOAD = os.getenv("FAISS_LAZY_LOAD", "true").lower() == "true"
+MMAP_INDEXES = os.getenv("FAISS_MMAP_INDEXES", "false").lower() == "true"
+MEMORY_BUDGET_BYTES = int(os.getenv("FAISS_MEMORY_BUDGET_BYTES", 0))
+
+# Single-vector /search requests on the same index arriving within this
+# window are searched together (0 disables batching)
+SEARCH_BATCH_WINDOW_MS = float(os.getenv("FAISS_SEARCH_BATCH_WINDOW_MS", 0))
+SEARCH_MAX_BATCH = int(os.getenv("FAISS_SEARCH_MAX_BATCH", 256))
+
+# Filtered searches on HNSWFlat indexes scan the matching vectors directly
+# when the filter keeps fewer than 1 in this many
+HNSW_SCAN_SELECTIVITY = int(os.getenv("FAISS_HNSW_SCAN_SELECTIVITY", 20))
+# Ids of filter posting lists kept in memory per index
+METADATA_CACHE_IDS = int(os.getenv("FAISS_METADATA_CACHE_IDS", 4_000_000))
+
+# HNSWFlat indexes cannot remove vectors, so deleted and replaced ones are
+# tombstoned and skipped by searches. Once tombstones make up this fraction
+# of an index it is rebuilt in the background from its live vectors.
+COMPACT_TOMBSTONE_RATIO = float(os.getenv("FAISS_COMPACT_TOMBSTONE_RATIO", 0.2))
+
+# Searches, adds, training, index reads and serialization run on a pool of
+# FAISS_WORKER_THREADS threads. Each FAISS call uses FAISS_OMP_THREADS
+# OpenMP threads, by default the cores split evenly between the workers,
+# so concurrent calls do not oversubscribe the CPU.
+WORKER_THREADS = int(os.getenv("FAISS_WORKER_THREADS", min(4, os.cpu_count() or 1)))
+OMP_THREADS = int(os.getenv("FAISS_OMP_THREADS", max(1, (os.cpu_count() or 1) // WORKER_THREADS)))
+faiss.omp_set_num_threads(OMP_THREADS)
+worker_pool = WorkerPool(WORKER_THREADS)
+# Rebuilds get their own thread so they never hold up searches in the pool
+compaction_pool = WorkerPool(1)
+
+# In-memory storage of indexes and their metadata. Every known index has
+# an index_metadata entry; only loaded ones are in `indexes`.
 indexes = {}
 index_metadata = {}
+# Per-vector metadata and its inverted index, on disk; open for every known index
+metadata_stores: Dict[str, MetadataStore] = {}
+
+# Load time and size per index, loaded indexes in LRU order, loads in flight
+index_stats: Dict[str, Dict[str, Any]] = {}
+index_lru: "OrderedDict[str, None]" = OrderedDict()
+index_loads: Dict[str, asyncio.Future] = {}
+
+# Searches and snapshots hold an index's read lock, adds and deletes its
+# write lock; names of indexes still being built by create_index
+index_locks: Dict[str, RWLock] = {}
+index_creations = set()
+
+# Write-ahead logs and background snapshot state, per index
+wals: Dict[str, WriteAheadLog] = {}
+snapshot_tasks: Dict[str, asyncio.Task] = {}
+last_snapshot: Dict[str, float] = {}
+snapshot_loop_task: Optional[asyncio.Task] = None
+
+# Tombstoned positions (not ids: an upserted id is live at its new
+# position) of loaded indexes, and the changes made to an index while a
+# compaction rebuilds it, to be applied to the rebuilt copy
+tombstones: Dict[str, np.ndarray] = {}
+compactions: Dict[str, List[tuple]] = {}
+compaction_tasks: Dict[str, asyncio.Task] = {}
+NO_IDS = np.empty(0, dtype=np.int64)
 
 class VectorData(BaseModel):
     vectors: List[List[float]]
     ids: Optional[List[int]] = None
     metadata: Optional[List[Dict[str, Any]]] = None
 
+class VectorIds(BaseModel):
+    ids: List[int]
+
 class SearchQuery(BaseModel):
     index_name: str
     query_vector: List[float]
     k: int = 5
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    # Metadata field -> value, or list of accepted values
+    filter: Optional[Dict[str, Any]] = None
+
+class SearchBatchQuery(BaseModel):
+    index_name: str
+    query_vectors: List[List[float]]
+    k: int = 5
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    filter: Optional[Dict[str, Any]] = None
 
 @app.post("/create_index")
-async def create_index(index_name: str, dimension: int, index_type: str = "Flat"):
-    if index_name in indexes:
+async def create_index(
+    index_name: str,
+    dimension: int,
+    index_type: str = "Flat",
+    nlist: int = 100,
+    m: int = 8,
+    nbits: int = 8,
+    opq: bool = False,
+    hnsw_m: int = 32,
+    ef_construction: int = 40,
+    train_size: Optional[int] = None
+):
+    """
+    Create an index. `Flat` and `HNSWFlat` (with `hnsw_m` links per node)
+    are ready immediately. The IVF types use `nlist` lists: `IVF` stores
+    full vectors, `IVFSQ8` one byte per dimension and `IVFPQ` `m` codes of
+    `nbits` bits, optionally after an `opq` rotation. They are trained on
+    the first `train_size` vectors added; until then vectors are staged in
+    a flat index and searched exactly.
+    """
+    if index_name in index_metadata or index_name in index_creations:
         raise HTTPException(status_code=400, detail=f"Index '{index_name}' already exists")
+    try:
+        factory = index_factory_string(index_type, nlist, m, nbits, opq, hnsw_m)
+        index = new_index(dimension, factory, ef_construction)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        # FAISS rejects parameters that do not fit the dimension
+        raise HTTPException(status_code=400, detail=f"Invalid {index_type} parameters: {str(e).split('Error: ')[-1]}")
     
-    if index_type == "Flat":
-        index = faiss.IndexFlatL2(dimension)
-    elif index_type == "IVF":
-        quantizer = faiss.IndexFlatL2(dimension)
-        index = faiss.IndexIVFFlat(quantizer, dimension, 100)
-        index.train(np.random.random((1000, dimension)).astype(np.float32))
-    else:
-        raise HTTPException(status_code=400, detail=f"Unsupported index type: {index_type}")
+    trained = index.is_trained
+    if not trained:
+        minimum = max(nlist, 2 ** nbits if index_type == "IVFPQ" else 0)
+        # FAISS k-means wants at least 39 training points per centroid
+        train_size = train_size or 39 * minimum
+        if train_size < minimum:
+            raise HTTPException(status_code=400, detail=f"train_size must be at least {minimum} for {index_type}")
+        index = staging_index(dimension)
     
+    index_creations.add(index_name)
+    try:
+        await register_index(index_name, index, {
+            "dimension": dimension,
+            "index_type": index_type,
+            "factory": factory,
+            "trained": trained,
+            "train_size": None if trained else train_size,
+        })
+    finally:
+        index_creations.discard(index_name)
+    
+    return {"message": f"Created {index_type} index '{index_name}' with dimension {dimension}"}
+
+def index_factory_string(index_type: str, nlist: int, m: int, nbits: int, opq: bool, hnsw_m: int) -> str:
+    if opq and index_type != "IVFPQ":
+        raise ValueError("opq is only supported with IVFPQ")
+    if index_type == "Flat":
+        # IndexFlatL2 alone does not support add_with_ids
+        return "IDMap,Flat"
+    if index_type == "HNSWFlat":
+        return f"IDMap,HNSW{hnsw_m},Flat"
+    if index_type in ("IVF", "IVFFlat"):
+        return f"IVF{nlist},Flat"
+    if index_type == "IVFSQ8":
+        return f"IVF{nlist},SQ8"
+    if index_type == "IVFPQ":
+        return f"{f'OPQ{m},' if opq else ''}IVF{nlist},PQ{m}x{nbits}"
+    raise ValueError(f"Unsupported index type: {index_type}")
+
+def new_index(dimension: int, factory: str, ef_construction: int = 40):
+    index = faiss.index_factory(dimension, factory)
+    if "HNSW" in factory:
+        faiss.downcast_index(index.index).hnsw.efConstruction = ef_construction
+    return index
+
+def staging_index(dimension: int):
+    """Holds the vectors of an untrained index until there are enough to train it"""
+    return faiss.IndexIDMap(faiss.IndexFlatL2(dimension))
+
+def needs_training(index_name: str) -> bool:
+    meta = index_metadata[index_name]
+    return not meta.get("trained", True) and meta["count"] >= meta["train_size"]
+
+def train_index(index_name: str):
+    """Train an index on a sample of its staged vectors, then move them all into it"""
+    meta = index_metadata[index_name]
+    staging = indexes[index_name]
+    vectors = staging.index.reconstruct_n(0, staging.ntotal)
+    ids = faiss.vector_to_array(staging.id_map)
+    sample = vectors
+    if len(vectors) > meta["train_size"]:
+        sample = vectors[np.random.default_rng(0).choice(len(vectors), meta["train_size"], replace=False)]
+    index = new_index(meta["dimension"], meta["factory"])
+    index.train(sample)
+    index.add_with_ids(vectors, ids)
+    indexes[index_name] = index
+    meta["trained"] = True
+    index_stats[index_name]["resident_bytes"] = len(ids) * bytes_per_vector(index)
+    print(f"Trained index '{index_name}' on {len(sample)} of {len(ids)} vectors")
+
+def bytes_per_vector(index) -> int:
+    """Approximate memory per stored vector: its code, its id and any graph links"""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexPreTransform)):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.downcast_index(index.storage).code_size + 8 + index.hnsw.nb_neighbors(0) * 4
+    return index.code_size + 8
+
+async def register_index(index_name: str, index, settings: Dict[str, Any]):
     indexes[index_name] = index
     index_metadata[index_name] = {
-        "dimension": dimension,
-        "index_type": index_type,
+        **settings,
         "count": 0,
-        "metadata": {}
+        "next_id": 0,
+        "wal_lsn": 0
     }
     
-    # Save index to disk
-    faiss.write_index(index, f"{INDEX_DIR}/{index_name}.index")
-    with open(f"{INDEX_DIR}/{index_name}.metadata.json", "w") as f:
-        json.dump(index_metadata[index_name], f)
-    
-    return {"message": f"Created {index_type} index '{index_name}' with dimension {dimension}"}
+    # Save index to disk, dropping any log or metadata left by an earlier index of this name
+    wal = WriteAheadLog(INDEX_DIR, index_name, fsync=WAL_FSYNC)
+    wal.destroy()
+    open_metadata_store(index_name).destroy()
+    metadata_stores[index_name] = open_metadata_store(index_name)
+    index_stats[index_name] = {"load_ms": None, "mapped": False, "resident_bytes": 0}
+    index_locks[index_name] = RWLock()
+    await worker_pool.run("snapshot", save_index, index_name)
+    if PERSISTENCE_MODE == "wal":
+        wals[index_name] = wal
+        last_snapshot[index_name] = time.monotonic()
+    index_lru[index_name] = None
 
 @app.post("/add_vectors")
 async def add_vectors(index_name: str, data: VectorData):
-    if index_name not in indexes:
-        raise HTTPException(status_code=404, detail=f"Index '{index_name}' not found")
+    await get_index(index_name)
+    vectors = validate_vector_data(index_name, data)
+    
+    # Add vectors to index
+    async with locked_index(index_name, write=True):
+        # If IDs are not provided, use auto-increment IDs
+        if data.ids is None:
+            start_id = next_id(index_name)
+            ids = np.arange(start_id, start_id + len(vectors)).astype(np.int64)
+        else:
+            ids = np.array(data.ids).astype(np.int64)
+        await worker_pool.run("add", log_and_apply, index_name, ids, vectors, data.metadata)
+        if needs_training(index_name):
+            await worker_pool.run("train", train_index, index_name)
     
-    vectors = np.array(data.vectors).astype(np.float32)
+    # Persist the index and metadata
+    await persist(index_name)
+    
+    return {"message": f"Added {len(vectors)} vectors to index '{index_name}'"}
+
+@app.post("/upsert_vectors")
+async def upsert_vectors(index_name: str, data: VectorData):
+    """
+    Add vectors, replacing any already stored under the same ids. Replaced
+    vectors lose their metadata unless new metadata is given for them.
+    """
+    await get_index(index_name)
+    vectors = validate_vector_data(index_name, data)
+    if data.ids is None:
+        raise HTTPException(status_code=400, detail="IDs are required to upsert vectors")
+    ids = np.array(data.ids).astype(np.int64)
+    if len(np.unique(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="IDs must be unique")
+    
+    async with locked_index(index_name, write=True):
+        replaced = await worker_pool.run("upsert", log_and_apply, index_name, ids, vectors, data.metadata, UPSERT)
+        if needs_training(index_name):
+            await worker_pool.run("train", train_index, index_name)
+    
+    await persist(index_name)
+    
+    return {
+        "message": f"Upserted {len(vectors)} vectors into index '{index_name}'",
+        "replaced": replaced
+    }
+
+@app.post("/delete_vectors")
+async def delete_vectors(index_name: str, data: VectorIds):
+    """Remove vectors and their metadata by id; unknown ids are ignored"""
+    await get_index(index_name)
+    ids = np.unique(np.array(data.ids, dtype=np.int64))
+    
+    async with locked_index(index_name, write=True):
+        deleted = await worker_pool.run("delete", log_and_apply, index_name, ids, None, None, DELETE)
+    
+    await persist(index_name)
+    
+    return {"message": f"Deleted {deleted} vectors from index '{index_name}'", "deleted": deleted}
+
+def validate_vector_data(index_name: str, data: VectorData) -> np.ndarray:
+    vectors = np.asarray(data.vectors, dtype=np.float32)
     
     # Validate vector dimensions
-    if vectors.shape[1] != index_metadata[index_name]["dimension"]:
+    if vectors.ndim != 2 or vectors.shape[1] != index_metadata[index_name]["dimension"]:
         raise HTTPException(
             status_code=400, 
-            detail=f"Vector dimension mismatch. Expected {index_metadata[index_name]['dimension']}, got {vectors.shape[1]}"
+            detail=f"Vector dimension mismatch. Expected {index_metadata[index_name]['dimension']}, got {vectors.shape[-1]}"
         )
     
-    # If IDs are not provided, use auto-increment IDs
-    start_id = index_metadata[index_name]["count"]
-    if data.ids is None:
-        ids = np.arange(start_id, start_id + len(vectors)).astype(np.int64)
-    else:
-        if len(data.ids) != len(vectors):
-            raise HTTPException(status_code=400, detail="Number of IDs must match number of vectors")
-        ids = np.array(data.ids).astype(np.int64)
-    
-    # Store metadata if provided
-    if data.metadata:
-        if len(data.metadata) != len(vectors):
-            raise HTTPException(status_code=400, detail="Number of metadata items must match number of vectors")
-        for i, meta in zip(ids, data.metadata):
-            index_metadata[index_name]["metadata"][str(i)] = meta
+    if data.ids is not None and len(data.ids) != len(vectors):
+        raise HTTPException(status_code=400, detail="Number of IDs must match number of vectors")
     
-    # Add vectors to index
-    indexes[index_name].add_with_ids(vectors, ids)
-    index_metadata[index_name]["count"] += len(vectors)
+    # Validate metadata if provided
+    if data.metadata and len(data.metadata) != len(vectors):
+        raise HTTPException(status_code=400, detail="Number of metadata items must match number of vectors")
+    return vectors
+
+def next_id(index_name: str) -> int:
+    """First auto-increment id; deleted ids are not reused"""
+    meta = index_metadata[index_name]
+    # Snapshots from before deletes kept no separate counter
+    return meta.get("next_id", meta["count"])
+
+@app.post("/add_vectors_binary")
+async def add_vectors_binary(index_name: str, request: Request):
+    """
+    Add vectors from a multipart upload instead of JSON. Parts (sent as
+    files): `vectors` holds little-endian float32 rows, raw or as a 2-D
+    `.npy`; optional `ids` holds little-endian int64, raw or `.npy`;
+    optional `metadata` is NDJSON with one object (or null) per vector.
+
+    Upload parts are spooled by the multipart parser and read back in
+    chunks of INGEST_CHUNK_BYTES, each viewed with np.frombuffer and
+    added to the index without building Python lists.
+    """
+    await get_index(index_name)
+    dimension = index_metadata[index_name]["dimension"]
+
+    form = await request.form(max_files=3, max_fields=0)
+    vectors_part, ids_part, metadata_part = (form.get(name) for name in ("vectors", "ids", "metadata"))
+    for name, part in (("vectors", vectors_part), ("ids", ids_part), ("metadata", metadata_part)):
+        if part is not None and not isinstance(part, UploadFile):
+            raise HTTPException(status_code=400, detail=f"Part '{name}' must be sent as a file")
+    if vectors_part is None:
+        raise HTTPException(status_code=400, detail="Missing 'vectors' part")
+
+    try:
+        count = await _read_binary_header(vectors_part, "vectors", np.dtype("<f4"), dimension)
+        if ids_part is not None and await _read_binary_header(ids_part, "ids", np.dtype("<i8"), 1) != count:
+            raise ValueError("Number of IDs must match number of vectors")
+        metadata = await _read_ndjson(metadata_part) if metadata_part is not None else None
+        if metadata is not None and len(metadata) != count:
+            raise ValueError("Number of metadata items must match number of vectors")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    chunk_rows = max(1, INGEST_CHUNK_BYTES // (dimension * 4))
+    added = 0
+    while added < count:
+        rows = min(chunk_rows, count - added)
+        vectors = np.frombuffer(await vectors_part.read(rows * dimension * 4), dtype="<f4").reshape(rows, dimension)
+        ids = np.frombuffer(await ids_part.read(rows * 8), dtype="<i8") if ids_part is not None else None
+        # The write lock is taken per chunk so searches can run in between
+        async with locked_index(index_name, write=True):
+            if ids is None:
+                start_id = next_id(index_name)
+                ids = np.arange(start_id, start_id + rows, dtype=np.int64)
+            chunk_metadata = metadata[added:added + rows] if metadata is not None else None
+            await worker_pool.run("add", log_and_apply, index_name, ids, vectors, chunk_metadata)
+            if needs_training(index_name):
+                await worker_pool.run("train", train_index, index_name)
+        added += rows
+
+    await persist(index_name)
+
+    return {"message": f"Added {count} vectors to index '{index_name}'"}
+
+async def _read_binary_header(part: UploadFile, name: str, dtype: np.dtype, width: int) -> int:
+    """
+    Validate a raw or `.npy` part holding rows of `width` values of `dtype`
+    and return the row count. The part is left positioned at the first row.
+    """
+    size = part.size
+    if size is None:
+        size = part.file.seek(0, os.SEEK_END)
+    await part.seek(0)
+    if await part.read(len(NPY_MAGIC)) != NPY_MAGIC:
+        await part.seek(0)
+        row_bytes = width * dtype.itemsize
+        if size % row_bytes:
+            raise ValueError(f"Part '{name}' is not a whole number of rows of {row_bytes} bytes")
+        return size // row_bytes
+
+    await part.seek(0)
+    version = np.lib.format.read_magic(part.file)
+    if version == (1, 0):
+        shape, fortran_order, stored_dtype = np.lib.format.read_array_header_1_0(part.file)
+    elif version == (2, 0):
+        shape, fortran_order, stored_dtype = np.lib.format.read_array_header_2_0(part.file)
+    else:
+        raise ValueError(f"Unsupported .npy format version {version}")
+    if stored_dtype != dtype or fortran_order:
+        raise ValueError(f"Part '{name}' must be a C-ordered {dtype.str} array, got {stored_dtype.str}")
+    if width == 1 and len(shape) == 1:
+        return shape[0]
+    if len(shape) != 2 or shape[1] != width:
+        raise ValueError(f"Part '{name}' has shape {shape}, expected (n, {width})")
+    return shape[0]
+
+async def _read_ndjson(part: UploadFile) -> List[Optional[Dict[str, Any]]]:
+    await part.seek(0)
+    metadata = []
+    for line_number, line in enumerate(part.file, start=1):
+        if not line.strip():
+            continue
+        try:
+            metadata.append(json.loads(line))
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON on metadata line {line_number}")
+    return metadata
+
+def log_and_apply(index_name: str, ids: np.ndarray, vectors: Optional[np.ndarray], metadata: Optional[List] = None, kind: int = ADD) -> int:
+    """Append a change to the index's write-ahead log (in "wal" mode), then apply it"""
+    if PERSISTENCE_MODE == "wal":
+        index_metadata[index_name]["wal_lsn"] = wals[index_name].append(ids, vectors, metadata, kind)
+    return apply_record(index_name, kind, ids, vectors, metadata)
+
+def apply_record(index_name: str, kind: int, ids: np.ndarray, vectors: Optional[np.ndarray], metadata: Optional[List] = None) -> int:
+    """Apply an add, delete or upsert; returns the number of stored vectors it replaced or deleted"""
+    index = indexes[index_name]
+    stored = index.ntotal
+    removed = update_index(index_name, kind, ids, vectors)
+    if index_name in compactions:
+        compactions[index_name].append((kind, ids, vectors))
+    index_stats[index_name]["resident_bytes"] += (index.ntotal - stored) * bytes_per_vector(index)
     
-    # Save updated index and metadata
-    faiss.write_index(indexes[index_name], f"{INDEX_DIR}/{index_name}.index")
-    with open(f"{INDEX_DIR}/{index_name}.metadata.json", "w") as f:
-        json.dump(index_metadata[index_name], f)
+    store = metadata_stores[index_name]
+    if kind != ADD:
+        store.delete_many(ids.tolist() if metadata is None else [i for i, meta in zip(ids.tolist(), metadata) if meta is None])
+    if metadata:
+        store.put_many(ids.tolist(), metadata)
     
-    return {"message": f"Added {len(vectors)} vectors to index '{index_name}'"}
+    meta = index_metadata[index_name]
+    added = (0 if kind == DELETE else len(ids)) - removed
+    meta["count"] += added
+    if kind != DELETE:
+        meta["next_id"] = next_id(index_name) + added
+    return removed
+
+def update_index(index_name: str, kind: int, ids: np.ndarray, vectors: Optional[np.ndarray]) -> int:
+    index = indexes[index_name]
+    removed = 0 if kind == ADD else remove_from_index(index_name, index, ids)
+    if kind != DELETE:
+        index.add_with_ids(vectors, ids)
+    return removed
+
+def remove_from_index(index_name: str, index, ids: np.ndarray) -> int:
+    """Remove vectors by id, or tombstone them where the index type cannot remove; returns how many"""
+    if not uses_tombstones(index_name):
+        return index.remove_ids(faiss.IDSelectorBatch(ids))
+    if not index.ntotal:
+        return 0
+    dead = tombstones.get(index_name, NO_IDS)
+    positions = np.flatnonzero(np.isin(id_map_array(index), ids))
+    positions = np.setdiff1d(positions, dead, assume_unique=True)
+    if len(positions):
+        tombstones[index_name] = np.union1d(dead, positions)
+    return len(positions)
+
+def uses_tombstones(index_name: str) -> bool:
+    # HNSW graphs do not support remove_ids
+    return index_metadata[index_name]["index_type"] == "HNSWFlat"
+
+def id_map_array(index) -> np.ndarray:
+    """The ids of an IDMap index by position, without copying"""
+    return faiss.rev_swig_ptr(index.id_map.data(), index.id_map.size())
+
+async def persist(index_name: str):
+    """Persist after a write: every time in "full" mode, otherwise once the WAL is large"""
+    enforce_memory_budget(keep=index_name)
+    if PERSISTENCE_MODE != "wal":
+        async with locked_index(index_name):
+            await worker_pool.run("snapshot", save_index, index_name)
+    elif wals[index_name].pending_bytes >= WAL_MAX_BYTES:
+        schedule_snapshot(index_name)
+    if index_name in indexes and indexes[index_name].ntotal:
+        if len(tombstones.get(index_name, NO_IDS)) >= COMPACT_TOMBSTONE_RATIO * indexes[index_name].ntotal:
+            schedule_compaction(index_name)
+
+def snapshot_paths(index_name: str):
+    return f"{INDEX_DIR}/{index_name}.index", f"{INDEX_DIR}/{index_name}.metadata.json"
+
+def open_metadata_store(index_name: str) -> MetadataStore:
+    return MetadataStore(f"{INDEX_DIR}/{index_name}.metadata.db", cache_ids=METADATA_CACHE_IDS)
+
+def save_index(index_name: str):
+    write_snapshot(index_name, *serialize_snapshot(index_name))
+
+def serialize_snapshot(index_name: str):
+    meta = index_metadata[index_name]
+    # Tombstones are positions in this copy of the index, so they are saved with it
+    dead = tombstones.get(index_name, NO_IDS)
+    if len(dead):
+        meta = {**meta, "tombstones": dead.tolist()}
+    return faiss.serialize_index(indexes[index_name]), json.dumps(meta)
+
+def write_snapshot(index_name: str, index_bytes: np.ndarray, metadata_json: str):
+    """
+    Write the index and metadata files atomically. Both are written to
+    temp files first; the index rename is the commit point, and
+    `recover_snapshot` completes the metadata rename if a crash lands
+    between the two.
+    """
+    index_path, meta_path = snapshot_paths(index_name)
+    # Vector metadata is written as vectors are added; make it durable
+    # before the snapshot lets the WAL segments that carry it be dropped
+    metadata_stores[index_name].checkpoint()
+    _write_durably(f"{index_path}.tmp", memoryview(index_bytes))
+    _write_durably(f"{meta_path}.tmp", metadata_json.encode())
+    os.replace(f"{index_path}.tmp", index_path)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    _fsync_directory(INDEX_DIR)
+
+def recover_snapshot(index_name: str):
+    """Finish or discard a snapshot interrupted by a crash"""
+    index_path, meta_path = snapshot_paths(index_name)
+    if os.path.exists(f"{index_path}.tmp"):
+        # The index was never renamed: the previous snapshot is still whole
+        for path in (f"{index_path}.tmp", f"{meta_path}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+    elif os.path.exists(f"{meta_path}.tmp"):
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+def _write_durably(path: str, data):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _fsync_directory(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def replay_wal(index_name: str) -> int:
+    """Apply logged changes newer than the loaded snapshot; returns the number of vectors"""
+    wal = WriteAheadLog(INDEX_DIR, index_name, fsync=WAL_FSYNC)
+    replayed = 0
+    for record in wal.replay(after_lsn=index_metadata[index_name].get("wal_lsn", 0)):
+        if index_stats[index_name]["mapped"]:
+            load_into_memory(index_name)
+        apply_record(index_name, record.kind, record.ids, record.vectors, record.metadata)
+        index_metadata[index_name]["wal_lsn"] = record.lsn
+        replayed += len(record.ids)
+        # Train at the same point as when the batches were first added
+        if needs_training(index_name):
+            train_index(index_name)
+    if PERSISTENCE_MODE == "wal":
+        wals[index_name] = wal
+        last_snapshot[index_name] = time.monotonic()
+    else:
+        if replayed:
+            save_index(index_name)
+        wal.destroy()
+    return replayed
+
+async def get_index(index_name: str):
+    """
+    Return a loaded index, loading it on first use. Concurrent requests
+    share one load. Use `locked_index` to work with the index itself.
+    """
+    if index_name not in index_metadata:
+        raise HTTPException(status_code=404, detail=f"Index '{index_name}' not found")
+    while index_name not in indexes:
+        load = index_loads.get(index_name)
+        if load is None:
+            load = index_loads[index_name] = asyncio.ensure_future(load_index(index_name))
+            load.add_done_callback(lambda _: index_loads.pop(index_name, None))
+        await asyncio.shield(load)
+    index_lru[index_name] = None
+    index_lru.move_to_end(index_name)
+    enforce_memory_budget(keep=index_name)
+    return indexes[index_name]
+
+@asynccontextmanager
+async def locked_index(index_name: str, write: bool = False):
+    """
+    Load an index and hold its read lock, or its write lock with `write`.
+    A locked index is never unloaded. A memory-mapped index is copied into
+    memory before it is handed to a writer.
+    """
+    while True:
+        await get_index(index_name)
+        lock = index_locks.setdefault(index_name, RWLock())
+        async with (lock.write() if write else lock.read()):
+            # It may have been unloaded or deleted while waiting for the lock
+            if index_name not in indexes:
+                continue
+            if write and index_stats[index_name]["mapped"]:
+                await worker_pool.run("load", load_into_memory, index_name)
+            yield indexes[index_name]
+            return
+
+async def load_index(index_name: str):
+    """Read the index snapshot and replay its WAL on the worker pool"""
+    started = time.perf_counter()
+    index_path, meta_path = snapshot_paths(index_name)
+    index = await worker_pool.run("load", read_index_file, index_path, MMAP_INDEXES)
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    mapped = MMAP_INDEXES and index is not None
+    if index is None:
+        index = await worker_pool.run("load", read_index_file, index_path, False)
+    # Snapshots from before the metadata store kept per-vector metadata inline
+    legacy = meta.pop("metadata", None)
+    if legacy:
+        await worker_pool.run("load", metadata_stores[index_name].put_many, map(int, legacy), legacy.values())
+    tombstones[index_name] = np.array(meta.pop("tombstones", []), dtype=np.int64)
+    index_metadata[index_name] = meta
+    indexes[index_name] = index
+    index_stats[index_name] = {
+        "load_ms": None,
+        "mapped": mapped,
+        "resident_bytes": 0 if mapped else os.path.getsize(index_path),
+    }
+    replayed = await worker_pool.run("replay", replay_wal, index_name)
+    if legacy is not None:
+        # Rewrite the snapshot once, without the inline metadata
+        await worker_pool.run("snapshot", save_index, index_name)
+    index_stats[index_name]["load_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    print(f"Loaded index '{index_name}' with {meta['count']} vectors ({replayed} replayed from the WAL)")
+
+def read_index_file(path: str, mmap: bool):
+    """Read an index file; returns None if `mmap` is set but the index type cannot be mapped"""
+    if not mmap:
+        return faiss.read_index(path)
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        return None
+
+def load_into_memory(index_name: str):
+    """
+    Replace a memory-mapped index with an in-memory copy before a write;
+    mapped IVF lists are read-only. A mapped index has not been written
+    since it was loaded, so its snapshot file is still current.
+    """
+    index_path = snapshot_paths(index_name)[0]
+    indexes[index_name] = faiss.read_index(index_path)
+    index_stats[index_name].update(mapped=False, resident_bytes=os.path.getsize(index_path))
+
+def unload_index(index_name: str):
+    """Drop a loaded index; changes since its snapshot are still in the WAL"""
+    indexes.pop(index_name, None)
+    index_lru.pop(index_name, None)
+    tombstones.pop(index_name, None)
+    # A compaction in progress finds its index gone and drops the rebuilt copy
+    compactions.pop(index_name, None)
+    wal = wals.pop(index_name, None)
+    if wal is not None:
+        wal.close()
+    last_snapshot.pop(index_name, None)
+    print(f"Unloaded index '{index_name}'")
+
+def summary_metadata(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the per-vector metadata that older snapshot files carry inline, and tombstones"""
+    return {key: value for key, value in meta.items() if key not in ("metadata", "tombstones")}
+
+def enforce_memory_budget(keep: str):
+    """Unload least recently used in-memory indexes while over the budget"""
+    if not MEMORY_BUDGET_BYTES:
+        return
+    resident = sum(index_stats[name]["resident_bytes"] for name in index_lru)
+    for name in list(index_lru):
+        if resident <= MEMORY_BUDGET_BYTES:
+            break
+        task = snapshot_tasks.get(name)
+        lock = index_locks.get(name)
+        if name == keep or (task is not None and not task.done()) or (lock is not None and lock.locked):
+            continue
+        resident -= index_stats[name]["resident_bytes"]
+        unload_index(name)
+
+async def snapshot_index(index_name: str):
+    """Snapshot the index on the worker pool, then drop the WAL segments it covers"""
+    lock = index_locks.get(index_name)
+    if lock is None:
+        return
+    # Adds need the write lock, so no batch can land between the copy and the rotation
+    async with lock.read():
+        wal = wals.get(index_name)
+        # Deleted, or unloaded, since the snapshot was scheduled
+        if wal is None or index_name not in indexes:
+            return
+        index_bytes, metadata_json = await worker_pool.run("serialize", serialize_snapshot, index_name)
+        covered = wal.rotate()
+    try:
+        await worker_pool.run("snapshot", write_snapshot, index_name, index_bytes, metadata_json)
+    except Exception as e:
+        print(f"Snapshot of index '{index_name}' failed: {e}")
+        # Keep the index marked dirty so the next round retries
+        wal.pending_bytes = max(wal.pending_bytes, 1)
+        return
+    wal.remove(covered)
+    last_snapshot[index_name] = time.monotonic()
+
+def schedule_snapshot(index_name: str):
+    task = snapshot_tasks.get(index_name)
+    if task is None or task.done():
+        snapshot_tasks[index_name] = asyncio.create_task(snapshot_index(index_name))
+
+async def wait_for_snapshot(index_name: str):
+    task = snapshot_tasks.pop(index_name, None)
+    if task is not None:
+        await task
+
+async def snapshot_loop():
+    while True:
+        await asyncio.sleep(min(1.0, SNAPSHOT_INTERVAL_S))
+        now = time.monotonic()
+        for index_name, wal in list(wals.items()):
+            due = now - last_snapshot.get(index_name, 0) >= SNAPSHOT_INTERVAL_S
+            if wal.pending_bytes and (due or wal.pending_bytes >= WAL_MAX_BYTES):
+                schedule_snapshot(index_name)
+
+def schedule_compaction(index_name: str):
+    task = compaction_tasks.get(index_name)
+    if task is None or task.done():
+        compaction_tasks[index_name] = asyncio.create_task(compact_index(index_name))
+
+async def compact_index(index_name: str) -> bool:
+    """
+    Rebuild a tombstoned index from its live vectors without blocking
+    searches. The live vectors are copied under the read lock and the new
+    index is built on the compaction thread with no lock held; changes
+    made in the meantime are recorded, applied to the new index and the
+    two swapped under the write lock. Returns whether the index was rebuilt.
+    """
+    changes = []
+    try:
+        # Adds and deletes wait while the vectors are copied; searches do not
+        async with locked_index(index_name) as index:
+            dead = tombstones.get(index_name, NO_IDS)
+            if not len(dead):
+                return False
+            vectors, ids = await compaction_pool.run("copy", live_vectors, index, dead)
+            hnsw = faiss.downcast_index(index.index).hnsw
+            settings = index_metadata[index_name]["dimension"], index_metadata[index_name]["factory"], hnsw.efConstruction, hnsw.efSearch
+            compactions[index_name] = changes
+        rebuilt = await compaction_pool.run("rebuild", rebuild_index, vectors, ids, *settings)
+        async with locked_index(index_name, write=True):
+            # Unloaded or deleted since the copy; the reloaded index keeps its tombstones
+            if compactions.get(index_name) is not changes:
+                return False
+            del compactions[index_name]
+            indexes[index_name] = rebuilt
+            tombstones[index_name] = NO_IDS
+            await compaction_pool.run("catch_up", apply_changes, index_name, changes)
+            index_stats[index_name]["resident_bytes"] = rebuilt.ntotal * bytes_per_vector(rebuilt)
+            if PERSISTENCE_MODE != "wal":
+                await worker_pool.run("snapshot", save_index, index_name)
+    except HTTPException:
+        return False
+    except Exception as e:
+        print(f"Compaction of index '{index_name}' failed: {e}")
+        return False
+    finally:
+        if compactions.get(index_name) is changes:
+            del compactions[index_name]
+    print(f"Compacted index '{index_name}': dropped {len(dead)} tombstones, applied {len(changes)} changes made meanwhile")
+    if PERSISTENCE_MODE == "wal":
+        schedule_snapshot(index_name)
+    return True
+
+def live_vectors(index, dead: np.ndarray):
+    """Copies of the vectors and ids of an HNSWFlat index that are not tombstoned"""
+    live = np.ones(index.ntotal, dtype=bool)
+    live[dead] = False
+    storage = faiss.downcast_index(faiss.downcast_index(index.index).storage)
+    stored = faiss.rev_swig_ptr(storage.get_xb(), index.ntotal * index.d).reshape(index.ntotal, index.d)
+    return stored[live], id_map_array(index)[live]
+
+def rebuild_index(vectors: np.ndarray, ids: np.ndarray, dimension: int, factory: str, ef_construction: int, ef_search: int):
+    index = new_index(dimension, factory, ef_construction)
+    faiss.downcast_index(index.index).hnsw.efSearch = ef_search
+    index.add_with_ids(vectors, ids)
+    return index
+
+def apply_changes(index_name: str, changes: List[tuple]):
+    for kind, ids, vectors in changes:
+        update_index(index_name, kind, ids, vectors)
+
+@app.post("/compact_index")
+async def compact(index_name: str):
+    """Rebuild a tombstoned index now rather than once tombstones reach FAISS_COMPACT_TOMBSTONE_RATIO"""
+    await get_index(index_name)
+    schedule_compaction(index_name)
+    compacted = await asyncio.shield(compaction_tasks[index_name])
+    return {
+        "message": f"Compacted index '{index_name}'" if compacted else f"Index '{index_name}' has nothing to compact",
+        "compacted": compacted
+    }
 
 @app.post("/search")
 async def search(query: SearchQuery):
-    if query.index_name not in indexes:
-        raise HTTPException(status_code=404, detail=f"Index '{query.index_name}' not found")
+    query_vector = np.array([query.query_vector], dtype=np.float32)
+    validate_query_dimension(query.index_name, query_vector)
+    validate_search_options(query.index_name, query.nprobe, query.ef_search, query.filter)
+    options = {"nprobe": query.nprobe, "ef_search": query.ef_search}
+    
+    # Perform search, grouped with concurrent unfiltered searches when batching is enabled
+    if search_batcher is not None and query.filter is None:
+        distances, indices = await search_batcher.submit(query.index_name, query_vector[0], query.k, **options)
+    else:
+        distances, indices = await run_search(query.index_name, query_vector, query.k, metadata_filter=query.filter, **options)
+        distances, indices = distances[0], indices[0]
     
-    query_vector = np.array([query.query_vector]).astype(np.float32)
+    metadata = await worker_pool.run("metadata", fetch_metadata, query.index_name, indices)
+    return {"results": format_results(distances, indices, metadata)}
+
+@app.post("/search_batch")
+async def search_batch(query: SearchBatchQuery):
+    """Search many query vectors with one index.search call"""
+    if not query.query_vectors:
+        return {"results": []}
+    try:
+        query_vectors = np.array(query.query_vectors, dtype=np.float32)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Query vectors must all have the same dimension")
+    validate_query_dimension(query.index_name, query_vectors)
+    validate_search_options(query.index_name, query.nprobe, query.ef_search, query.filter)
     
-    # Validate query vector dimension
-    if query_vector.shape[1] != index_metadata[query.index_name]["dimension"]:
+    distances, indices = await run_search(
+        query.index_name, query_vectors, query.k, nprobe=query.nprobe, ef_search=query.ef_search, metadata_filter=query.filter
+    )
+    # One metadata lookup for every row's hits
+    metadata = await worker_pool.run("metadata", fetch_metadata, query.index_name, indices)
+    return {
+        "results": [
+            format_results(row_distances, row_indices, metadata)
+            for row_distances, row_indices in zip(distances, indices)
+        ]
+    }
+
+def validate_query_dimension(index_name: str, query_vectors: np.ndarray):
+    if index_name not in index_metadata:
+        raise HTTPException(status_code=404, detail=f"Index '{index_name}' not found")
+    if query_vectors.shape[1] != index_metadata[index_name]["dimension"]:
         raise HTTPException(
             status_code=400, 
-            detail=f"Query vector dimension mismatch. Expected {index_metadata[query.index_name]['dimension']}, got {query_vector.shape[1]}"
+            detail=f"Query vector dimension mismatch. Expected {index_metadata[index_name]['dimension']}, got {query_vectors.shape[1]}"
         )
-    
-    # Perform search
-    distances, indices = indexes[query.index_name].search(query_vector, query.k)
-    
-    # Get metadata for results if available
+
+def validate_search_options(index_name: str, nprobe: Optional[int], ef_search: Optional[int], metadata_filter: Optional[Dict[str, Any]] = None):
+    index_type = index_metadata[index_name]["index_type"]
+    if nprobe is not None and (not index_type.startswith("IVF") or nprobe < 1):
+        raise HTTPException(status_code=400, detail="nprobe must be a positive integer and needs an IVF index")
+    if ef_search is not None and (index_type != "HNSWFlat" or ef_search < 1):
+        raise HTTPException(status_code=400, detail="ef_search must be a positive integer and needs an HNSWFlat index")
+    if metadata_filter is not None:
+        try:
+            validate_filter(metadata_filter)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+async def run_search(
+    index_name: str,
+    query_vectors: np.ndarray,
+    k: int,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    metadata_filter: Optional[Dict[str, Any]] = None
+):
+    async with locked_index(index_name) as index:
+        dead = tombstones.get(index_name, NO_IDS)
+        selector, matched = None, index.ntotal - len(dead)
+        if metadata_filter is not None:
+            ids = await worker_pool.run("filter", metadata_stores[index_name].match, metadata_filter)
+            if not len(ids):
+                return np.full((len(query_vectors), k), np.inf, dtype=np.float32), np.full((len(query_vectors), k), -1)
+            # Applied by FAISS while scanning, so k matches come back without over-fetching
+            selector, matched = id_selector(ids), len(ids)
+        if index_metadata[index_name]["index_type"] == "HNSWFlat" and (selector is not None or len(dead)):
+            hnsw = faiss.downcast_index(index.index)
+            positions = position_selector(index, selector, dead)
+            # A graph walk visits too few matches for a selective filter; scan them instead
+            if index.ntotal > HNSW_SCAN_SELECTIVITY * matched:
+                inner, params = faiss.downcast_index(hnsw.storage), faiss.SearchParameters(sel=positions)
+            else:
+                inner, params = hnsw, search_parameters(index_name, index, nprobe, ef_search, positions, matched)
+            return await worker_pool.run("search", search_positions, index, inner, query_vectors, k, params)
+        params = search_parameters(index_name, index, nprobe, ef_search, selector, matched)
+        return await worker_pool.run("search", functools.partial(index.search, params=params), query_vectors, k)
+
+def position_selector(index, selector, dead: np.ndarray):
+    """
+    A selector over the positions inside an HNSWFlat index's IDMap: those
+    whose ids `selector` keeps (all if None) and that are not tombstoned
+    """
+    parts = []
+    if selector is not None:
+        parts.append(faiss.IDSelectorTranslated(index.id_map, selector))
+    if len(dead):
+        parts.append(faiss.IDSelectorNot(id_selector(dead)))
+    # The composite selectors keep references to the ones they wrap
+    return parts[0] if len(parts) == 1 else faiss.IDSelectorAnd(*parts)
+
+def search_positions(index, inner, query_vectors: np.ndarray, k: int, params):
+    """Search the index inside an IDMap, then map the positions found to ids"""
+    distances, positions = inner.search(query_vectors, k, params=params)
+    return distances, np.where(positions >= 0, id_map_array(index)[positions], -1)
+
+def search_parameters(index_name: str, index, nprobe: Optional[int], ef_search: Optional[int], selector=None, matched: int = 0):
+    """
+    Per-call search parameters, so concurrent searches do not share state.
+    When a filter keeps only a fraction of the vectors, nprobe / efSearch
+    are widened by its inverse (up to nlist / the index size) so about as
+    many matching vectors are visited as in an unfiltered search.
+    """
+    if selector is None and nprobe is None and ef_search is None:
+        return None
+    meta = index_metadata[index_name]
+    options = {} if selector is None else {"sel": selector}
+    widen = 1 if selector is None else -(-index.ntotal // max(matched, 1))
+    # Staged vectors of an untrained index are searched exactly
+    if meta.get("trained", True) and meta["index_type"].startswith("IVF"):
+        ivf = faiss.extract_index_ivf(index)
+        return faiss.SearchParametersIVF(nprobe=min((nprobe or ivf.nprobe) * widen, ivf.nlist), **options)
+    if meta["index_type"] == "HNSWFlat":
+        hnsw = faiss.downcast_index(index.index).hnsw
+        return faiss.SearchParametersHNSW(efSearch=min((ef_search or hnsw.efSearch) * widen, max(index.ntotal, 16)), **options)
+    return faiss.SearchParameters(**options) if options else None
+
+search_batcher = SearchBatcher(run_search, SEARCH_BATCH_WINDOW_MS, SEARCH_MAX_BATCH) if SEARCH_BATCH_WINDOW_MS > 0 else None
+
+def fetch_metadata(index_name: str, indices: np.ndarray) -> Dict[int, Any]:
+    ids = np.unique(indices)
+    return metadata_stores[index_name].get_many(ids[ids >= 0].tolist())
+
+def format_results(distances: np.ndarray, indices: np.ndarray, metadata: Dict[int, Any]) -> List[Dict[str, Any]]:
     results = []
-    for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
+    for dist, idx in zip(distances.tolist(), indices.tolist()):
         if idx == -1:  # No more results
             break
         
         result = {
-            "id": int(idx),
-            "distance": float(dist)
+            "id": idx,
+            "distance": dist
         }
         
         # Add metadata if available
-        if str(idx) in index_metadata[query.index_name]["metadata"]:
-            result["metadata"] = index_metadata[query.index_name]["metadata"][str(idx)]
+        if idx in metadata:
+            result["metadata"] = metadata[idx]
         
         results.append(result)
-    
-    return {"results": results}
+    return results
 
 @app.get("/list_indexes")
 async def list_indexes():
@@ -140,24 +990,56 @@ async def list_indexes():
                 "name": name,
                 "type": meta["index_type"],
                 "dimension": meta["dimension"],
-                "count": meta["count"]
+                "count": meta["count"],
+                "trained": meta.get("trained", True),
+                "loaded": name in indexes,
+                "mapped": index_stats[name]["mapped"],
+                "load_ms": index_stats[name]["load_ms"],
+                "resident_bytes": index_stats[name]["resident_bytes"] if name in indexes else 0,
+                "tombstones": len(tombstones.get(name, NO_IDS))
             } 
             for name, meta in index_metadata.items()
         ]
     }
 
+@app.get("/stats")
+async def stats():
+    """Worker pool settings and per-operation queue wait and run time"""
+    return {
+        "worker_threads": WORKER_THREADS,
+        "omp_threads": OMP_THREADS,
+        "operations": worker_pool.report(),
+        "compaction": compaction_pool.report(),
+        "search_batching": search_batcher.report() if search_batcher is not None else None
+    }
+
 @app.delete("/delete_index")
 async def delete_index(index_name: str):
-    if index_name not in indexes:
+    if index_name not in index_metadata:
         raise HTTPException(status_code=404, detail=f"Index '{index_name}' not found")
     
-    # Delete from memory
-    del indexes[index_name]
-    del index_metadata[index_name]
+    # Delete from memory, once an in-progress load or snapshot has finished
+    if index_name in index_loads:
+        await asyncio.shield(index_loads[index_name])
+    await wait_for_snapshot(index_name)
+    # Waits for searches and adds in progress; later ones will get a 404
+    async with index_locks.setdefault(index_name, RWLock()).write():
+        if index_name not in index_metadata:
+            raise HTTPException(status_code=404, detail=f"Index '{index_name}' not found")
+        indexes.pop(index_name, None)
+        del index_metadata[index_name]
+        index_stats.pop(index_name, None)
+        index_lru.pop(index_name, None)
+        index_locks.pop(index_name, None)
+        last_snapshot.pop(index_name, None)
+        tombstones.pop(index_name, None)
+        compactions.pop(index_name, None)
+        wal = wals.pop(index_name, None) or WriteAheadLog(INDEX_DIR, index_name)
+        wal.destroy()
+        metadata_stores.pop(index_name).destroy()
     
     # Delete files
-    index_path = f"{INDEX_DIR}/{index_name}.index"
-    meta_path = f"{INDEX_DIR}/{index_name}.metadata.json"
+    index_path, meta_path = snapshot_paths(index_name)
     
     if os.path.exists(index_path):
         os.remove(index_path)
@@ -166,19 +1048,40 @@ async def delete_index(index_name: str):
     
     return {"message": f"Deleted index '{index_name}'"}
 
-# Load existing indexes on startup
+# Find existing indexes on startup; they are loaded on first use
 @app.on_event("startup")
 async def load_existing_indexes():
-    for filename in os.listdir(INDEX_DIR):
-        if filename.endswith(".index"):
-            index_name = filename.split(".")[0]
-            meta_file = f"{INDEX_DIR}/{index_name}.metadata.json"
-            
-            if os.path.exists(meta_file):
-                with open(meta_file, "r") as f:
-                    meta = json.load(f)
-                    index_metadata[index_name] = meta
-                
-                index = faiss.read_index(f"{INDEX_DIR}/{index_name}.index")
-                indexes[index_name] = index
-                print(f"Loaded index '{index_name}' with {meta['count']} vectors")
\ No newline at end of file
+    global snapshot_loop_task
+    index_names = {
+        filename.split(".")[0] for filename in os.listdir(INDEX_DIR)
+        if filename.endswith((".index", ".index.tmp", ".metadata.json.tmp"))
+    }
+    for index_name in sorted(index_names):
+        recover_snapshot(index_name)
+        index_path, meta_file = snapshot_paths(index_name)
+        
+        if os.path.exists(index_path) and os.path.exists(meta_file):
+            with open(meta_file, "r") as f:
+                index_metadata[index_name] = summary_metadata(json.load(f))
+            metadata_stores[index_name] = open_metadata_store(index_name)
+            index_stats[index_name] = {"load_ms": None, "mapped": False, "resident_bytes": 0}
+            if not LAZY_LOAD:
+                await get_index(index_name)
+    
+    if PERSISTENCE_MODE == "wal":
+        snapshot_loop_task = asyncio.create_task(snapshot_loop())
+
+@app.on_event("shutdown")
+async def snapshot_on_shutdown():
+    if snapshot_loop_task is not None:
+        snapshot_loop_task.cancel()
+    # Tombstones are in the snapshots; a cancelled rebuild is just redone later
+    for task in compaction_tasks.values():
+        task.cancel()
+    for index_name in list(wals):
+        await wait_for_snapshot(index_name)
+        if wals[index_name].pending_bytes:
+            await snapshot_index(index_name)
+        wals[index_name].close()
+    for store in metadata_stores.values():
+        store.close()
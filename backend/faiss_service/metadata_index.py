@@ -0,0 +1,54 @@
+import json
+from typing import Any, Dict, Iterator, Tuple
+
+import faiss
+import numpy as np
+
+SCALAR_TYPES = (str, int, float, bool)
+
+
+def validate_filter(conditions: Dict[str, Any]) -> None:
+    """A filter maps metadata fields to a value, or a list of accepted values"""
+    if not conditions:
+        raise ValueError("Filter must name at least one field")
+    for field, value in conditions.items():
+        values = value if isinstance(value, list) else [value]
+        if not values or not all(isinstance(v, SCALAR_TYPES) for v in values):
+            raise ValueError(f"Filter on '{field}' must be a scalar or a non-empty list of scalars")
+
+
+def index_terms(meta: Any) -> Iterator[Tuple[str, str]]:
+    """
+    The (field, value) terms a vector's metadata is indexed under. A list
+    value yields each of its elements, so {"tags": ["a", "b"]} matches a
+    filter on either tag. Nested objects are not indexed.
+    """
+    # Binary uploads may carry any JSON value as a vector's metadata
+    if not isinstance(meta, dict):
+        return
+    for field, value in meta.items():
+        for v in value if isinstance(value, list) else [value]:
+            if isinstance(v, SCALAR_TYPES):
+                yield field, term_key(v)
+
+
+def term_key(value: Any) -> str:
+    # JSON keeps 1, "1" and true apart
+    return json.dumps(value)
+
+
+def id_selector(ids: np.ndarray):
+    """
+    A FAISS selector for `ids`: a bitmap over the id range when the ids are
+    dense enough for it to stay small, a hash set otherwise.
+    """
+    top = int(ids.max()) + 1
+    if ids.min() >= 0 and top <= 64 * len(ids):
+        mask = np.zeros(top, dtype=bool)
+        mask[ids] = True
+        bitmap = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(bitmap)
+        # The selector points into the bitmap without owning it
+        selector.referenced_objects = [bitmap]
+        return selector
+    return faiss.IDSelectorBatch(ids)
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from metadata_index import index_terms, term_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (id INTEGER PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS terms (
+    field TEXT NOT NULL, value TEXT NOT NULL, id INTEGER NOT NULL,
+    PRIMARY KEY (field, value, id)
+) WITHOUT ROWID;
+"""
+
+# Ids per statement for bulk lookups, below SQLite's variable limit
+BATCH = 500
+
+
+class MetadataStore:
+    """
+    Per-vector metadata of one index in an SQLite file, keyed by int64 id,
+    with an inverted index of field/value terms for filtered search.
+
+    Writes and reads both run on worker threads, each through its own
+    connection, which SQLite's WAL journal lets run alongside each other.
+    The read lock keeps one reader at a time on the read connection and
+    the posting cache. Commits are not fsynced: the FAISS write-ahead log
+    can replay them, and `checkpoint` makes them durable before covered
+    log segments are removed.
+
+    Posting lists are cached as id arrays, up to `cache_ids` ids. The
+    service never runs a match during a write to the same index (the
+    index lock sees to that), so a cached list is never stale.
+    """
+
+    def __init__(self, path: str, cache_ids: int = 4_000_000):
+        self.path = path
+        self.cache_ids = cache_ids
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._reader = self._connect()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._cached_ids = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def put_many(self, ids: Iterable[int], metadata: Iterable[Optional[Any]]) -> None:
+        """Store metadata for each id (None entries are skipped), replacing what was there"""
+        entries = [(i, meta) for i, meta in zip(ids, metadata) if meta is not None]
+        if not entries:
+            return
+        rows = [(i, json.dumps(meta)) for i, meta in entries]
+        with self._transaction():
+            stale = self._remove_terms([i for i, _ in rows])
+            self._writer.executemany("INSERT OR REPLACE INTO metadata (id, doc) VALUES (?, ?)", rows)
+            new_terms = [(field, key, i) for i, meta in entries for field, key in index_terms(meta)]
+            self._writer.executemany("INSERT OR IGNORE INTO terms (field, value, id) VALUES (?, ?, ?)", new_terms)
+        self._invalidate(stale + [(field, key) for field, key, _ in new_terms])
+
+    def delete_many(self, ids: Iterable[int]) -> None:
+        """Drop the metadata of each id that has any"""
+        ids = list(ids)
+        if not ids:
+            return
+        with self._transaction():
+            stale = self._remove_terms(ids)
+            self._writer.executemany("DELETE FROM metadata WHERE id = ?", [(i,) for i in ids])
+        self._invalidate(stale)
+
+    @contextmanager
+    def _transaction(self):
+        with self._write_lock:
+            self._writer.execute("BEGIN")
+            try:
+                yield
+                self._writer.execute("COMMIT")
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+
+    def _remove_terms(self, ids: List[int]) -> List[Tuple[str, str]]:
+        """Delete the terms the current metadata of `ids` is indexed under and return them"""
+        stale = self._fetch(self._writer, ids)
+        terms = [(field, key, i) for i, meta in stale.items() for field, key in index_terms(meta)]
+        self._writer.executemany("DELETE FROM terms WHERE field = ? AND value = ? AND id = ?", terms)
+        return [(field, key) for field, key, _ in terms]
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Any]:
+        """Metadata of the given ids that have any"""
+        with self._read_lock:
+            return self._fetch(self._reader, list(ids))
+
+    def _fetch(self, connection: sqlite3.Connection, ids: List[int]) -> Dict[int, Any]:
+        found = {}
+        for start in range(0, len(ids), BATCH):
+            chunk = ids[start:start + BATCH]
+            rows = connection.execute(
+                f"SELECT id, doc FROM metadata WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update((i, json.loads(doc)) for i, doc in rows)
+        return found
+
+    def match(self, conditions: Dict[str, Any]) -> np.ndarray:
+        """
+        Ids matching every field of `conditions`; a list of values matches
+        any of them. Fields are intersected smallest first.
+        """
+        candidates = []
+        for field, value in conditions.items():
+            values = value if isinstance(value, list) else [value]
+            with self._read_lock:
+                postings = [self._postings(field, term_key(v)) for v in values]
+            candidates.append(np.unique(np.concatenate(postings)) if len(postings) > 1 else postings[0])
+        candidates.sort(key=len)
+        ids = candidates[0]
+        for other in candidates[1:]:
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def _postings(self, field: str, key: str) -> np.ndarray:
+        cached = self._cache.get((field, key))
+        if cached is not None:
+            self._cache.move_to_end((field, key))
+            return cached
+        rows = self._reader.execute("SELECT id FROM terms WHERE field = ? AND value = ?", (field, key))
+        ids = np.fromiter((i for (i,) in rows), dtype=np.int64)
+        if len(ids) <= self.cache_ids:
+            self._cache[(field, key)] = ids
+            self._cached_ids += len(ids)
+            while self._cached_ids > self.cache_ids:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_ids -= len(evicted)
+        return ids
+
+    def _invalidate(self, terms: Iterable[Tuple[str, str]]) -> None:
+        with self._read_lock:
+            for term in set(terms):
+                evicted = self._cache.pop(term, None)
+                if evicted is not None:
+                    self._cached_ids -= len(evicted)
+
+    def count(self) -> int:
+        with self._read_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def checkpoint(self) -> None:
+        """Make every committed write durable"""
+        with self._write_lock:
+            self._writer.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self) -> None:
+        self._reader.close()
+        self._writer.close()
+
+    def destroy(self) -> None:
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import numpy as np
+
+SearchFn = Callable[..., Awaitable[Tuple[np.ndarray, np.ndarray]]]
+# Index name and the search options shared by a batch
+BatchKey = Tuple[str, Tuple[Tuple[str, Any], ...]]
+
+
+class SearchBatcher:
+    """
+    Groups single-vector searches on the same index that arrive within
+    `window_ms` of each other into one matrix search, then hands each
+    caller its row. A batch is sent early once it reaches `max_batch`.
+
+    Requests with different `k` share a batch: it is searched with the
+    largest `k` and each row is cut back to the caller's `k`. Requests
+    with different search options (such as `nprobe`) are batched apart.
+    """
+
+    def __init__(self, search: SearchFn, window_ms: float, max_batch: int):
+        self.search = search
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = {"requests": 0, "batches": 0, "largest_batch": 0}
+        self._pending: Dict[BatchKey, List[Tuple[np.ndarray, int, asyncio.Future]]] = {}
+        self._timers: Dict[BatchKey, asyncio.TimerHandle] = {}
+
+    async def submit(self, index_name: str, vector: np.ndarray, k: int, **options: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """Search one vector; returns its distances and ids rows"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (index_name, tuple(sorted(options.items())))
+        pending = self._pending.setdefault(key, [])
+        pending.append((vector, k, future))
+        self.stats["requests"] += 1
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key: BatchKey) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            asyncio.ensure_future(self._run(key, batch))
+
+    async def _run(self, key: BatchKey, batch: List[Tuple[np.ndarray, int, asyncio.Future]]) -> None:
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        index_name, options = key
+        queries = np.vstack([vector for vector, _, _ in batch])
+        try:
+            distances, ids = await self.search(index_name, queries, max(k for _, k, _ in batch), **dict(options))
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for row, (_, k, future) in enumerate(batch):
+            # The caller may have gone away while the batch was running
+            if not future.done():
+                future.set_result((distances[row, :k], ids[row, :k]))
+
+    def report(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            **self.stats,
+            "mean_batch": round(self.stats["requests"] / batches, 2) if batches else None,
+        }
@@ -0,0 +1,137 @@
+import json
+import os
+import struct
+import zlib
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+# Frame: payload length, CRC32 of the payload, log sequence number (LSN)
+FRAME_HEADER = struct.Struct("<IIQ")
+# Payload starts with the vector count and dimension, followed by the ids
+# (int64), the vectors (float32) and the metadata list as JSON
+RECORD_HEADER = struct.Struct("<II")
+# Record kinds, kept in the top bits of the dimension field. Logs written
+# before deletes existed hold only adds, which are kind 0. A delete
+# carries ids only; an upsert replaces its ids with the logged vectors.
+ADD, DELETE, UPSERT = 0, 1, 2
+KIND_SHIFT = 28
+
+
+class WalRecord(NamedTuple):
+    lsn: int
+    ids: np.ndarray
+    vectors: np.ndarray
+    metadata: Optional[List[Optional[Dict[str, Any]]]]
+    kind: int = ADD
+
+
+class WriteAheadLog:
+    """
+    Append-only log of vectors added to, deleted from or upserted into one
+    index, split into segments
+    named `<index>.wal.<first lsn>`. Snapshots record the last LSN they
+    contain; `rotate` closes the current segment so the segments it returns
+    can be removed once a snapshot covering them is on disk.
+
+    A frame is only valid if it is complete and its CRC matches, so a write
+    torn by a crash is detected on replay and cut off.
+    """
+
+    def __init__(self, directory: str, index_name: str, fsync: bool = True):
+        self.directory = directory
+        self.index_name = index_name
+        self.fsync = fsync
+        self.last_lsn = 0
+        # Bytes appended since the last rotation, i.e. not yet in a snapshot
+        self.pending_bytes = 0
+        self._file = None
+
+    def segments(self) -> List[str]:
+        prefix = f"{self.index_name}.wal."
+        names = [name for name in os.listdir(self.directory) if name.startswith(prefix)]
+        return [os.path.join(self.directory, name) for name in sorted(names, key=lambda name: int(name[len(prefix):]))]
+
+    def replay(self, after_lsn: int = 0) -> Iterator[WalRecord]:
+        """Yield logged records newer than `after_lsn`, truncating a torn tail"""
+        self.last_lsn = max(self.last_lsn, after_lsn)
+        for path in self.segments():
+            size = os.path.getsize(path)
+            with open(path, "r+b") as f:
+                while True:
+                    offset = f.tell()
+                    record = self._read_frame(f)
+                    if record is None:
+                        if offset < size:
+                            print(f"Truncating torn WAL tail of {path} at byte {offset}")
+                            f.truncate(offset)
+                        break
+                    self.last_lsn = max(self.last_lsn, record.lsn)
+                    if record.lsn > after_lsn:
+                        self.pending_bytes += f.tell() - offset
+                        yield record
+
+    def append(self, ids: np.ndarray, vectors: Optional[np.ndarray], metadata: Optional[List] = None, kind: int = ADD) -> int:
+        lsn = self.last_lsn + 1
+        ids = np.ascontiguousarray(ids, dtype="<i8")
+        vectors = np.ascontiguousarray(vectors if vectors is not None else np.empty((len(ids), 0)), dtype="<f4")
+        payload = b"".join((
+            RECORD_HEADER.pack(len(ids), vectors.shape[1] | kind << KIND_SHIFT),
+            ids.tobytes(),
+            vectors.tobytes(),
+            json.dumps(metadata).encode(),
+        ))
+        if self._file is None:
+            self._file = open(os.path.join(self.directory, f"{self.index_name}.wal.{lsn}"), "ab")
+        self._file.write(FRAME_HEADER.pack(len(payload), zlib.crc32(payload), lsn))
+        self._file.write(payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.last_lsn = lsn
+        self.pending_bytes += FRAME_HEADER.size + len(payload)
+        return lsn
+
+    def rotate(self) -> List[str]:
+        """Close the current segment and return every segment written so far"""
+        self.close()
+        self.pending_bytes = 0
+        return self.segments()
+
+    def remove(self, paths: List[str]) -> None:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def destroy(self) -> None:
+        """Close the log and delete all of its segments"""
+        self.close()
+        self.remove(self.segments())
+        self.last_lsn = 0
+        self.pending_bytes = 0
+
+    @staticmethod
+    def _read_frame(f) -> Optional[WalRecord]:
+        header = f.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return None
+        length, crc, lsn = FRAME_HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return None
+        count, dimension = RECORD_HEADER.unpack_from(payload)
+        kind, dimension = dimension >> KIND_SHIFT, dimension & ((1 << KIND_SHIFT) - 1)
+        ids_end = RECORD_HEADER.size + count * 8
+        vectors_end = ids_end + count * dimension * 4
+        return WalRecord(
+            lsn=lsn,
+            ids=np.frombuffer(payload, dtype="<i8", count=count, offset=RECORD_HEADER.size),
+            vectors=np.frombuffer(payload, dtype="<f4", count=count * dimension, offset=ids_end).reshape(count, dimension),
+            metadata=json.loads(payload[vectors_end:]),
+            kind=kind,
+        )
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+
+class WorkerPool:
+    """
+    Runs blocking FAISS calls on a dedicated thread pool so the event loop
+    keeps serving requests. For each operation name it records how long
+    calls waited for a free worker and how long they ran.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="faiss-worker")
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    async def run(self, operation: str, fn: Callable[..., Any], *args: Any) -> Any:
+        submitted = time.perf_counter()
+        timing: Dict[str, float] = {}
+
+        def call():
+            started = time.perf_counter()
+            timing["queue_wait"] = started - submitted
+            try:
+                return fn(*args)
+            finally:
+                timing["exec"] = time.perf_counter() - started
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            # Missing if the caller was cancelled before a worker picked the call up
+            if "exec" in timing:
+                self._record(operation, timing["queue_wait"], timing["exec"])
+
+    def _record(self, operation: str, queue_wait: float, exec_time: float) -> None:
+        stats = self._stats.setdefault(operation, {
+            "calls": 0, "queue_wait_total": 0.0, "queue_wait_max": 0.0, "exec_total": 0.0, "exec_max": 0.0
+        })
+        stats["calls"] += 1
+        stats["queue_wait_total"] += queue_wait
+        stats["queue_wait_max"] = max(stats["queue_wait_max"], queue_wait)
+        stats["exec_total"] += exec_time
+        stats["exec_max"] = max(stats["exec_max"], exec_time)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Per-operation call counts with mean and max queue wait and run time, in ms"""
+        return {
+            operation: {
+                "calls": stats["calls"],
+                "queue_wait_ms_mean": round(stats["queue_wait_total"] / stats["calls"] * 1000, 3),
+                "queue_wait_ms_max": round(stats["queue_wait_max"] * 1000, 3),
+                "exec_ms_mean": round(stats["exec_total"] / stats["calls"] * 1000, 3),
+                "exec_ms_max": round(stats["exec_max"] * 1000, 3),
+            }
+            for operation, stats in sorted(self._stats.items())
+        }
+
+
+class RWLock:
+    """
+    Asyncio reader/writer lock: any number of readers or a single writer.
+    A waiting writer holds back new readers so a steady stream of
+    searches cannot starve an add.
+    """
+
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def locked(self) -> bool:
+        return self._writer or self._readers > 0
+
+    @asynccontextmanager
+    async def read(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._condition:
+            self._writers_waiting += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writer and not self._readers)
+            finally:
+                self._writers_waiting -= 1
+                # A cancelled writer may have been the one holding readers back
+                self._condition.notify_all()
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer = False
+                self._condition.notify_all()
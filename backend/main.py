@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -5,6 +6,18 @@ from src.settings.settings import BackendBaseSettings
 from src.utils import RootLoggerConfig
 import logging
 from src.routers.v1.document import Document_Api_Router
+from src.routers.v1.diagnostics import Diagnostics_Api_Router, diagnostics_controller
+from src.routers.v1.tags import Tags_Api_Router, tag_controller
+from src.routers.v1.collab import Collab_Api_Router
+from src.database.connectors.mongo_connector import get_mongo_client
+from src.database.connectors.redis_connector import get_redis_pool
+from src.services.cache_service import get_document_cache
+from src.services.history_writer import get_history_writer
+from src.services.embedding_pipeline import get_embedding_pipeline
+from src.services.search_service import get_search_service
+from src.services.collab_service import get_collab_service
+from src.database.connectors.faiss_connector import get_faiss_client
+from src.constants import FAISS_SERVICE_URL
 
 # Application class
 class DocSyncApp:
@@ -12,10 +25,36 @@ class DocSyncApp:
         RootLoggerConfig()
         logging.info("Setting up application")
         self.settings = BackendBaseSettings()
-        self.app = FastAPI(**self.settings.set_backend_app_attributes)
+        self.app = FastAPI(**self.settings.set_backend_app_attributes, lifespan=self._lifespan)
         self._setup_middleware()
         self._setup_routes()
 
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """Startup and shutdown hooks for shared resources"""
+        logging.info("Ensuring database indexes")
+        await diagnostics_controller.index_service.ensure_indexes()
+        await tag_controller.service.ensure_counts()
+        await get_document_cache().start()
+        await get_history_writer().start()
+        await get_search_service().start()
+        await get_embedding_pipeline().start()
+        await get_collab_service().start()
+        yield
+        logging.info("Persisting open editing sessions")
+        await get_collab_service().stop()
+        logging.info("Indexing pending documents")
+        await get_embedding_pipeline().stop()
+        await get_search_service().stop()
+        logging.info("Flushing queued history entries")
+        await get_history_writer().stop()
+        await get_document_cache().stop()
+        logging.info("Closing database connection pools")
+        await get_mongo_client().close()
+        await get_redis_pool().disconnect()
+        if FAISS_SERVICE_URL:
+            await get_faiss_client().aclose()
+
     def _setup_middleware(self):
         """Configure CORS middleware"""
         logging.info("Setting up middleware")
@@ -37,6 +76,9 @@ class DocSyncApp:
 
         # Include API router when needed
         self.app.include_router(Document_Api_Router, tags=["Documents"])
+        self.app.include_router(Tags_Api_Router, tags=["Tags"])
+        self.app.include_router(Collab_Api_Router, tags=["Collaboration"])
+        self.app.include_router(Diagnostics_Api_Router, tags=["Diagnostics"])
 
     def run(self):
         """Run the application server"""
@@ -1 +1,11 @@
-from .database_constant import MONGO_URI, REDIS_URI
\ No newline at end of file
+from .database_constant import (
+    MONGO_URI,
+    REDIS_URI,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_SOCKET_TIMEOUT,
+    FAISS_SERVICE_URL,
+    FAISS_MAX_CONNECTIONS,
+    FAISS_TIMEOUT,
+)
@@ -5,8 +5,20 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 REDIS_URI = os.getenv("REDIS_URI")
 
+# Connection pool sizing for the async clients
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+
+# FAISS vector service; semantic search and the embedding pipeline are
+# disabled when no URL is set
+FAISS_SERVICE_URL = os.getenv("FAISS_SERVICE_URL")
+FAISS_MAX_CONNECTIONS = int(os.getenv("FAISS_MAX_CONNECTIONS", 20))
+FAISS_TIMEOUT = float(os.getenv("FAISS_TIMEOUT", 30))
+
 
 if not MONGO_URI:
     raise ValueError("No MONGO_URI set for MongoDB")
 if not REDIS_URI:
-    raise ValueError("No REDIS_URI set for Redis")
\ No newline at end of file
+    raise ValueError("No REDIS_URI set for Redis")
@@ -0,0 +1,18 @@
+import httpx
+from src.constants import FAISS_SERVICE_URL, FAISS_MAX_CONNECTIONS, FAISS_TIMEOUT
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def get_faiss_client() -> httpx.AsyncClient:
+    """
+    Get the async HTTP client for the FAISS service with LRU caching.
+    Connections are kept alive and reused; requests wait for a free one
+    once FAISS_MAX_CONNECTIONS are in use.
+    :return: httpx.AsyncClient
+    """
+    return httpx.AsyncClient(
+        base_url=FAISS_SERVICE_URL,
+        limits=httpx.Limits(max_connections=FAISS_MAX_CONNECTIONS, max_keepalive_connections=FAISS_MAX_CONNECTIONS),
+        timeout=FAISS_TIMEOUT,
+    )
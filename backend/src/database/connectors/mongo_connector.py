@@ -1,14 +1,26 @@
-from pymongo import MongoClient
-from src.constants import MONGO_URI
+from pymongo import AsyncMongoClient
+from src.constants import MONGO_URI, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE
 from functools import lru_cache
 
 
 @lru_cache(maxsize=1)
+def get_mongo_client() -> AsyncMongoClient:
+    """
+    Get the async MongoDB client with LRU caching.
+    The client owns a bounded connection pool, so concurrent queries
+    wait for a free connection instead of opening unbounded sockets.
+    :return: AsyncMongoClient
+    """
+    return AsyncMongoClient(
+        MONGO_URI,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+    )
+
+
 def get_mongo_instance():
     """
-    Get MongoDB connection with LRU caching
-    :return: MongoDB connection
+    Get MongoDB database handle backed by the cached async client
+    :return: MongoDB database
     """
-    client = MongoClient(MONGO_URI)
-    db = client["documents_db"]
-    return db
+    return get_mongo_client()["documents_db"]
@@ -1,13 +1,27 @@
-import redis
-from src.constants import REDIS_URI
+import redis.asyncio as redis
+from src.constants import REDIS_URI, REDIS_MAX_CONNECTIONS, REDIS_SOCKET_TIMEOUT
 from functools import lru_cache
 
 
 @lru_cache(maxsize=1)
-def get_redis_client():
+def get_redis_pool() -> redis.BlockingConnectionPool:
     """
-    Get Redis connection with LRU caching
+    Get the shared async Redis connection pool with LRU caching.
+    Callers wait for a free connection once the pool is exhausted.
+    :return: Redis connection pool
+    """
+    return redis.BlockingConnectionPool.from_url(
+        REDIS_URI,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        timeout=REDIS_SOCKET_TIMEOUT,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_redis_client() -> redis.Redis:
+    """
+    Get async Redis connection with LRU caching
     :return: Redis connection
     """
-    redis_client = redis.Redis.from_url(REDIS_URI)  
-    return redis_client
+    return redis.Redis(connection_pool=get_redis_pool())
@@ -0,0 +1,25 @@
+"""
+Rewrite full-copy document history into snapshot + delta form.
+
+    python -m src.jobs.compact_history [--document-id ID]
+"""
+import argparse
+import asyncio
+import logging
+from src.utils import RootLoggerConfig
+from src.services.history_service import HistoryService
+
+
+async def run(document_id: int | None = None) -> None:
+    stats = await HistoryService().compact(document_id)
+    if stats["bytes_before"]:
+        ratio = stats["bytes_before"] / max(stats["bytes_after"], 1)
+        logging.info(f"History bytes {stats['bytes_before']} -> {stats['bytes_after']} ({ratio:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact document history into deltas")
+    parser.add_argument("--document-id", type=int, default=None, help="Only compact this document")
+    args = parser.parse_args()
+    RootLoggerConfig()
+    asyncio.run(run(args.document_id))
@@ -0,0 +1,20 @@
+"""
+Recompute the per-tag document counts behind GET /v1/tags from Mongo,
+e.g. after Redis lost them or increments failed. Safe to rerun.
+
+    python -m src.jobs.rebuild_tag_counts
+"""
+import asyncio
+import logging
+from src.utils import RootLoggerConfig
+from src.services.tag_service import TagService
+
+
+async def run() -> None:
+    tags = await TagService().rebuild()
+    logging.info(f"Tag counts rebuilt for {tags} tags")
+
+
+if __name__ == "__main__":
+    RootLoggerConfig()
+    asyncio.run(run())
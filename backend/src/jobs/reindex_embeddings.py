@@ -0,0 +1,52 @@
+"""
+Index every document into FAISS, e.g. after enabling the embedding
+pipeline or when documents were dropped from a full queue. Unchanged
+chunks are skipped, so rerunning is cheap.
+
+    python -m src.jobs.reindex_embeddings [--batch-size N]
+"""
+import argparse
+import asyncio
+import logging
+from src.utils import RootLoggerConfig
+from src.models.document import Document
+from src.services.embedding_pipeline import get_embedding_pipeline
+from src.database.connectors.faiss_connector import get_faiss_client
+
+
+async def run(batch_size: int) -> None:
+    pipeline = get_embedding_pipeline()
+    if not pipeline.enabled:
+        raise SystemExit("FAISS_SERVICE_URL is not set")
+    totals = {"documents": 0, "embedded": 0, "skipped": 0, "deleted": 0}
+    last_id = None
+    try:
+        while True:
+            query = {"id": {"$gt": last_id}} if last_id is not None else {}
+            docs = await pipeline.mongo_handler.find_many(
+                "documents",
+                query,
+                limit=batch_size,
+                sort=[("id", 1)],
+                projection={"_id": 0}
+            )
+            if not docs:
+                break
+            documents = [Document.model_validate(doc) for doc in docs]
+            counts = await pipeline.index_documents(documents)
+            totals["documents"] += len(documents)
+            for key, value in counts.items():
+                totals[key] += value
+            last_id = documents[-1].id
+            logging.info(f"Indexed documents up to id {last_id}: {totals}")
+    finally:
+        await get_faiss_client().aclose()
+    logging.info(f"Reindex finished: {totals}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index all documents into the FAISS service")
+    parser.add_argument("--batch-size", type=int, default=100, help="Documents per batch")
+    args = parser.parse_args()
+    RootLoggerConfig()
+    asyncio.run(run(args.batch_size))
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List, Literal
+from src.models.document import PatchOp
+
+
+class CollabOp(BaseModel):
+    """An edit sent over a document WebSocket"""
+    type: Literal["op"] = "op"
+    # Revision the ops were made against, and a per-connection number that
+    # comes back in the broadcast batch that includes the op
+    revision: int
+    seq: int
+    ops: List[PatchOp]
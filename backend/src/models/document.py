@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Literal
 
 
 class Document(BaseModel):
@@ -12,8 +12,58 @@ class Document(BaseModel):
     updated_at: Optional[str]
 
 
+class PatchOp(BaseModel):
+    """A ranged edit; `pos` is a character offset into the patched version"""
+    op: Literal["insert", "delete"]
+    pos: int
+    # Text to insert, or number of characters to delete
+    text: str = ""
+    length: int = 0
+
+
+class DocumentPatch(BaseModel):
+    # Version the ops were made against; the patch fails with 409 otherwise
+    version: int
+    ops: List[PatchOp] = []
+    title: Optional[str] = None
+    tags: Optional[List[str]] = None
+
+
 class DocumentList(BaseModel):
     items: List[Document]
-    total: int
+    total: Optional[int]
     skip: int
-    limit: int
\ No newline at end of file
+    limit: int
+    next_cursor: Optional[str] = None
+
+
+class BulkItemResult(BaseModel):
+    id: Optional[int] = None
+    status: int
+    error: Optional[str] = None
+
+
+class BulkCreateResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+class DocumentBatch(BaseModel):
+    items: List[Document]
+    missing: List[str]
+
+
+class DocumentSearchHit(BaseModel):
+    document: Document
+    score: float
+    # Best matching chunk, for hits found by vector search
+    chunk: Optional[int] = None
+
+
+class DocumentSearchResult(BaseModel):
+    query: str
+    mode: str
+    total: Optional[int] = None
+    items: List[DocumentSearchHit]
+    facets: Dict[str, int] = {}
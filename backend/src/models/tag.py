@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+
+class TagList(BaseModel):
+    items: List[TagCount]
+    total: int
+    skip: int
+    limit: int
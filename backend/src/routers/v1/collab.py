@@ -0,0 +1,75 @@
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from src.models.collab import CollabOp
+from src.services.collab_service import CollabClient, get_collab_service
+
+class CollabController:
+    def __init__(self):
+        self.API_VERSION = "v1"
+        self.router = APIRouter()
+        self.service = get_collab_service()
+        self._register_routes()
+
+    def _register_routes(self):
+        self.router.add_api_websocket_route(
+            f"/{self.API_VERSION}/documents/{{document_id}}/ws",
+            self.edit_document
+        )
+
+    async def edit_document(self, websocket: WebSocket, document_id: int):
+        await websocket.accept()
+        try:
+            session, client = await self.service.join(document_id)
+        except HTTPException as e:
+            # 4404 for a missing document, 4500 for a failure to load it
+            await websocket.close(code=4000 + e.status_code, reason=str(e.detail))
+            return
+        except Exception as e:
+            logging.error(f"Error opening editing session of document {document_id}: {str(e)}")
+            await websocket.close(code=4500, reason="Failed to open editing session")
+            return
+        sender = asyncio.create_task(self._send(websocket, client))
+        try:
+            while True:
+                message = await websocket.receive_text()
+                try:
+                    op = CollabOp.model_validate_json(message)
+                except ValidationError as e:
+                    seq = self._seq(message)
+                    client.error(seq, str(e.errors(include_url=False, include_context=False)))
+                    continue
+                session.submit(client, op)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+            await self.service.leave(session, client)
+
+    @staticmethod
+    async def _send(websocket: WebSocket, client: CollabClient):
+        try:
+            while True:
+                frame = await client.queue.get()
+                if isinstance(frame, tuple):
+                    await websocket.close(code=frame[0], reason=frame[1])
+                    return
+                await websocket.send_text(frame)
+        except (WebSocketDisconnect, RuntimeError):
+            # Closed by the client; the receive loop ends the session
+            return
+
+    @staticmethod
+    def _seq(message: str):
+        """The seq of an invalid op, if it has one, so the client can match the error"""
+        try:
+            seq = json.loads(message).get("seq")
+        except (ValueError, AttributeError):
+            return None
+        return seq if isinstance(seq, int) else None
+
+# Initialize the controller and expose the router
+collab_controller = CollabController()
+Collab_Api_Router = collab_controller.router
@@ -0,0 +1,68 @@
+from fastapi import APIRouter
+from typing import Any, Dict
+from src.services.index_service import IndexService
+from src.services.cache_service import get_document_cache
+from src.services.history_writer import get_history_writer
+from src.services.embedding_pipeline import get_embedding_pipeline
+from src.services.search_service import get_search_service
+
+class DiagnosticsController:
+    def __init__(self):
+        self.API_VERSION = "v1"
+        self.router = APIRouter()
+        self.index_service = IndexService()
+        self._register_routes()
+
+    def _register_routes(self):
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/diagnostics/indexes",
+            self.get_index_report,
+            methods=["GET"],
+            response_model=Dict[str, Any]
+        )
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/diagnostics/cache",
+            self.get_cache_stats,
+            methods=["GET"],
+            response_model=Dict[str, Any]
+        )
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/diagnostics/history-writer",
+            self.get_history_writer_stats,
+            methods=["GET"],
+            response_model=Dict[str, Any]
+        )
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/diagnostics/embeddings",
+            self.get_embedding_stats,
+            methods=["GET"],
+            response_model=Dict[str, Any]
+        )
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/diagnostics/search",
+            self.get_search_stats,
+            methods=["GET"],
+            response_model=Dict[str, Any]
+        )
+
+    async def get_index_report(self) -> Dict[str, Any]:
+        return await self.index_service.diagnose()
+
+    async def get_cache_stats(self) -> Dict[str, Any]:
+        cache = get_document_cache()
+        stats = cache.stats()
+        stats["redis"].update(await cache.server_stats())
+        return stats
+
+    async def get_history_writer_stats(self) -> Dict[str, Any]:
+        return get_history_writer().stats()
+
+    async def get_embedding_stats(self) -> Dict[str, Any]:
+        return get_embedding_pipeline().stats()
+
+    async def get_search_stats(self) -> Dict[str, Any]:
+        return get_search_service().stats()
+
+# Initialize the controller and expose the router
+diagnostics_controller = DiagnosticsController()
+Diagnostics_Api_Router = diagnostics_controller.router
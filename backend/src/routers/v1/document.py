@@ -1,7 +1,10 @@
-from fastapi import APIRouter, status, Query
-from typing import List, Dict, Tuple
-from src.models.document import Document, DocumentList
+from fastapi import APIRouter, status, Query, Response, Body, Header
+from typing import Any, List, Dict, Tuple, Optional, Literal
+from src.models.document import (
+    Document, DocumentList, BulkCreateResult, DocumentBatch, DocumentPatch, DocumentSearchResult
+)
 from src.services.document_service import DocumentService
+from src.utils.etag import document_etag, list_etag, etag_matches, http_date
 
 class DocumentController:
     def __init__(self):
@@ -24,45 +27,155 @@ class DocumentController:
             methods=["GET"],
             response_model=DocumentList
         )
+        # Registered before /documents/{document_id} so "batch" is not taken as an id
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/documents/bulk",
+            self.create_documents,
+            methods=["POST"],
+            response_model=BulkCreateResult,
+            status_code=status.HTTP_201_CREATED
+        )
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/documents/batch",
+            self.get_documents_batch,
+            methods=["GET"],
+            response_model=DocumentBatch
+        )
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/documents/search",
+            self.search_documents,
+            methods=["GET"],
+            response_model=DocumentSearchResult
+        )
         self.router.add_api_route(
             f"/{self.API_VERSION}/documents/{{document_id}}",
             self.get_document,
             methods=["GET"],
             response_model=Document
         )
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/documents/{{document_id}}",
+            self.patch_document,
+            methods=["PATCH"],
+            response_model=Document
+        )
         self.router.add_api_route(
             f"/{self.API_VERSION}/documents/{{document_id}}/history",
             self.get_document_history,
             methods=["GET"],
             response_model=List[Dict]
         )
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/documents/{{document_id}}/versions/{{version}}",
+            self.get_document_version,
+            methods=["GET"],
+            response_model=Dict
+        )
 
     async def create_document(self, document: Document) -> Document:
         return await self.service.create(document)
 
+    async def create_documents(
+        self,
+        response: Response,
+        documents: List[Dict[str, Any]] = Body(...)
+    ) -> BulkCreateResult:
+        result = await self.service.create_many(documents)
+        if result.failed:
+            response.status_code = status.HTTP_207_MULTI_STATUS
+        return result
+
+    async def get_documents_batch(
+        self,
+        ids: List[str] = Query(..., description="Document ids, repeated or comma-separated")
+    ) -> DocumentBatch:
+        document_ids = [part.strip() for value in ids for part in value.split(",") if part.strip()]
+        items, missing = await self.service.get_many(document_ids)
+        return DocumentBatch(items=items, missing=missing)
+
+    async def search_documents(
+        self,
+        q: str = Query(..., min_length=1, description='Words and "quoted phrases" to search for'),
+        k: int = Query(default=10, ge=1, le=50, description="Documents to return"),
+        mode: Literal["hybrid", "keyword", "vector"] = Query(default="hybrid"),
+        tag: List[str] = Query(default=[], description="Only documents with every one of these tags")
+    ) -> DocumentSearchResult:
+        return await self.service.search(q, k, mode, tag)
+
     async def list_documents(
         self,
+        response: Response,
         skip: int = Query(default=0, ge=0),
-        limit: int = Query(default=10, ge=1, le=100)
+        limit: int = Query(default=10, ge=1, le=100),
+        after: Optional[str] = Query(default=None, description="Cursor from a previous page's next_cursor"),
+        count: Literal["estimated", "exact", "none"] = Query(default="estimated"),
+        tag: List[str] = Query(default=[], description="Only documents with these tags"),
+        match: Literal["all", "any"] = Query(default="all", description="Require every tag, or any one of them"),
+        if_none_match: Optional[str] = Header(default=None)
     ) -> DocumentList:
-        documents, total = await self.service.list_all(skip, limit)
+        documents, total, next_cursor = await self.service.list_all(skip, limit, after, count, tag, match)
+        etag = list_etag(((document.id, document.version) for document in documents), total, next_cursor)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response.headers["ETag"] = etag
         return DocumentList(
             items=documents,
             total=total,
             skip=skip,
-            limit=limit
+            limit=limit,
+            next_cursor=next_cursor
         )
 
-    async def get_document(self, document_id: str) -> Document:
-        return await self.service.get(document_id)
+    async def get_document(
+        self,
+        document_id: int,
+        if_none_match: Optional[str] = Header(default=None)
+    ) -> Response:
+        if if_none_match:
+            # Answered from the small version key, without the document body
+            info = await self.service.get_version_info(document_id)
+            if info and etag_matches(if_none_match, document_etag(document_id, info["version"])):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers=self._validators(document_id, info)
+                )
+
+        # The cached JSON is sent as is; response_model only documents the shape
+        content, info = await self.service.get_json(document_id)
+        return Response(
+            content=content,
+            media_type="application/json",
+            headers=self._validators(document_id, info)
+        )
+
+    async def patch_document(self, response: Response, document_id: int, patch: DocumentPatch) -> Document:
+        document = await self.service.patch(document_id, patch)
+        response.headers["ETag"] = document_etag(document_id, document.version)
+        return document
+
+    @staticmethod
+    def _validators(document_id: int, info: Dict) -> Dict[str, str]:
+        headers = {"ETag": document_etag(document_id, info["version"])}
+        last_modified = http_date(info.get("updated_at"))
+        if last_modified:
+            headers["Last-Modified"] = last_modified
+        return headers
 
     async def get_document_history(
         self,
-        document_id: str,
+        response: Response,
+        document_id: int,
         skip: int = Query(default=0, ge=0),
-        limit: int = Query(default=10, ge=1, le=100)
+        limit: int = Query(default=10, ge=1, le=100),
+        before: Optional[str] = Query(default=None, description="Cursor from a previous page's X-Next-Cursor header")
     ) -> List[Dict]:
-        return await self.service.get_history(document_id, skip, limit)
+        history, next_cursor = await self.service.get_history(document_id, skip, limit, before)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return history
+
+    async def get_document_version(self, document_id: int, version: int) -> Dict:
+        return await self.service.get_version(document_id, version)
 
 # Initialize the controller and expose the router
 document_controller = DocumentController()
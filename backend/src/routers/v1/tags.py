@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Query
+from src.models.tag import TagList
+from src.services.tag_service import TagService
+
+class TagController:
+    def __init__(self):
+        self.API_VERSION = "v1"
+        self.router = APIRouter()
+        self.service = TagService()
+        self._register_routes()
+
+    def _register_routes(self):
+        self.router.add_api_route(
+            f"/{self.API_VERSION}/tags",
+            self.list_tags,
+            methods=["GET"],
+            response_model=TagList
+        )
+
+    async def list_tags(
+        self,
+        skip: int = Query(default=0, ge=0),
+        limit: int = Query(default=100, ge=1, le=1000)
+    ) -> TagList:
+        return await self.service.list_counts(skip, limit)
+
+# Initialize the controller and expose the router
+tag_controller = TagController()
+Tags_Api_Router = tag_controller.router
@@ -0,0 +1,425 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from redis.exceptions import RedisError
+from src.database.connectors.redis_connector import get_redis_client
+from src.models.document import Document
+from src.settings import BackendBaseSettings
+from src.utils.cache import LocalCache
+from src.utils.compression import get_codec
+
+INVALIDATION_CHANNEL = "document:invalidate"
+
+# Caches a document body (KEYS[1]) and its version metadata (KEYS[2]) for
+# ARGV[2] seconds, unless a newer version than ARGV[1] is cached; 1 if written
+SET_IF_NEWER_SCRIPT = """
+local current = redis.call('GET', KEYS[2])
+if current and tonumber(cjson.decode(current).version) > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SETEX', KEYS[1], ARGV[2], ARGV[3])
+redis.call('SETEX', KEYS[2], ARGV[2], ARGV[4])
+return 1
+"""
+
+# Takes a free lease for ARGV[1] (2), or extends it to ARGV[2] ms if ARGV[1]
+# holds it (1); 0 if another holder has it
+HOLD_LEASE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 2
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+# Deletes a lease only while ARGV[1] still holds it
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class CachedDocument:
+    """
+    A cached document as its serialized JSON, which is what responses and
+    Redis need. Values read from Redis are decompressed when the entry is
+    built, so the local tier never holds both forms, and the `Document`
+    model is only validated on first access.
+    """
+    __slots__ = ("_raw", "_document")
+
+    def __init__(self, raw: bytes, document: Optional[Document] = None):
+        self._raw = raw
+        self._document = document
+
+    @classmethod
+    def from_document(cls, document: Document) -> "CachedDocument":
+        return cls(document.model_dump_json().encode(), document)
+
+    @classmethod
+    def from_stored(cls, stored: bytes) -> "CachedDocument":
+        return cls(get_codec().decode(stored))
+
+    @property
+    def raw(self) -> bytes:
+        return self._raw
+
+    @property
+    def stored(self) -> bytes:
+        """The Redis representation, compressed above the codec threshold; not kept"""
+        return get_codec().encode(self._raw)
+
+    @property
+    def size(self) -> int:
+        """
+        Bytes charged to the local tier: the JSON plus the model validated
+        from it, which holds the same text. Charged up front, since the
+        model may be built after the entry is inserted.
+        """
+        return 2 * len(self._raw)
+
+    @property
+    def document(self) -> Document:
+        if self._document is None:
+            self._document = Document.model_validate_json(self.raw)
+        return self._document
+
+    @property
+    def version_info(self) -> Optional[Dict[str, Any]]:
+        """Version metadata, if the model has already been validated"""
+        if self._document is None:
+            return None
+        return version_info(self._document)
+
+
+def version_info(document: Document) -> Dict[str, Any]:
+    return {"version": document.version, "updated_at": document.updated_at}
+
+
+class DocumentCache:
+    """
+    Two-tier document cache: serialized documents in a bounded in-process
+    LRU, backed by Redis. Writes are announced on a Redis pub/sub
+    channel so every other worker drops its local copy.
+
+    Fills through `get_or_load` are coalesced per key within a process and
+    guarded by a short Redis lease across processes, and hot keys are
+    refreshed probabilistically before they expire (XFetch).
+    """
+
+    def __init__(self):
+        self.redis_client = get_redis_client()
+        self.redis_ttl = BackendBaseSettings.DOCUMENT_CACHE_TTL
+        self.local = LocalCache(
+            max_entries=BackendBaseSettings.LOCAL_CACHE_MAX_ENTRIES,
+            max_bytes=BackendBaseSettings.LOCAL_CACHE_MAX_BYTES,
+            ttl=BackendBaseSettings.LOCAL_CACHE_TTL,
+            sizeof=lambda entry: entry.size + 128
+        )
+        self.instance_id = uuid.uuid4().hex
+        self.redis_stats = {"hits": 0, "misses": 0, "writes": 0, "stale_writes": 0}
+        self.fill_lease_ms = BackendBaseSettings.CACHE_FILL_LEASE_MS
+        self.early_refresh_beta = BackendBaseSettings.CACHE_EARLY_REFRESH_BETA
+        self.fill_stats = {"fills": 0, "coalesced": 0, "early_refreshes": 0, "lease_waits": 0}
+        self._fill_seconds = 0.0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def key(document_id) -> str:
+        return f"document:{document_id}"
+
+    @staticmethod
+    def version_key(document_id) -> str:
+        # Not under "document:", where it could pass for the key of a document id
+        return f"document_version:{document_id}"
+
+    async def get_version_info(self, document_id) -> Optional[Dict[str, Any]]:
+        """
+        Version and updated_at of a cached document, for conditional
+        requests. Reads the small version key, never the document body.
+        """
+        entry = self.local.get(str(document_id))
+        if entry is not None and entry.version_info is not None:
+            return entry.version_info
+        cached = await self.redis_client.get(self.version_key(document_id))
+        return json.loads(cached) if cached else None
+
+    async def get(self, document_id) -> Optional[Document]:
+        entry = self.local.get(str(document_id))
+        if entry is not None:
+            return entry.document
+
+        cached = await self.redis_client.get(self.key(document_id))
+        if not cached:
+            self.redis_stats["misses"] += 1
+            return None
+        self.redis_stats["hits"] += 1
+        entry = CachedDocument.from_stored(cached)
+        self.local.set(str(document_id), entry)
+        return entry.document
+
+    async def get_many(self, document_ids: Iterable) -> Dict[str, Document]:
+        """Look up many documents: local tier first, then one Redis MGET"""
+        found: Dict[str, Document] = {}
+        remaining = []
+        for key in map(str, document_ids):
+            entry = self.local.get(key)
+            if entry is not None:
+                found[key] = entry.document
+            else:
+                remaining.append(key)
+        if not remaining:
+            return found
+
+        values = await self.redis_client.mget([self.key(key) for key in remaining])
+        for key, cached in zip(remaining, values):
+            if not cached:
+                self.redis_stats["misses"] += 1
+                continue
+            self.redis_stats["hits"] += 1
+            entry = CachedDocument.from_stored(cached)
+            self.local.set(key, entry)
+            found[key] = entry.document
+        return found
+
+    async def get_or_load(self,
+                          document_id,
+                          loader: Callable[[], Awaitable[Optional[Document]]]) -> Optional[Document]:
+        """
+        Return the cached document, calling `loader` to fill a miss. Only one
+        fill per key runs at a time in this process; concurrent callers
+        await the same result.
+        """
+        entry = await self.get_entry_or_load(document_id, loader)
+        return entry.document if entry is not None else None
+
+    async def get_entry_or_load(self,
+                                document_id,
+                                loader: Callable[[], Awaitable[Optional[Document]]]) -> Optional[CachedDocument]:
+        """Like `get_or_load`, but returns the cache entry without validating it"""
+        key = str(document_id)
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            self.fill_stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # The request that led the fill went away; try again
+                return await self.get_entry_or_load(document_id, loader)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = flight
+        try:
+            entry = await self._read_through(key, loader)
+            flight.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            flight.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def _read_through(self, key: str, loader) -> Optional[CachedDocument]:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(self.key(key))
+            pipe.pttl(self.key(key))
+            cached, ttl_ms = await pipe.execute()
+
+        if cached:
+            self.redis_stats["hits"] += 1
+            entry = CachedDocument.from_stored(cached)
+            self.local.set(key, entry)
+            if not self._should_refresh_early(ttl_ms) or not await self._acquire_fill_lease(key):
+                return entry
+            self.fill_stats["early_refreshes"] += 1
+            return await self._fill(key, loader, leased=True)
+
+        self.redis_stats["misses"] += 1
+        deadline = time.monotonic() + self.fill_lease_ms / 1000
+        while not await self._acquire_fill_lease(key):
+            # Another process is filling this key; wait for its result
+            self.fill_stats["lease_waits"] += 1
+            await asyncio.sleep(0.02)
+            cached = await self.redis_client.get(self.key(key))
+            if cached:
+                entry = CachedDocument.from_stored(cached)
+                self.local.set(key, entry)
+                return entry
+            if time.monotonic() > deadline:
+                # The holder is slow or gone; fill without the lease
+                return await self._fill(key, loader, leased=False)
+        return await self._fill(key, loader, leased=True)
+
+    async def _fill(self, key: str, loader, leased: bool) -> Optional[CachedDocument]:
+        started = time.monotonic()
+        try:
+            document = await loader()
+            entry = None
+            if document is not None:
+                entry = await self.set(document)
+            self.fill_stats["fills"] += 1
+            return entry
+        finally:
+            elapsed = time.monotonic() - started
+            self._fill_seconds = elapsed if not self._fill_seconds else 0.8 * self._fill_seconds + 0.2 * elapsed
+            if leased:
+                # Compare-and-delete: after expiry the lease may belong to another process
+                await self.redis_client.eval(RELEASE_LEASE_SCRIPT, 1, self._lease_key(key), self.instance_id)
+
+    def _should_refresh_early(self, ttl_ms: Optional[int]) -> bool:
+        """XFetch: refresh with a probability that grows as expiry approaches"""
+        if ttl_ms is None or ttl_ms < 0 or not self._fill_seconds:
+            return False
+        gap = -self._fill_seconds * self.early_refresh_beta * math.log(1.0 - random.random())
+        return gap >= ttl_ms / 1000
+
+    async def _acquire_fill_lease(self, key: str) -> bool:
+        return bool(await self.redis_client.set(
+            self._lease_key(key), self.instance_id, nx=True, px=self.fill_lease_ms
+        ))
+
+    @staticmethod
+    def _lease_key(key: str) -> str:
+        return f"lease:document:{key}"
+
+    async def set(self, document: Document, invalidate_peers: bool = False) -> CachedDocument:
+        """
+        Cache a document in both tiers. Pass `invalidate_peers` when the
+        document was written, so other workers evict their stale copies.
+        """
+        entry = CachedDocument.from_document(document)
+        await self._set_if_newer([(document, entry)], invalidate_peers)
+        return entry
+
+    async def set_many(self, documents: List[Document], invalidate_peers: bool = False) -> None:
+        """Cache many documents with a single pipelined Redis round trip"""
+        if not documents:
+            return
+        await self._set_if_newer(
+            [(document, CachedDocument.from_document(document)) for document in documents], invalidate_peers
+        )
+
+    async def _set_if_newer(self, entries: List[Tuple[Document, CachedDocument]], invalidate_peers: bool) -> None:
+        """
+        Writes and fills can finish out of order, so Redis only takes a
+        document whose version is not older than the cached one. A stale
+        write also drops the local copy; the next read gets the newer one.
+        """
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for document, entry in entries:
+                pipe.eval(
+                    SET_IF_NEWER_SCRIPT, 2, self.key(document.id), self.version_key(document.id),
+                    document.version, self.redis_ttl, entry.stored, json.dumps(version_info(document))
+                )
+                if invalidate_peers:
+                    pipe.publish(INVALIDATION_CHANNEL, self._invalidation_message(document.id, document.version))
+            results = await pipe.execute()
+        written = results[::2] if invalidate_peers else results
+        for (document, entry), applied in zip(entries, written):
+            if applied:
+                self.local.set(str(document.id), entry)
+                self.redis_stats["writes"] += 1
+            else:
+                self.local.invalidate(str(document.id))
+                self.redis_stats["stale_writes"] += 1
+
+    async def invalidate(self, document_id) -> None:
+        self.local.invalidate(str(document_id))
+        await self.redis_client.delete(self.key(document_id), self.version_key(document_id))
+        await self._publish_invalidation(document_id)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "local": self.local.stats(),
+            "redis": dict(self.redis_stats),
+            "fill": {**self.fill_stats, "avg_fill_ms": round(self._fill_seconds * 1000, 3)},
+            "compression": get_codec().stats(),
+        }
+
+    async def server_stats(self) -> Dict[str, Optional[int]]:
+        """
+        Evictions and expirations from Redis `INFO stats`. Redis counts them
+        server-wide, so they include keys other than cached documents.
+        """
+        try:
+            info = await self.redis_client.info("stats")
+        except RedisError as e:
+            logging.warning(f"Could not read Redis eviction stats: {str(e)}")
+            return {"evictions": None, "expirations": None}
+        return {"evictions": info.get("evicted_keys"), "expirations": info.get("expired_keys")}
+
+    async def start(self) -> None:
+        """Start listening for invalidations published by other workers"""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _publish_invalidation(self, document_id) -> None:
+        await self.redis_client.publish(INVALIDATION_CHANNEL, self._invalidation_message(document_id))
+
+    def _invalidation_message(self, document_id, version: Optional[int] = None) -> str:
+        message = {"id": str(document_id), "origin": self.instance_id}
+        # Lets listeners that already have this version skip reloading it
+        if version is not None:
+            message["version"] = version
+        return json.dumps(message)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload.get("origin") != self.instance_id:
+                        self.local.invalidate(payload["id"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Invalidations may have been missed while disconnected
+                logging.error(f"Cache invalidation listener failed: {str(e)}")
+                self.local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+@lru_cache(maxsize=1)
+def get_document_cache() -> DocumentCache:
+    """
+    Get the process-wide document cache with LRU caching
+    :return: DocumentCache
+    """
+    return DocumentCache()
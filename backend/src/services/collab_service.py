@@ -0,0 +1,598 @@
+"""
+Real-time editing sessions for documents opened over WebSocket.
+
+Every worker with editors on a document keeps the document in memory and
+applies the same sequence of ops. Ops are ordered in Redis: a worker
+collects client ops for COLLAB_BATCH_WINDOW_MS, transforms them against
+everything sequenced since each client's revision and appends them as one
+batch with a compare-and-append on the head revision; the batch is
+published on the document channel in the same round trip. When another
+worker appended first, the worker catches up from the op log and
+transforms again.
+
+Protocol, JSON text frames:
+  server -> client  {"type": "init", "client", "revision", "version", "content"}
+  client -> server  {"type": "op", "revision", "seq", "ops": [PatchOp, ...]}
+  server -> client  {"type": "ops", "start", "revision", "ops": [{"client", "seq", "delta"}, ...]}
+  server -> client  {"type": "error", "seq", "detail"}
+A client has one op in flight: it sees its own (client, seq) in an "ops"
+batch as the acknowledgement and combines later edits until then.
+
+The content reaches Mongo through a version-guarded write every
+COLLAB_PERSIST_INTERVAL_S, made by the one worker that holds the
+document's lease. A write made outside the session (a PATCH) is rebased
+onto the session as an op.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from src.database.connectors.redis_connector import get_redis_client
+from src.models.collab import CollabOp
+from src.models.document import Document
+from src.services.cache_service import HOLD_LEASE_SCRIPT, RELEASE_LEASE_SCRIPT
+from src.services.document_service import DocumentService
+from src.settings import BackendBaseSettings
+from src.utils.text_delta import (
+    DeltaOp, apply_delta, compose_delta, compute_delta, delta_length, patch_to_delta, transform_delta
+)
+
+# Appends a batch if the head is still at ARGV[1]; returns -1, or the head
+APPEND_SCRIPT = """
+local head = tonumber(redis.call('HGET', KEYS[1], 'head') or '0')
+if head ~= tonumber(ARGV[1]) then
+    return head
+end
+redis.call('HSET', KEYS[1], 'head', head + tonumber(ARGV[2]))
+redis.call('ZADD', KEYS[2], head, ARGV[3])
+redis.call('PUBLISH', ARGV[4], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return -1
+"""
+
+
+class CollabClient:
+    """One connection; frames, or a (code, reason) to close with, are queued for its sender task"""
+    __slots__ = ("id", "queue", "dropped")
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.dropped = False
+
+    def send(self, frame: str) -> None:
+        if self.dropped:
+            return
+        if self.queue.qsize() >= BackendBaseSettings.COLLAB_CLIENT_QUEUE:
+            # A client that cannot keep up is disconnected instead of
+            # buffering without bound
+            self.close(1013, "Client is too slow")
+            return
+        self.queue.put_nowait(frame)
+
+    def close(self, code: int, reason: str) -> None:
+        """Drop queued frames and have the sender close the connection"""
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait((code, reason))
+
+    def error(self, seq: Optional[int], detail: str) -> None:
+        self.send(json.dumps({"type": "error", "seq": seq, "detail": detail}))
+
+
+class DocumentSession:
+    """The in-memory state of one document on this worker"""
+
+    def __init__(self, service: "CollabService", document_id: int):
+        self.service = service
+        self.redis_client = service.redis_client
+        self.documents = service.documents
+        self.document_id = document_id
+        self.channel = f"collab:{{{document_id}}}"
+        self.state_key = f"{self.channel}:state"
+        self.log_key = f"{self.channel}:log"
+        self.lease_key = f"lease:{self.channel}"
+        self.clients: Dict[str, CollabClient] = {}
+        self.lock = asyncio.Lock()
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.wake = asyncio.Event()
+        # (client id, seq, base revision, delta) waiting for the next batch
+        self.pending: List[Tuple[str, int, int, List[DeltaOp]]] = []
+        self.content = ""
+        self.revision = 0
+        # Deltas after history_start with the text length each produces;
+        # kept back to the persist before last so slow clients can rebase
+        self.history: List[Tuple[List[DeltaOp], int]] = []
+        self.history_start = 0
+        self.history_start_length = 0
+        # Last persisted revision and document version, as published
+        self.persisted_revision = 0
+        self.version = 0
+        # Lease holder only: the document as Mongo has it, and the revision
+        # whose content it holds (None after an outside write was rebased)
+        self.persisted: Optional[Document] = None
+        self.persisted_at: Optional[int] = None
+        self._tasks: List[asyncio.Task] = []
+        # Set by the service: the task opening the session, and the clients
+        # waiting on it, which keep the session from closing before they join
+        self.opening: Optional[asyncio.Task] = None
+        self.joining = 0
+
+    async def open(self) -> None:
+        # Subscribe before reading the state so no batch falls in between
+        await self.service.subscribe(self)
+        try:
+            async with self.lock:
+                await self._load()
+        except Exception:
+            await self.service.unsubscribe(self)
+            raise
+        self._tasks = [
+            asyncio.create_task(self._receive_loop()),
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._persist_loop()),
+        ]
+
+    async def close(self) -> None:
+        """Stop the session, sequencing anything still pending, and persist it"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        try:
+            async with self.lock:
+                await self._flush()
+            await self.persist()
+        except Exception as e:
+            logging.error(f"Error closing editing session of document {self.document_id}: {str(e)}")
+        finally:
+            await self._release_lease()
+            await self.service.unsubscribe(self)
+
+    async def add(self, client: CollabClient) -> None:
+        async with self.lock:
+            self.clients[client.id] = client
+            # Queued under the lock so it precedes every batch sent after it
+            client.send(self._init_frame(client))
+
+    def submit(self, client: CollabClient, op: CollabOp) -> None:
+        """Queue an op for the next batch"""
+        if len(op.ops) > BackendBaseSettings.MAX_PATCH_OPS:
+            client.error(op.seq, f"At most {BackendBaseSettings.MAX_PATCH_OPS} ops per message")
+            return
+        if not self.history_start <= op.revision <= self.revision:
+            client.error(op.seq, f"Revision {op.revision} is not available; reconnect to resync")
+            return
+        try:
+            delta = patch_to_delta(
+                self._length_at(op.revision),
+                ((patch.op, patch.pos, patch.text if patch.op == "insert" else patch.length) for patch in op.ops)
+            )
+        except ValueError as e:
+            client.error(op.seq, str(e))
+            return
+        self.pending.append((client.id, op.seq, op.revision, delta))
+        self.wake.set()
+
+    async def _load(self) -> None:
+        document = await self.documents._load(self.document_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.hsetnx(self.state_key, "head", 0)
+            pipe.hsetnx(self.state_key, "revision", 0)
+            pipe.hsetnx(self.state_key, "version", document.version)
+            pipe.hgetall(self.state_key)
+            state = self._decode_state((await pipe.execute())[-1])
+        self.revision = self.persisted_revision = state["revision"]
+        self.version = state["version"]
+        if document.version == self.version:
+            content = document.content
+        else:
+            # Written outside the session since; the log continues from the
+            # version the session persisted, and the lease holder rebases
+            content = await self.documents.history_service.reconstruct(document.id, self.version)
+            if content is None:
+                raise HTTPException(status_code=500, detail="Failed to load document version")
+        self.content = content
+        self.history = []
+        self.history_start = self.revision
+        self.history_start_length = len(content)
+        await self._catch_up()
+
+    async def _reset(self) -> None:
+        """Reload after missing ops that are gone from the log; clients start over"""
+        logging.warning(f"Editing session of document {self.document_id} fell behind the op log; reloading")
+        self.pending = []
+        await self._load()
+        for client in self.clients.values():
+            client.send(self._init_frame(client))
+
+    def _init_frame(self, client: CollabClient) -> str:
+        return json.dumps({
+            "type": "init",
+            "client": client.id,
+            "revision": self.revision,
+            "version": self.version,
+            "content": self.content,
+        })
+
+    def _length_at(self, revision: int) -> int:
+        if revision == self.history_start:
+            return self.history_start_length
+        return self.history[revision - self.history_start - 1][1]
+
+    def _apply(self, start: int, entries: List[Dict[str, Any]]) -> None:
+        """Apply a sequenced batch and send it to this worker's clients"""
+        composed = None
+        for entry in entries:
+            delta = entry["delta"]
+            self.history.append((delta, delta_length(delta)[1]))
+            composed = delta if composed is None else compose_delta(composed, delta)
+        # One pass over the text per batch, however many ops it holds
+        self.content = apply_delta(self.content, composed)
+        self.revision = start + len(entries)
+        frame = json.dumps({"type": "ops", "start": start, "revision": self.revision, "ops": entries})
+        for client in self.clients.values():
+            client.send(frame)
+
+    async def _catch_up(self) -> None:
+        """Apply batches sequenced by other workers from the op log"""
+        for raw in await self.redis_client.zrangebyscore(self.log_key, self.revision, "+inf"):
+            batch = json.loads(raw)
+            if batch["start"] < self.revision:
+                continue
+            if batch["start"] > self.revision:
+                await self._reset()
+                return
+            self._apply(batch["start"], batch["ops"])
+
+    async def _receive_loop(self) -> None:
+        while True:
+            message = await self.inbox.get()
+            try:
+                async with self.lock:
+                    if message is None:
+                        await self._catch_up()
+                        continue
+                    if message["type"] == "persisted":
+                        self._persisted(message["revision"], message["version"])
+                    elif message["start"] == self.revision:
+                        self._apply(message["start"], message["ops"])
+                    elif message["start"] > self.revision:
+                        await self._catch_up()
+            except Exception as e:
+                logging.error(f"Error applying ops to document {self.document_id}: {str(e)}")
+
+    async def _flush_loop(self) -> None:
+        window = BackendBaseSettings.COLLAB_BATCH_WINDOW_MS / 1000
+        while True:
+            await self.wake.wait()
+            await asyncio.sleep(window)
+            self.wake.clear()
+            try:
+                async with self.lock:
+                    await self._flush()
+            except Exception as e:
+                logging.error(f"Error sequencing ops of document {self.document_id}: {str(e)}")
+                await asyncio.sleep(1)
+                self.wake.set()
+
+    async def _flush(self) -> None:
+        """Sequence the pending ops as one batch; kept pending if Redis fails"""
+        while self.pending:
+            entries = self._transform()
+            if not entries:
+                return
+            start = self.revision
+            payload = json.dumps({"type": "ops", "start": start, "ops": entries})
+            head = await self.service.append(
+                keys=[self.state_key, self.log_key],
+                args=[start, len(entries), payload, self.channel, BackendBaseSettings.COLLAB_STATE_TTL_S]
+            )
+            if head < 0:
+                self.pending = self.pending[len(entries):]
+                self._apply(start, entries)
+                return
+            # Another worker appended first
+            await self._catch_up()
+
+    def _transform(self) -> List[Dict[str, Any]]:
+        """Bring each pending op from its base revision up to the next one in the batch"""
+        entries = []
+        kept = []
+        for pending in self.pending:
+            client_id, seq, base, delta = pending
+            if base < self.history_start:
+                client = self.clients.get(client_id)
+                if client is not None:
+                    client.error(seq, f"Revision {base} is not available; reconnect to resync")
+                continue
+            for past, _ in self.history[base - self.history_start:]:
+                _, delta = transform_delta(past, delta)
+            for entry in entries:
+                _, delta = transform_delta(entry["delta"], delta)
+            entries.append({"client": client_id, "seq": seq, "delta": delta})
+            # Kept as submitted: if the append loses, they are transformed again
+            kept.append(pending)
+        self.pending = kept
+        return entries
+
+    def _persisted(self, revision: int, version: int) -> None:
+        if revision <= self.persisted_revision and version <= self.version:
+            return
+        previous, self.persisted_revision, self.version = self.persisted_revision, revision, version
+        trim = previous - self.history_start
+        if trim > 0:
+            self.history_start_length = self.history[trim - 1][1]
+            self.history = self.history[trim:]
+            self.history_start = previous
+
+    async def _persist_loop(self) -> None:
+        while True:
+            await asyncio.sleep(BackendBaseSettings.COLLAB_PERSIST_INTERVAL_S)
+            try:
+                # Pub/sub does not redeliver; a head past ours means a batch was missed
+                head = await self.redis_client.hget(self.state_key, "head")
+                if head is not None and int(head) > self.revision:
+                    self.inbox.put_nowait(None)
+                await self.persist()
+            except Exception as e:
+                logging.error(f"Error persisting document {self.document_id}: {str(e)}")
+
+    async def persist(self) -> None:
+        """Write the content to Mongo if this worker holds the lease and it changed"""
+        if not await self._hold_lease():
+            return
+        # A conflict means a write outside the session: rebase it, try once more
+        for _ in range(2):
+            if self.persisted is None:
+                if not await self._sync_persisted():
+                    return
+                # Sequence a rebased outside write before writing over it
+                async with self.lock:
+                    await self._flush()
+            if await self._write():
+                return
+
+    async def _write(self) -> bool:
+        """Version-guarded write of the current content; False on a conflict"""
+        async with self.lock:
+            if self.revision == self.persisted_at:
+                return True
+            current, revision, content = self.persisted, self.revision, self.content
+            delta = None
+            if self.persisted_at is not None and self.persisted_at >= self.history_start:
+                for past, _ in self.history[self.persisted_at - self.history_start:]:
+                    delta = past if delta is None else compose_delta(delta, past)
+        changes = {
+            "content": content,
+            "version": current.version + 1,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        updated = await self.documents.save(current, changes, delta)
+        if updated is None:
+            self.persisted = None
+            return False
+        self.persisted, self.persisted_at = updated, revision
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(self.state_key, mapping={"revision": revision, "version": updated.version})
+            pipe.expire(self.state_key, BackendBaseSettings.COLLAB_STATE_TTL_S)
+            # Batches before the previous persist are no longer needed to catch up
+            pipe.zremrangebyscore(self.log_key, "-inf", f"({self.persisted_revision}")
+            pipe.publish(self.channel, json.dumps({"type": "persisted", "revision": revision, "version": updated.version}))
+            await pipe.execute()
+        async with self.lock:
+            self._persisted(revision, updated.version)
+        return True
+
+    async def _sync_persisted(self) -> bool:
+        """
+        Take over persisting: read the document from Mongo and, if it was
+        written outside the session, queue the outside change as an op.
+        Returns False if the document was deleted.
+        """
+        document = await self.documents._load(self.document_id)
+        if document is None:
+            for client in list(self.clients.values()):
+                client.close(4404, "Document was deleted")
+            return False
+        if document.version != self.version:
+            state = self._decode_state(await self.redis_client.hgetall(self.state_key))
+            if state.get("version") == document.version:
+                # Persisted by another worker; its announcement is on the way
+                async with self.lock:
+                    self._persisted(state["revision"], state["version"])
+        async with self.lock:
+            if document.version == self.version:
+                self.persisted, self.persisted_at = document, self.persisted_revision
+                return True
+        base = await self.documents.history_service.reconstruct(document.id, self.version)
+        async with self.lock:
+            if base is None or self.persisted_revision < self.history_start:
+                logging.error(f"Cannot rebase outside write to document {self.document_id}; it will be overwritten")
+            else:
+                self.pending.append(("server", 0, self.persisted_revision, compute_delta(base, document.content, exact=True)))
+                self.wake.set()
+            self.persisted, self.persisted_at, self.version = document, None, document.version
+        return True
+
+    async def _hold_lease(self) -> bool:
+        ttl = int(BackendBaseSettings.COLLAB_PERSIST_INTERVAL_S * 3000)
+        held = await self.service.hold_lease(keys=[self.lease_key], args=[self.service.instance_id, ttl])
+        if held != 1:
+            # Newly acquired or lost: Mongo may have moved since this worker last wrote
+            self.persisted = None
+        return bool(held)
+
+    async def _release_lease(self) -> None:
+        try:
+            await self.service.release_lease(keys=[self.lease_key], args=[self.service.instance_id])
+        except Exception as e:
+            logging.error(f"Error releasing persist lease of document {self.document_id}: {str(e)}")
+
+    @staticmethod
+    def _decode_state(state: Dict) -> Dict[str, int]:
+        return {
+            (key.decode() if isinstance(key, bytes) else key): int(value)
+            for key, value in state.items()
+        }
+
+
+class CollabService:
+    """Editing sessions of this worker and their Redis pub/sub subscriptions"""
+
+    def __init__(self):
+        self.redis_client = get_redis_client()
+        self.documents = DocumentService()
+        self.instance_id = uuid.uuid4().hex
+        self.append = self.redis_client.register_script(APPEND_SCRIPT)
+        # Compare-and-set on the holder, so a lease that expired and moved on is left alone
+        self.hold_lease = self.redis_client.register_script(HOLD_LEASE_SCRIPT)
+        self.release_lease = self.redis_client.register_script(RELEASE_LEASE_SCRIPT)
+        self.sessions: Dict[int, DocumentSession] = {}
+        # Sessions still closing, which a new session for the document waits for
+        self.closing: Dict[int, asyncio.Task] = {}
+        self.channels: Dict[str, DocumentSession] = {}
+        self.lock = asyncio.Lock()
+        self.pubsub = None
+        self._subscribed = asyncio.Event()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def join(self, document_id: int) -> Tuple[DocumentSession, CollabClient]:
+        """Connect a client to the document's session, opening it if needed"""
+        async with self.lock:
+            session = self.sessions.get(document_id)
+            if session is None:
+                session = DocumentSession(self, document_id)
+                # Opened outside the lock so other documents' joins and leaves are not held up
+                session.opening = asyncio.create_task(self._open(session, self.closing.get(document_id)))
+                self.sessions[document_id] = session
+            session.joining += 1
+        client = None
+        try:
+            # Shielded: a joiner that goes away does not cancel the open for the others
+            await asyncio.shield(session.opening)
+            client = CollabClient()
+            await session.add(client)
+        finally:
+            session.joining -= 1
+            if client is None or client.id not in session.clients:
+                await self._release(session)
+        return session, client
+
+    async def leave(self, session: DocumentSession, client: CollabClient) -> None:
+        """Disconnect a client; the last one out closes the session"""
+        session.clients.pop(client.id, None)
+        await self._release(session)
+
+    async def _open(self, session: DocumentSession, previous: Optional[asyncio.Task]) -> None:
+        try:
+            # The document's last session persists and gives up its lease first
+            if previous is not None:
+                await asyncio.shield(previous)
+            await session.open()
+        except BaseException:
+            async with self.lock:
+                if self.sessions.get(session.document_id) is session:
+                    del self.sessions[session.document_id]
+            raise
+
+    async def _release(self, session: DocumentSession) -> None:
+        """Close the session once no client is in it or waiting to join"""
+        async with self.lock:
+            if session.clients or session.joining or self.sessions.get(session.document_id) is not session:
+                return
+            del self.sessions[session.document_id]
+            closing = asyncio.create_task(self._close(session))
+            self.closing[session.document_id] = closing
+            closing.add_done_callback(lambda _: self._closed(session.document_id, closing))
+        await asyncio.shield(closing)
+
+    def _closed(self, document_id: int, closing: asyncio.Task) -> None:
+        if self.closing.get(document_id) is closing:
+            del self.closing[document_id]
+
+    @staticmethod
+    async def _close(session: DocumentSession) -> None:
+        """Close the session once it has finished opening"""
+        try:
+            await asyncio.shield(session.opening)
+        except Exception:
+            # Failed to open: there is nothing to close
+            return
+        await session.close()
+
+    async def subscribe(self, session: DocumentSession) -> None:
+        self.channels[session.channel] = session
+        await self.pubsub.subscribe(session.channel)
+        self._subscribed.set()
+
+    async def unsubscribe(self, session: DocumentSession) -> None:
+        # A new session for the document may have taken over the channel
+        if self.channels.get(session.channel) is not session:
+            return
+        del self.channels[session.channel]
+        try:
+            await self.pubsub.unsubscribe(session.channel)
+        except Exception as e:
+            logging.error(f"Error unsubscribing from {session.channel}: {str(e)}")
+        if not self.channels:
+            self._subscribed.clear()
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self.pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Close every session, persisting what was edited"""
+        async with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+            closing = list(self.closing.values())
+        for session in sessions:
+            await self._close(session)
+        await asyncio.gather(*closing, return_exceptions=True)
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+            await self.pubsub.aclose()
+
+    async def _listen(self) -> None:
+        while True:
+            await self._subscribed.wait()
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+                channel = message["channel"]
+                session = self.channels.get(channel.decode() if isinstance(channel, bytes) else channel)
+                if session is not None:
+                    session.inbox.put_nowait(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Batches may have been missed while disconnected
+                logging.error(f"Editing session listener failed: {str(e)}")
+                for session in list(self.channels.values()):
+                    session.inbox.put_nowait(None)
+                await asyncio.sleep(1)
+
+
+@lru_cache(maxsize=1)
+def get_collab_service() -> CollabService:
+    """
+    Get the process-wide editing session service with LRU caching
+    :return: CollabService
+    """
+    return CollabService()
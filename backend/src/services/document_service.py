@@ -1,72 +1,443 @@
 import logging
 from fastapi import HTTPException
-from src.models.document import Document
-from src.database.connectors.redis_connector import get_redis_client
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from datetime import datetime
+from src.models.document import (
+    Document, BulkItemResult, BulkCreateResult, DocumentPatch, DocumentSearchHit, DocumentSearchResult
+)
+from src.settings import BackendBaseSettings
 from src.utils.database.mongo_handler import MongoHandler
+from src.services.history_service import HistoryService
+from src.services.cache_service import get_document_cache, version_info
+from src.services.embedding_pipeline import MAX_DOCUMENT_ID, embeddable, get_embedding_pipeline
+from src.services.search_service import get_search_service, reciprocal_rank_fusion
+from src.services.tag_service import TagService
 import traceback
-from datetime import datetime
-from typing import List, Dict, Tuple
-from src.utils.serializers import serialize_doc
+from typing import Any, List, Dict, Tuple, Optional
+from src.utils.cursor import encode_cursor, decode_cursor
+from src.utils.id_converter import str_to_mongo_id
+from src.utils.text_delta import DeltaOp, apply_delta, patch_to_delta
 
 class DocumentService:
     def __init__(self):
-        self.redis_client = get_redis_client()
+        self.cache = get_document_cache()
         self.mongo_handler = MongoHandler()
-        self.cache_ttl = 3600  # 1 hour
+        self.history_service = HistoryService()
+        self.embedding_pipeline = get_embedding_pipeline()
+        self.search_service = get_search_service()
+        self.tag_service = TagService()
         self.collection = "documents"
         self.history_collection = "document_history"
+        # Document reads never need Mongo's _id
+        self.projection = {"_id": 0}
 
     async def create(self, document: Document) -> Document:
+        self._check_id(document.id)
         try:
             # Store in MongoDB
-            await self.mongo_handler.insert_one(self.collection, document.dict())
+            await self.mongo_handler.insert_one(self.collection, document.model_dump())
             
-            # Store in Redis
-            self.redis_client.setex(
-                f"document:{document.id}",
-                self.cache_ttl,
-                document.json()
-            )
+            # Store in the cache and evict stale copies on other workers
+            await self.cache.set(document, invalidate_peers=True)
             await self.add_to_history(document)
+            await self.count_tags(added=[document.tags])
+            await self.search_service.index_document(document)
+            self.embedding_pipeline.enqueue(document)
             return document
+        except DuplicateKeyError:
+            raise HTTPException(status_code=409, detail=f"Document id {document.id} already exists")
         except Exception as e:
             logging.error(f"Error creating document: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to create document")
 
-    async def list_all(self, skip: int = 0, limit: int = 10) -> Tuple[List[Document], int]:
+    @staticmethod
+    def _check_id(document_id: int) -> None:
+        """New ids must fit the chunk ids of the embedding index"""
+        if not embeddable(document_id):
+            raise HTTPException(
+                status_code=422,
+                detail=f"Document ids must be between 0 and {MAX_DOCUMENT_ID - 1}"
+            )
+
+    async def create_many(self, items: List[Dict[str, Any]]) -> BulkCreateResult:
+        """
+        Create many documents with one insert_many for documents, one for
+        history and one pipelined Redis write. Every item gets its own
+        result; invalid or duplicate items do not fail the others.
+        """
+        if len(items) > BackendBaseSettings.MAX_BULK_DOCUMENTS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {BackendBaseSettings.MAX_BULK_DOCUMENTS} documents per request"
+            )
+        results: List[Optional[BulkItemResult]] = [None] * len(items)
+        valid: List[Tuple[int, Document]] = []
+        for position, item in enumerate(items):
+            try:
+                document = Document.model_validate(item)
+                self._check_id(document.id)
+                valid.append((position, document))
+            except HTTPException as e:
+                results[position] = BulkItemResult(id=document.id, status=e.status_code, error=e.detail)
+            except (ValidationError, TypeError) as e:
+                item_id = item.get("id") if isinstance(item, dict) else None
+                results[position] = BulkItemResult(
+                    id=item_id if isinstance(item_id, int) else None,
+                    status=422,
+                    error=str(e)
+                )
+
+        try:
+            failed_positions = set()
+            if valid:
+                try:
+                    await self.mongo_handler.insert_many(
+                        self.collection,
+                        [document.model_dump() for _, document in valid]
+                    )
+                except BulkWriteError as e:
+                    for write_error in e.details.get("writeErrors", []):
+                        position, document = valid[write_error["index"]]
+                        failed_positions.add(position)
+                        duplicate = write_error.get("code") == 11000
+                        results[position] = BulkItemResult(
+                            id=document.id,
+                            status=409 if duplicate else 500,
+                            error=f"Document id {document.id} already exists" if duplicate else write_error.get("errmsg")
+                        )
+
+            created = [document for position, document in valid if position not in failed_positions]
+            await self.history_service.record_many(created)
+            await self.cache.set_many(created, invalidate_peers=True)
+            await self.count_tags(added=[document.tags for document in created])
+            await self.search_service.index_many(created)
+            self.embedding_pipeline.enqueue_many(created)
+        except Exception as e:
+            logging.info(f"traceback: {traceback.format_exc()}")
+            logging.error(f"Error creating documents in bulk: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to create documents")
+
+        for position, document in valid:
+            if results[position] is None:
+                results[position] = BulkItemResult(id=document.id, status=201)
+        return BulkCreateResult(
+            created=len(created),
+            failed=len(items) - len(created),
+            results=results
+        )
+
+    async def patch(self, document_id: int, patch: DocumentPatch) -> Document:
+        """
+        Apply ranged edits (and optionally a new title or tags) to the
+        document at `patch.version`. The write is a compare-and-set on the
+        version in Mongo, so of two patches against the same version one
+        wins and the other gets 409 with the current version. The cache is
+        written through and the history gets the edits as its delta.
+        """
+        if len(patch.ops) > BackendBaseSettings.MAX_PATCH_OPS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {BackendBaseSettings.MAX_PATCH_OPS} ops per patch"
+            )
+        current = await self.get(document_id)
+        if current.version != patch.version:
+            # The cached copy may lag behind Mongo; only Mongo decides a conflict
+            stored = await self._load(current.id)
+            if stored is None:
+                raise HTTPException(status_code=404, detail="Document not found")
+            if stored.version != patch.version:
+                self._raise_conflict(stored.id, stored.version)
+            current = stored
+
+        try:
+            delta = patch_to_delta(
+                len(current.content),
+                ((op.op, op.pos, op.text if op.op == "insert" else op.length) for op in patch.ops)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        changes = {
+            "content": apply_delta(current.content, delta),
+            "version": current.version + 1,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        if patch.title is not None:
+            changes["title"] = patch.title
+        if patch.tags is not None:
+            changes["tags"] = patch.tags
+        updated = await self.save(current, changes, delta)
+        if updated is None:
+            stored = await self._load(current.id)
+            if stored is None:
+                raise HTTPException(status_code=404, detail="Document not found")
+            self._raise_conflict(stored.id, stored.version)
+        return updated
+
+    async def save(self,
+                   current: Document,
+                   changes: Dict[str, Any],
+                   delta: Optional[List[DeltaOp]] = None) -> Optional[Document]:
+        """
+        Write `changes` if Mongo still holds `current.version`, then update
+        the cache, history (with `delta` from the current content, if known), tag
+        counts and search. Returns None when another write got there first.
+        """
+        updated = current.model_copy(update=changes)
+        try:
+            applied = await self.mongo_handler.update_one(
+                self.collection,
+                {"id": current.id, "version": current.version},
+                changes
+            )
+        except Exception as e:
+            logging.error(f"Error updating document: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to update document")
+        if not applied:
+            return None
+
+        try:
+            await self.cache.set(updated, invalidate_peers=True)
+            await self.add_to_history(updated, current.content, delta)
+            if "tags" in changes:
+                await self.count_tags(added=[updated.tags], removed=[current.tags])
+            await self.search_service.index_document(updated)
+            self.embedding_pipeline.enqueue(updated)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.error(f"Error propagating document update: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to update document")
+        return updated
+
+    async def _load(self, document_id: int) -> Optional[Document]:
+        doc = await self.mongo_handler.find_one(self.collection, {"id": document_id}, projection=self.projection)
+        return Document.model_validate(doc) if doc else None
+
+    @staticmethod
+    def _raise_conflict(document_id: int, current_version: int) -> None:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": f"Document {document_id} is at version {current_version}",
+                "current_version": current_version,
+            }
+        )
+
+    async def get_many(self, document_ids: List[str]) -> Tuple[List[Document], List[str]]:
+        """
+        Fetch many documents: cache tiers first (local, then Redis MGET) and
+        a single `$in` query for whatever is left. Returns the documents in
+        request order and the ids that do not exist.
+        """
+        try:
+            ids = list(dict.fromkeys(str(int(document_id)) for document_id in document_ids))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Document ids must be integers")
+        if len(ids) > BackendBaseSettings.MAX_BATCH_IDS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {BackendBaseSettings.MAX_BATCH_IDS} ids per request"
+            )
+
+        try:
+            found = await self.cache.get_many(ids)
+            misses = [int(document_id) for document_id in ids if document_id not in found]
+            if misses:
+                docs = await self.mongo_handler.find_many(
+                    self.collection,
+                    {"id": {"$in": misses}},
+                    limit=0,
+                    projection=self.projection
+                )
+                loaded = [Document.model_validate(doc) for doc in docs]
+                await self.cache.set_many(loaded)
+                found.update({str(document.id): document for document in loaded})
+            items = [found[document_id] for document_id in ids if document_id in found]
+            missing = [document_id for document_id in ids if document_id not in found]
+            return items, missing
+        except Exception as e:
+            logging.info(f"traceback: {traceback.format_exc()}")
+            logging.error(f"Error retrieving documents in batch: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to retrieve documents")
+
+    async def search(self,
+                     query: str,
+                     k: int,
+                     mode: str = "hybrid",
+                     tags: Optional[List[str]] = None) -> DocumentSearchResult:
+        """
+        Search by keyword (BM25 over title, tags and content, with "quoted
+        phrases"), by embedding similarity, or both merged with reciprocal
+        rank fusion. Every hit carries all of `tags`; facets and total count
+        the keyword matches. Hybrid search falls back to keywords alone when
+        the vector side is not configured or unavailable.
+        """
+        tags = tags or []
+        if mode == "vector" and not self.embedding_pipeline.enabled:
+            raise HTTPException(status_code=503, detail="Semantic search is not configured")
+        window = max(k, BackendBaseSettings.SEARCH_RRF_WINDOW) if mode == "hybrid" else k
+
+        keyword: List[Tuple[int, float]] = []
+        total, facets = None, {}
+        if mode != "vector":
+            keyword, total, facets = await self.search_service.search(
+                query, tags, window, BackendBaseSettings.SEARCH_FACET_LIMIT
+            )
+        vector: List[Tuple[int, float, int]] = []
+        if mode == "vector" or (mode == "hybrid" and self.embedding_pipeline.enabled):
+            try:
+                vector = await self.embedding_pipeline.search(query, window)
+            except Exception as e:
+                logging.error(f"Error searching document embeddings: {str(e)}")
+                if mode == "vector":
+                    raise HTTPException(status_code=503, detail="Search service unavailable")
+            if tags:
+                allowed = set(self.search_service.with_tags([document_id for document_id, _, _ in vector], tags))
+                vector = [match for match in vector if match[0] in allowed]
+
+        if mode == "hybrid":
+            ranked = reciprocal_rank_fusion(
+                [[document_id for document_id, _ in keyword], [document_id for document_id, _, _ in vector]],
+                BackendBaseSettings.SEARCH_RRF_K
+            )
+        elif mode == "keyword":
+            ranked = keyword
+        else:
+            ranked = [(document_id, score) for document_id, score, _ in vector]
+        ranked = ranked[:k]
+
+        documents, _ = await self.get_many([str(document_id) for document_id, _ in ranked])
+        by_id = {document.id: document for document in documents}
+        chunks = {document_id: chunk for document_id, _, chunk in vector}
+        # Hits of since-deleted documents are skipped
+        items = [
+            DocumentSearchHit(document=by_id[document_id], score=round(score, 6), chunk=chunks.get(document_id))
+            for document_id, score in ranked
+            if document_id in by_id
+        ]
+        return DocumentSearchResult(query=query, mode=mode, total=total, items=items, facets=facets)
+
+    async def list_all(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[str] = None,
+        count: str = "estimated",
+        tags: Optional[List[str]] = None,
+        match: str = "all"
+    ) -> Tuple[List[Document], Optional[int], Optional[str]]:
+        """
+        List documents ordered by id, optionally only those carrying all
+        (`match="all"`) or any (`match="any"`) of `tags`. When `after` is
+        given, the page starts right after the cursor position with an
+        indexed range query instead of skipping over earlier rows. Tag
+        filters use the (tags, id) index, which also yields id order.
+        """
         try:
+            tags = list(dict.fromkeys(tags or []))
+            query = self._tag_query(tags, match)
+            if after is not None:
+                if skip:
+                    raise HTTPException(status_code=400, detail="Use either skip or after, not both")
+                query["id"] = {"$gt": self._decode_cursor(after, "id")["id"]}
             docs = await self.mongo_handler.find_many(
                 self.collection,
-                query={},
+                query=query,
                 skip=skip,
-                limit=limit
+                limit=limit,
+                sort=[("id", 1)],
+                projection=self.projection
             )
-            total = await self.mongo_handler.count_documents(self.collection, {})
-            return [Document(**doc) for doc in docs], total
+            documents = [Document.model_validate(doc) for doc in docs]
+            next_cursor = None
+            if len(documents) == limit:
+                next_cursor = encode_cursor({"id": documents[-1].id})
+            return documents, await self._count(count, tags, match), next_cursor
+        except HTTPException:
+            raise
         except Exception as e:
             logging.info(f"traceback: {traceback.format_exc()}")
             logging.error(f"Error listing documents: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to retrieve documents")
 
-    async def get(self, document_id: str) -> Document:
+    @staticmethod
+    def _tag_query(tags: List[str], match: str) -> Dict[str, Any]:
+        if not tags:
+            return {}
+        return {"tags": {"$all" if match == "all" else "$in": tags}}
+
+    async def _count(self, mode: str, tags: List[str] = (), match: str = "all") -> Optional[int]:
+        """
+        Total for a listing. An estimated count for a single tag comes from
+        the tag counter; several tags have no cheap estimate, so None.
+        """
+        if mode == "exact":
+            return await self.mongo_handler.count_documents(self.collection, self._tag_query(tags, match))
+        if mode == "estimated":
+            if not tags:
+                return await self.mongo_handler.estimated_document_count(self.collection)
+            if len(tags) == 1:
+                return await self.tag_service.count(tags[0])
+        return None
+
+    async def count_tags(self, added: List[List[str]] = (), removed: List[List[str]] = ()) -> None:
+        """
+        Update the per-tag document counts. The document write already
+        succeeded, so a failure is logged rather than raised;
+        `python -m src.jobs.rebuild_tag_counts` repairs the counts.
+        """
         try:
-            cached_doc = await self._get_cached_document(document_id)
-            if cached_doc:
-                logging.info(f"Document id {document_id} retrieved from cache")
-                return cached_doc
-            
-            mongo_doc = await self.mongo_handler.find_one(
-                self.collection, 
-                {"id": int(document_id)}
-            )
-            logging.info(f"Document id {document_id} retrieved from MongoDB result: {mongo_doc}")
-            
-            if not mongo_doc:
+            await self.tag_service.record(added, removed)
+        except Exception as e:
+            logging.error(f"Error updating tag counts: {str(e)}")
+
+    def _decode_cursor(self, token: str, *fields: str) -> Dict:
+        try:
+            position = decode_cursor(token)
+            if any(field not in position for field in fields):
+                raise ValueError("Invalid pagination cursor")
+            return position
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def get(self, document_id: int) -> Document:
+        return await self._get_cached(document_id, self.cache.get_or_load)
+
+    async def get_json(self, document_id: int) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Serialized document for responses plus its version metadata; cache
+        hits skip model validation.
+        """
+        entry = await self._get_cached(document_id, self.cache.get_entry_or_load)
+        info = entry.version_info or await self.get_version_info(document_id)
+        return entry.raw, info or version_info(entry.document)
+
+    async def get_version_info(self, document_id: int) -> Optional[Dict[str, Any]]:
+        """Cached version metadata, without loading the document body"""
+        try:
+            return await self.cache.get_version_info(document_id)
+        except Exception as e:
+            # Conditional requests then fall back to the full read
+            logging.error(f"Error reading document version: {str(e)}")
+            return None
+
+    async def _get_cached(self, document_id: int, lookup):
+        try:
+            async def load_from_mongo() -> Document | None:
+                mongo_doc = await self.mongo_handler.find_one(
+                    self.collection,
+                    {"id": document_id},
+                    projection=self.projection
+                )
+                logging.info(f"Document id {document_id} retrieved from MongoDB: {mongo_doc is not None}")
+                return Document.model_validate(mongo_doc) if mongo_doc else None
+
+            # Concurrent misses for the same id share a single Mongo lookup
+            result = await lookup(document_id, load_from_mongo)
+            if not result:
                 raise HTTPException(status_code=404, detail="Document not found")
-            
-            document = Document(**mongo_doc)
-            await self._cache_document(document)
-            return document
+            return result
         except HTTPException:
             raise
         except Exception as e:
@@ -74,43 +445,72 @@ class DocumentService:
             logging.error(f"Error retrieving document: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to retrieve document")
 
-    async def _cache_document(self, document: Document):
-        self.redis_client.setex(
-            f"document:{document.id}",
-            self.cache_ttl,
-            document.json()
-        )
-
-    async def _get_cached_document(self, document_id: str) -> Document | None:
-        cached_doc = self.redis_client.get(f"document:{document_id}")
-        if cached_doc:
-            return Document.parse_raw(cached_doc)
-        return None
-
-    async def add_to_history(self, document: Document) -> None:
+    async def add_to_history(self,
+                             document: Document,
+                             previous_content: Optional[str] = None,
+                             delta: Optional[List[DeltaOp]] = None) -> None:
         try:
-            history_entry = {
-                "document_id": document.id,
-                "content": document.content,
-                "version": document.version,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            await self.mongo_handler.insert_one(self.history_collection, history_entry)
+            await self.history_service.record(document, previous_content, delta)
         except Exception as e:
             logging.error(f"Error adding document history: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to record document history")
 
-    async def get_history(self, document_id: str, skip: int = 0, limit: int = 10) -> List[Dict]:
+    async def get_version(self, document_id: int, version: int) -> Dict:
+        try:
+            content = await self.history_service.reconstruct(document_id, version)
+            if content is None:
+                raise HTTPException(status_code=404, detail="Document version not found")
+            return {"document_id": document_id, "version": version, "content": content}
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.info(f"traceback: {traceback.format_exc()}")
+            logging.error(f"Error reconstructing document version: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to retrieve document version")
+
+    async def get_history(
+        self,
+        document_id: int,
+        skip: int = 0,
+        limit: int = 10,
+        before: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Return history entries newest first. `before` is a cursor over
+        (timestamp, _id) so later pages are range scans on the history index.
+        """
         try:
-            query = {"document_id": int(document_id)}
+            query = {"document_id": document_id}
+            await self.history_service.writer.sync_document(query["document_id"])
+            if before is not None:
+                if skip:
+                    raise HTTPException(status_code=400, detail="Use either skip or before, not both")
+                position = self._decode_cursor(before, "timestamp", "_id")
+                try:
+                    last_id = str_to_mongo_id(position["_id"])
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                query["$or"] = [
+                    {"timestamp": {"$lt": position["timestamp"]}},
+                    {"timestamp": position["timestamp"], "_id": {"$lt": last_id}}
+                ]
             history = await self.mongo_handler.find_many(
                 self.history_collection,
                 query,
                 skip=skip,
                 limit=limit,
-                sort=[("timestamp", -1)]
+                sort=[("timestamp", -1), ("_id", -1)]
             )
-            return [serialize_doc(entry) for entry in history]
+            for entry in history:
+                if "content" in entry:
+                    entry["content"] = self.history_service.content_of(entry)
+            next_cursor = None
+            if len(history) == limit:
+                last = history[-1]
+                next_cursor = encode_cursor({"timestamp": last["timestamp"], "_id": last["_id"]})
+            return history, next_cursor
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Error retrieving document history: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to retrieve document history")
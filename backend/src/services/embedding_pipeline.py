@@ -0,0 +1,335 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from src.constants import FAISS_SERVICE_URL
+from src.models.document import Document
+from src.settings import BackendBaseSettings
+from src.utils.chunking import chunk_text, chunk_hash
+from src.utils.database.faiss_handler import FaissHandler
+from src.utils.database.mongo_handler import MongoHandler
+from src.utils.embedding import get_embedder
+
+PROCESS_ATTEMPTS = 3
+# Pause after a batch failed every attempt, before its documents are tried again
+RETRY_DELAY_S = 5.0
+# A chunk's FAISS id is its document id * CHUNK_ID_STRIDE + its position
+CHUNK_ID_STRIDE = 1 << 16
+# FAISS ids are int64, so document ids must be in [0, MAX_DOCUMENT_ID)
+MAX_DOCUMENT_ID = (1 << 63) // CHUNK_ID_STRIDE
+# Chunk hits fetched per requested document, since one document's chunks can crowd the top k
+SEARCH_OVERFETCH = 4
+LAG_SAMPLES = 1000
+
+
+def embeddable(document_id: int) -> bool:
+    """Whether the document's chunk ids fit FAISS's int64 ids"""
+    return 0 <= document_id < MAX_DOCUMENT_ID
+
+
+class EmbeddingPipeline:
+    """
+    Keeps the FAISS index of document chunks in step with document writes.
+
+    Writes enqueue the document without waiting. A background task takes
+    pending documents in batches and splits each into chunks. It embeds
+    and upserts only chunks whose content hash differs from the last
+    indexed one; the hashes per document are kept in `document_embeddings`.
+    It then deletes chunks a document no longer has. A document enqueued
+    again before it is processed is indexed once, at its latest version.
+
+    Workers can index different versions of one document at the same
+    time. A version older than the saved chunk state is skipped, and the
+    state is only replaced by the same or a newer version. A worker whose
+    state write loses has already written its chunks to FAISS, so it
+    enqueues the latest version to be re-embedded in full.
+    """
+
+    def __init__(self):
+        self.enabled = FAISS_SERVICE_URL is not None
+        self.mongo_handler = MongoHandler()
+        self.faiss_handler = FaissHandler() if self.enabled else None
+        self.embedder = get_embedder()
+        self.collection = "document_embeddings"
+        self.index_name = BackendBaseSettings.EMBEDDING_INDEX_NAME
+        self.index_type = BackendBaseSettings.EMBEDDING_INDEX_TYPE
+        self.chunk_chars = BackendBaseSettings.EMBEDDING_CHUNK_CHARS
+        self.batch_size = BackendBaseSettings.EMBEDDING_BATCH_SIZE
+        self.batch_documents = BackendBaseSettings.EMBEDDING_BATCH_DOCUMENTS
+        self.max_pending = BackendBaseSettings.EMBEDDING_QUEUE_MAX_SIZE
+        # Document id -> (latest document, monotonic time of its first enqueue)
+        self.pending: Dict[int, Tuple[Document, float]] = {}
+        # Documents whose chunks are all re-embedded, hashes notwithstanding
+        self.rewrite: Set[int] = set()
+        self.metrics = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "documents_indexed": 0,
+            "chunks_embedded": 0,
+            "chunks_skipped": 0,
+            "chunks_deleted": 0,
+            "stale_skipped": 0,
+            "rewrites": 0,
+            "batches": 0,
+            "failed": 0,
+            "last_batch_ms": 0.0,
+        }
+        # Seconds from enqueue to searchable, for the most recent documents
+        self._lags: deque = deque(maxlen=LAG_SAMPLES)
+        self._busy_seconds = 0.0
+        self._index_ready = False
+        self._worker: Optional[asyncio.Task] = None
+        self._current_batch: Optional[asyncio.Future] = None
+        self._has_pending = asyncio.Event()
+
+    def enqueue(self, document: Document) -> None:
+        self.enqueue_many([document])
+
+    def enqueue_many(self, documents: Iterable[Document]) -> None:
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        for document in documents:
+            queued = self.pending.get(document.id)
+            if not embeddable(document.id):
+                # Created before ids were range-checked; its chunks have no FAISS id
+                logging.warning(f"Document {document.id} is outside the embeddable id range, not indexed")
+            elif queued is not None:
+                # Index only the latest version, but measure lag from the first write
+                self.pending[document.id] = (document, queued[1])
+                self.metrics["coalesced"] += 1
+            elif len(self.pending) >= self.max_pending:
+                # The reindex job picks it up; writes are never held back
+                self.metrics["dropped"] += 1
+                logging.warning(f"Embedding queue full, document {document.id} not indexed")
+            else:
+                self.pending[document.id] = (document, now)
+                self.metrics["enqueued"] += 1
+        if self.pending:
+            self._has_pending.set()
+
+    async def index_documents(self, documents: List[Document]) -> Dict[str, int]:
+        """Embed and upsert the changed chunks of `documents` and delete chunks they no longer have"""
+        await self._ensure_index()
+        documents = [document for document in documents if embeddable(document.id)]
+        if not documents:
+            return {"embedded": 0, "skipped": 0, "deleted": 0}
+        states = await self.mongo_handler.find_many(
+            self.collection,
+            {"id": {"$in": [document.id for document in documents]}},
+            limit=0,
+            projection={"_id": 0}
+        )
+        indexed = {state["id"]: state for state in states}
+
+        changed: List[Tuple[int, str]] = []
+        stale: List[int] = []
+        updated_states: List[Dict[str, Any]] = []
+        skipped = 0
+        rewritten = set()
+        for document in documents:
+            state = indexed.get(document.id, {})
+            if state.get("version", 0) > document.version:
+                # A newer version is already indexed
+                self.metrics["stale_skipped"] += 1
+                continue
+            chunks = chunk_text(f"{document.title}\n\n{document.content}", self.chunk_chars)[:CHUNK_ID_STRIDE]
+            hashes = [chunk_hash(chunk) for chunk in chunks]
+            previous = state.get("chunks", [])
+            rewrite = document.id in self.rewrite
+            if rewrite:
+                rewritten.add(document.id)
+            base_id = document.id * CHUNK_ID_STRIDE
+            for position, (chunk, digest) in enumerate(zip(chunks, hashes)):
+                if not rewrite and position < len(previous) and previous[position] == digest:
+                    skipped += 1
+                else:
+                    changed.append((base_id + position, chunk))
+            stale.extend(base_id + position for position in range(len(chunks), len(previous)))
+            if rewrite or hashes != previous:
+                updated_states.append({"id": document.id, "version": document.version, "chunks": hashes})
+
+        await self._upsert_chunks(changed)
+        if stale:
+            await self.faiss_handler.delete_vectors(self.index_name, stale)
+        # Saved last, so a failed batch is retried in full
+        lost = []
+        if updated_states:
+            lost = await self.mongo_handler.replace_many(self.collection, updated_states, version_key="version")
+        self.rewrite -= rewritten
+        if lost:
+            await self._rewrite_latest(lost)
+        return {"embedded": len(changed), "skipped": skipped, "deleted": len(stale)}
+
+    async def _rewrite_latest(self, document_ids: List[int]) -> None:
+        """
+        Another worker saved a newer version while this one wrote older
+        chunks to FAISS; re-embed the latest version of every chunk
+        """
+        docs = await self.mongo_handler.find_many(
+            "documents",
+            {"id": {"$in": document_ids}},
+            limit=0,
+            projection={"_id": 0}
+        )
+        self.rewrite.update(doc["id"] for doc in docs)
+        self.metrics["rewrites"] += len(docs)
+        self.enqueue_many(Document.model_validate(doc) for doc in docs)
+
+    async def _upsert_chunks(self, chunks: List[Tuple[int, str]]) -> None:
+        """Embed and upsert in batches, embedding the next batch while the current one is sent"""
+        batches = [chunks[start:start + self.batch_size] for start in range(0, len(chunks), self.batch_size)]
+        if not batches:
+            return
+        embedding = asyncio.ensure_future(self._embed(batches[0]))
+        try:
+            for position, batch in enumerate(batches):
+                vectors = await embedding
+                if position + 1 < len(batches):
+                    embedding = asyncio.ensure_future(self._embed(batches[position + 1]))
+                ids = [chunk_id for chunk_id, _ in batch]
+                metadata = [
+                    {"document_id": chunk_id // CHUNK_ID_STRIDE, "chunk": chunk_id % CHUNK_ID_STRIDE}
+                    for chunk_id in ids
+                ]
+                await self.faiss_handler.upsert_vectors(self.index_name, ids, vectors, metadata)
+        finally:
+            embedding.cancel()
+
+    async def _embed(self, batch: List[Tuple[int, str]]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embedder.embed, [text for _, text in batch])
+
+    async def _ensure_index(self) -> None:
+        if not self._index_ready:
+            if await self.faiss_handler.create_index(self.index_name, self.embedder.dimension, self.index_type):
+                logging.info(f"Created FAISS index {self.index_name} ({self.index_type}, {self.embedder.dimension} dimensions)")
+            self._index_ready = True
+
+    async def search(self, query: str, k: int) -> List[Tuple[int, float, int]]:
+        """
+        Documents whose chunks best match a text query, as (document id,
+        cosine similarity, best chunk) tuples, best first
+        """
+        vector = (await asyncio.to_thread(self.embedder.embed, [query]))[0]
+        if not any(vector):
+            return []
+        hits = await self.faiss_handler.search(self.index_name, vector, k * SEARCH_OVERFETCH)
+        best: Dict[int, Tuple[int, float, int]] = {}
+        for hit in hits:
+            document_id, chunk = divmod(hit["id"], CHUNK_ID_STRIDE)
+            if document_id not in best:
+                # Vectors are unit length, so squared L2 distance is 2 - 2 cos
+                best[document_id] = (document_id, round(1 - hit["distance"] / 2, 6), chunk)
+        return list(best.values())[:k]
+
+    def stats(self) -> Dict[str, Any]:
+        lags = sorted(self._lags)
+        oldest = next(iter(self.pending.values()), None)
+        return {
+            "enabled": self.enabled,
+            "running": self._worker is not None and not self._worker.done(),
+            "index": self.index_name,
+            "embedder": type(self.embedder).__name__,
+            "queue_depth": len(self.pending),
+            "queue_capacity": self.max_pending,
+            "oldest_pending_ms": round((time.monotonic() - oldest[1]) * 1000, 3) if oldest else 0.0,
+            "lag_ms": {
+                "p50": round(lags[len(lags) // 2] * 1000, 3) if lags else 0.0,
+                "p99": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 3) if lags else 0.0,
+                "max": round(lags[-1] * 1000, 3) if lags else 0.0,
+            },
+            "documents_per_second": round(self.metrics["documents_indexed"] / self._busy_seconds, 1) if self._busy_seconds else 0.0,
+            "chunks_per_second": round(self.metrics["chunks_embedded"] / self._busy_seconds, 1) if self._busy_seconds else 0.0,
+            **self.metrics,
+        }
+
+    async def start(self) -> None:
+        if self.enabled and self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task after indexing everything still pending"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        if self._current_batch is not None:
+            await self._current_batch
+        while self.pending:
+            if not await self._process(self._take(self.batch_documents)):
+                break
+        if self.pending:
+            # The reindex job or the next write picks these up
+            logging.error(f"Embeddings not updated for documents {sorted(self.pending)}")
+            self.pending.clear()
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_pending.wait()
+            batch = self._take(self.batch_documents)
+            # Shielded so shutdown never abandons a half-indexed batch
+            self._current_batch = asyncio.ensure_future(self._process(batch))
+            processed = await asyncio.shield(self._current_batch)
+            self._current_batch = None
+            if not processed:
+                await asyncio.sleep(RETRY_DELAY_S)
+
+    def _take(self, limit: int) -> List[Tuple[Document, float]]:
+        batch = [self.pending.pop(document_id) for document_id in list(itertools.islice(self.pending, limit))]
+        if not self.pending:
+            self._has_pending.clear()
+        return batch
+
+    async def _process(self, batch: List[Tuple[Document, float]]) -> bool:
+        """Index a batch; returns False if it failed and went back to `pending`"""
+        started = time.monotonic()
+        for attempt in range(1, PROCESS_ATTEMPTS + 1):
+            try:
+                counts = await self.index_documents([document for document, _ in batch])
+                break
+            except Exception as e:
+                logging.error(f"Embedding batch attempt {attempt} failed: {str(e)}")
+                if attempt == PROCESS_ATTEMPTS:
+                    self.metrics["failed"] += len(batch)
+                    self._requeue(batch)
+                    return False
+                await asyncio.sleep(0.5 * attempt)
+
+        finished = time.monotonic()
+        self._lags.extend(finished - enqueued_at for _, enqueued_at in batch)
+        self._busy_seconds += finished - started
+        self.metrics["documents_indexed"] += len(batch)
+        self.metrics["chunks_embedded"] += counts["embedded"]
+        self.metrics["chunks_skipped"] += counts["skipped"]
+        self.metrics["chunks_deleted"] += counts["deleted"]
+        self.metrics["batches"] += 1
+        self.metrics["last_batch_ms"] = round((finished - started) * 1000, 3)
+        return True
+
+    def _requeue(self, batch: List[Tuple[Document, float]]) -> None:
+        """Put a failed batch back, unless a newer version was enqueued meanwhile"""
+        for document, enqueued_at in batch:
+            queued = self.pending.get(document.id)
+            if queued is None:
+                self.pending[document.id] = (document, enqueued_at)
+            else:
+                self.pending[document.id] = (queued[0], min(enqueued_at, queued[1]))
+        if self.pending:
+            self._has_pending.set()
+
+
+@lru_cache(maxsize=1)
+def get_embedding_pipeline() -> EmbeddingPipeline:
+    """
+    Get the process-wide embedding pipeline with LRU caching
+    :return: EmbeddingPipeline
+    """
+    return EmbeddingPipeline()
@@ -0,0 +1,205 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import bson
+from src.models.document import Document
+from src.settings import BackendBaseSettings
+from src.utils.database.mongo_handler import MongoHandler
+from src.services.history_writer import get_history_writer
+from src.utils.compression import get_codec
+from src.utils.id_converter import str_to_mongo_id
+from src.utils.text_delta import DeltaOp, compute_delta, apply_delta
+
+
+class HistoryService:
+    """
+    Stores document history as a chain of text deltas with a full snapshot
+    every `snapshot_interval` versions. Entries without a `delta` field
+    (including history written before deltas existed) are snapshots.
+    Large snapshot contents are stored compressed; use `content_of` to
+    read them.
+    """
+
+    def __init__(self):
+        self.mongo_handler = MongoHandler()
+        self.writer = get_history_writer()
+        self.collection = "document_history"
+        self.snapshot_interval = BackendBaseSettings.HISTORY_SNAPSHOT_INTERVAL
+        self.codec = get_codec()
+
+    def content_of(self, entry: Dict[str, Any]) -> str:
+        """Decompressed content of a snapshot entry"""
+        return self.codec.decode_text(entry["content"])
+
+    async def record(self,
+                     document: Document,
+                     previous_content: Optional[str] = None,
+                     delta: Optional[List[DeltaOp]] = None) -> Dict[str, Any]:
+        """
+        Append a history entry for `document`. Without `previous_content`
+        (the content of the latest recorded version) a snapshot is written.
+        A `delta` from `previous_content` to the new content, when the
+        caller has one, is stored instead of diffing the two.
+        """
+        entry = {
+            "document_id": document.id,
+            "version": document.version,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        latest = await self._latest_entry(document.id) if previous_content is not None else None
+        # Deltas chain onto the previous version only; with concurrent
+        # writers the latest recorded entry may be another one
+        if latest and latest["version"] != document.version - 1:
+            latest = None
+        chain_length = latest.get("chain_length", 0) + 1 if latest else 0
+        if latest and chain_length < self.snapshot_interval:
+            entry.update(
+                kind="delta",
+                base_version=latest["version"],
+                chain_length=chain_length,
+                delta=delta if delta is not None else compute_delta(previous_content, document.content)
+            )
+        else:
+            entry.update(kind="snapshot", chain_length=0, content=self.codec.encode_text(document.content))
+        await self.writer.write(entry)
+        return entry
+
+    async def record_many(self, documents: List[Document]) -> None:
+        """Append snapshot entries for newly created documents in one insert"""
+        timestamp = datetime.utcnow().isoformat()
+        entries = [
+            {
+                "document_id": document.id,
+                "version": document.version,
+                "timestamp": timestamp,
+                "kind": "snapshot",
+                "chain_length": 0,
+                "content": self.codec.encode_text(document.content)
+            }
+            for document in documents
+        ]
+        await self.writer.write_many(entries)
+
+    async def reconstruct(self, document_id: int, version: int) -> Optional[str]:
+        """
+        Rebuild the content of `version` by replaying deltas from the nearest
+        snapshot at or below it. Returns None if the version is not recorded.
+        """
+        await self.writer.sync_document(document_id)
+        snapshots = await self.mongo_handler.find_many(
+            self.collection,
+            {
+                "document_id": document_id,
+                "version": {"$lte": version},
+                "delta": {"$exists": False}
+            },
+            limit=1,
+            sort=[("version", -1)]
+        )
+        if not snapshots:
+            return None
+        snapshot = snapshots[0]
+        content = self.content_of(snapshot)
+        if snapshot["version"] == version:
+            return content
+
+        deltas = await self.mongo_handler.find_many(
+            self.collection,
+            {
+                "document_id": document_id,
+                "version": {"$gt": snapshot["version"], "$lte": version},
+                "delta": {"$exists": True}
+            },
+            limit=0,
+            sort=[("version", 1)]
+        )
+        current_version = snapshot["version"]
+        for entry in deltas:
+            if entry["base_version"] != current_version:
+                raise ValueError(
+                    f"Broken history chain for document {document_id} at version {entry['version']}"
+                )
+            content = apply_delta(content, entry["delta"])
+            current_version = entry["version"]
+        return content if current_version == version else None
+
+    async def compact(self, document_id: Optional[int] = None) -> Dict[str, int]:
+        """
+        Rewrite full-copy history into snapshot + delta form. Safe to re-run:
+        entries that already have the target shape are left untouched.
+        """
+        document_ids = [document_id] if document_id is not None else \
+            await self.mongo_handler.distinct(self.collection, "document_id")
+        stats = {"documents": 0, "entries": 0, "rewritten": 0, "bytes_before": 0, "bytes_after": 0}
+        for doc_id in document_ids:
+            entries = await self.mongo_handler.find_many(
+                self.collection,
+                {"document_id": doc_id},
+                limit=0,
+                sort=[("version", 1), ("timestamp", 1)]
+            )
+            stats["documents"] += 1
+            await self._compact_entries(entries, stats)
+        logging.info(f"History compaction finished: {stats}")
+        return stats
+
+    async def _compact_entries(self, entries: List[Dict[str, Any]], stats: Dict[str, int]) -> None:
+        previous = None
+        chain_length = 0
+        for entry in entries:
+            if "delta" not in entry:
+                content = self.content_of(entry)
+            else:
+                if previous is None or previous["version"] != entry["base_version"]:
+                    # The chain starts before this batch (pruned or compacted
+                    # mid-chain): rebuild its base from what is stored
+                    base = await self.reconstruct(entry["document_id"], entry["base_version"])
+                    if base is None:
+                        logging.error(
+                            f"Skipping history entry {entry['document_id']}@{entry['version']}: "
+                            f"base version {entry['base_version']} is not recorded"
+                        )
+                        previous = None
+                        continue
+                    previous = {"version": entry["base_version"], "content": base}
+                content = apply_delta(previous["content"], entry["delta"])
+            compacted = {
+                key: value for key, value in entry.items()
+                if key not in ("_id", "content", "delta", "base_version", "chain_length", "kind")
+            }
+            if previous is None or chain_length + 1 >= self.snapshot_interval:
+                chain_length = 0
+                compacted.update(kind="snapshot", chain_length=0, content=self.codec.encode_text(content))
+            else:
+                chain_length += 1
+                compacted.update(
+                    kind="delta",
+                    base_version=previous["version"],
+                    chain_length=chain_length,
+                    delta=compute_delta(previous["content"], content)
+                )
+
+            stored = {key: value for key, value in entry.items() if key != "_id"}
+            stats["entries"] += 1
+            stats["bytes_before"] += len(bson.encode(stored))
+            stats["bytes_after"] += len(bson.encode(compacted))
+            if compacted != stored:
+                await self.mongo_handler.replace_one(
+                    self.collection,
+                    {"_id": str_to_mongo_id(entry["_id"])},
+                    compacted
+                )
+                stats["rewritten"] += 1
+            previous = {"version": entry["version"], "content": content}
+
+    async def _latest_entry(self, document_id: int) -> Optional[Dict[str, Any]]:
+        pending = self.writer.pending_latest.get(document_id)
+        if pending is not None:
+            return pending
+        entries = await self.mongo_handler.find_many(
+            self.collection,
+            {"document_id": document_id},
+            limit=1,
+            sort=[("timestamp", -1), ("_id", -1)]
+        )
+        return entries[0] if entries else None
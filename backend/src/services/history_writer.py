@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from src.settings import BackendBaseSettings
+from src.utils.database.mongo_handler import MongoHandler
+
+FLUSH_ATTEMPTS = 3
+DUPLICATE_KEY = 11000
+
+
+class HistoryWriter:
+    """
+    Writes document history entries, either synchronously or write-behind.
+
+    In write-behind mode entries go into a bounded queue that a background
+    task drains with insert_many once `flush_batch_size` entries are queued
+    or `flush_interval` has passed. When the queue stays full for longer
+    than the enqueue timeout the entry is written synchronously instead,
+    which pushes back on writers rather than dropping history.
+
+    Entries get their `_id` before the first attempt, so a retried insert
+    skips what already reached Mongo instead of writing it twice. A batch
+    that fails every attempt is kept and retried with the next flush.
+    """
+
+    def __init__(self):
+        self.mongo_handler = MongoHandler()
+        self.collection = "document_history"
+        self.mode = BackendBaseSettings.HISTORY_WRITE_MODE
+        self.flush_batch_size = BackendBaseSettings.HISTORY_FLUSH_BATCH_SIZE
+        self.flush_interval = BackendBaseSettings.HISTORY_FLUSH_INTERVAL_MS / 1000
+        self.enqueue_timeout = BackendBaseSettings.HISTORY_ENQUEUE_TIMEOUT_MS / 1000
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=BackendBaseSettings.HISTORY_QUEUE_MAX_SIZE)
+        # Latest queued entry per document, so delta chains can be extended
+        # before the entry reaches Mongo
+        self.pending_latest: Dict[int, Dict[str, Any]] = {}
+        self.metrics = {
+            "enqueued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "sync_writes": 0,
+            "backpressure_fallbacks": 0,
+            "failed": 0,
+            "dropped": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+        self._flusher: Optional[asyncio.Task] = None
+        self._current_flush: Optional[asyncio.Future] = None
+        # Entries whose flush failed, written ahead of the queue next time
+        self._retry: List[Dict[str, Any]] = []
+        self._has_entries = asyncio.Event()
+        self._batch_full = asyncio.Event()
+
+    @property
+    def write_behind(self) -> bool:
+        return self.mode == "write_behind" and self._flusher is not None and not self._flusher.done()
+
+    async def write(self, entry: Dict[str, Any]) -> None:
+        await self.write_many([entry])
+
+    async def write_many(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        if not self.write_behind:
+            await self._insert(entries)
+            self.metrics["sync_writes"] += len(entries)
+            return
+
+        for position, entry in enumerate(entries):
+            try:
+                await asyncio.wait_for(self.queue.put(entry), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                # Queue is saturated: write the rest synchronously
+                self.metrics["backpressure_fallbacks"] += 1
+                await self._insert(entries[position:])
+                self.metrics["sync_writes"] += len(entries) - position
+                return
+            self.pending_latest[entry["document_id"]] = entry
+            self.metrics["enqueued"] += 1
+            self._has_entries.set()
+            if self.queue.qsize() >= self.flush_batch_size:
+                self._batch_full.set()
+
+    async def sync_document(self, document_id: int) -> None:
+        """Flush queued entries if `document_id` has any, so reads see them"""
+        if document_id not in self.pending_latest:
+            return
+        if self._current_flush is not None:
+            await asyncio.shield(self._current_flush)
+        while document_id in self.pending_latest and self._queued():
+            if not await self._flush(self._drain(self.flush_batch_size)):
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "running": self.write_behind,
+            "queue_depth": self.queue.qsize(),
+            "retry_depth": len(self._retry),
+            "queue_capacity": self.queue.maxsize,
+            **self.metrics,
+        }
+
+    async def start(self) -> None:
+        if self.mode == "write_behind" and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush everything still queued"""
+        if self._flusher is None:
+            return
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        self._flusher = None
+        if self._current_flush is not None:
+            await self._current_flush
+        while self._queued():
+            if not await self._flush(self._drain(self.flush_batch_size)):
+                break
+        lost = self._retry + self._drain(self.queue.qsize())
+        if lost:
+            self.metrics["dropped"] += len(lost)
+            logging.error(f"Dropping {len(lost)} unwritten history entries: {self._describe(lost)}")
+            self._retry = []
+            self._forget(lost)
+
+    async def _flush_loop(self) -> None:
+        # Entries stay in the queue until the batch is drained, so
+        # `sync_document` can always find them in the queue or the flush
+        while True:
+            await self._has_entries.wait()
+            deadline = time.monotonic() + self.flush_interval
+            while self.queue.qsize() < self.flush_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._batch_full.clear()
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            batch = self._drain(self.flush_batch_size)
+            # Shielded so shutdown never abandons a half-written batch
+            self._current_flush = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._current_flush)
+            self._current_flush = None
+
+    def _queued(self) -> bool:
+        return bool(self._retry) or not self.queue.empty()
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch, self._retry = self._retry[:limit], self._retry[limit:]
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if not self._queued():
+            self._has_entries.clear()
+        return batch
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> bool:
+        """Write a batch; returns False if it failed and was kept for a retry"""
+        if not batch:
+            return True
+        started = time.monotonic()
+        for attempt in range(1, FLUSH_ATTEMPTS + 1):
+            try:
+                await self._insert(batch)
+                break
+            except Exception as e:
+                logging.error(f"History flush attempt {attempt} failed: {str(e)}")
+                if attempt == FLUSH_ATTEMPTS:
+                    self.metrics["failed"] += len(batch)
+                    logging.error(f"Keeping {len(batch)} history entries for the next flush: {self._describe(batch)}")
+                    self._retry = batch + self._retry
+                    self._has_entries.set()
+                    return False
+                await asyncio.sleep(0.1 * attempt)
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.metrics["flushed"] += len(batch)
+        self.metrics["batches"] += 1
+        self.metrics["last_flush_ms"] = round(elapsed_ms, 3)
+        self.metrics["max_flush_ms"] = round(max(self.metrics["max_flush_ms"], elapsed_ms), 3)
+        self._forget(batch)
+        return True
+
+    def _forget(self, batch: List[Dict[str, Any]]) -> None:
+        for entry in batch:
+            if self.pending_latest.get(entry["document_id"]) is entry:
+                del self.pending_latest[entry["document_id"]]
+
+    @staticmethod
+    def _describe(entries: List[Dict[str, Any]]) -> str:
+        return ", ".join(f"{entry.get('_id')} ({entry['document_id']}@{entry['version']})" for entry in entries)
+
+    async def _insert(self, entries: List[Dict[str, Any]]) -> None:
+        """Insert entries; ones already written by an earlier attempt are skipped"""
+        for entry in entries:
+            entry.setdefault("_id", ObjectId())
+        try:
+            if len(entries) == 1:
+                await self.mongo_handler.insert_one(self.collection, entries[0])
+            else:
+                await self.mongo_handler.insert_many(self.collection, entries, ordered=False)
+        except DuplicateKeyError:
+            return
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+            if e.details.get("writeConcernErrors"):
+                raise
+
+
+@lru_cache(maxsize=1)
+def get_history_writer() -> HistoryWriter:
+    """
+    Get the process-wide history writer with LRU caching
+    :return: HistoryWriter
+    """
+    return HistoryWriter()
@@ -0,0 +1,212 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from src.utils.database.mongo_handler import MongoHandler
+
+# Indexes the document queries rely on. Keys are (field, direction) pairs;
+# the history index carries _id as a tie-breaker for keyset pagination, and
+# the tags index carries id so tag-filtered pages come back in id order.
+INDEX_SPECS: List[Dict[str, Any]] = [
+    {
+        "collection": "documents",
+        "name": "id_unique",
+        "keys": [("id", 1)],
+        "options": {"unique": True},
+    },
+    {
+        "collection": "documents",
+        "name": "tags_id",
+        "keys": [("tags", 1), ("id", 1)],
+        "options": {},
+    },
+    {
+        "collection": "document_history",
+        "name": "document_id_timestamp_desc",
+        "keys": [("document_id", 1), ("timestamp", -1), ("_id", -1)],
+        "options": {},
+    },
+    {
+        "collection": "document_history",
+        "name": "document_id_version",
+        "keys": [("document_id", 1), ("version", 1)],
+        "options": {},
+    },
+    {
+        "collection": "document_embeddings",
+        "name": "id_unique",
+        "keys": [("id", 1)],
+        "options": {"unique": True},
+    },
+]
+
+# Indexes superseded by one above, dropped by ensure_indexes: (collection, name)
+RETIRED_INDEXES: List[Tuple[str, str]] = [
+    ("documents", "tags_multikey"),
+]
+
+# Representative shapes of the queries DocumentService issues, with the
+# index each one is expected to use.
+QUERY_PROBES: List[Dict[str, Any]] = [
+    {
+        "name": "get_document",
+        "collection": "documents",
+        "query": {"id": 0},
+        "expected_index": "id_unique",
+    },
+    {
+        "name": "list_documents_after",
+        "collection": "documents",
+        "query": {"id": {"$gt": 0}},
+        "sort": [("id", 1)],
+        "limit": 10,
+        "expected_index": "id_unique",
+    },
+    {
+        "name": "documents_by_tag",
+        "collection": "documents",
+        "query": {"tags": {"$all": ["probe"]}, "id": {"$gt": 0}},
+        "sort": [("id", 1)],
+        "limit": 10,
+        "expected_index": "tags_id",
+    },
+    {
+        "name": "documents_by_any_tag",
+        "collection": "documents",
+        "query": {"tags": {"$in": ["probe", "other"]}, "id": {"$gt": 0}},
+        "sort": [("id", 1)],
+        "limit": 10,
+        "expected_index": "tags_id",
+    },
+    {
+        "name": "document_history",
+        "collection": "document_history",
+        "query": {"document_id": 0},
+        "sort": [("timestamp", -1), ("_id", -1)],
+        "limit": 10,
+        "expected_index": "document_id_timestamp_desc",
+    },
+    {
+        "name": "history_version_replay",
+        "collection": "document_history",
+        "query": {"document_id": 0, "version": {"$gt": 0, "$lte": 10}},
+        "sort": [("version", 1)],
+        "expected_index": "document_id_version",
+    },
+]
+
+
+class IndexService:
+    def __init__(self):
+        self.mongo_handler = MongoHandler()
+
+    async def ensure_indexes(self) -> List[str]:
+        """
+        Create every declared index that is missing and drop retired ones.
+        Failures (for example duplicate ids blocking the unique index) are
+        logged and skipped so they surface in `diagnose` instead of
+        preventing startup.
+        """
+        created = []
+        for spec in INDEX_SPECS:
+            try:
+                name = await self.mongo_handler.create_index(
+                    spec["collection"],
+                    spec["keys"],
+                    name=spec["name"],
+                    **spec["options"]
+                )
+                created.append(name)
+            except Exception as e:
+                logging.error(f"Could not ensure index {spec['name']}: {str(e)}")
+        logging.info(f"Ensured indexes: {created}")
+        for collection, name in RETIRED_INDEXES:
+            try:
+                if name in await self.mongo_handler.index_information(collection):
+                    await self.mongo_handler.drop_index(collection, name)
+                    logging.info(f"Dropped superseded index {name} on {collection}")
+            except Exception as e:
+                logging.error(f"Could not drop index {name}: {str(e)}")
+        return created
+
+    async def diagnose(self) -> Dict[str, Any]:
+        """Report declared indexes that are missing and queries that do not use them"""
+        indexes = []
+        existing_by_collection: Dict[str, Dict[str, Any]] = {}
+        for spec in INDEX_SPECS:
+            collection = spec["collection"]
+            if collection not in existing_by_collection:
+                existing_by_collection[collection] = await self.mongo_handler.index_information(collection)
+            indexes.append({
+                "collection": collection,
+                "name": spec["name"],
+                "keys": [list(key) for key in spec["keys"]],
+                "present": spec["name"] in existing_by_collection[collection],
+            })
+
+        queries = []
+        for probe in QUERY_PROBES:
+            queries.append(await self._check_probe(probe))
+
+        missing = [index["name"] for index in indexes if not index["present"]]
+        unused = [query["name"] for query in queries if not query["uses_expected_index"]]
+        return {
+            "healthy": not missing and not unused,
+            "missing_indexes": missing,
+            "queries_not_using_index": unused,
+            "indexes": indexes,
+            "queries": queries,
+        }
+
+    async def _check_probe(self, probe: Dict[str, Any]) -> Dict[str, Any]:
+        result = {
+            "name": probe["name"],
+            "collection": probe["collection"],
+            "expected_index": probe["expected_index"],
+            "stages": [],
+            "indexes_used": [],
+            "uses_expected_index": False,
+        }
+        try:
+            plan = await self.mongo_handler.explain(
+                probe["collection"],
+                probe["query"],
+                sort=probe.get("sort"),
+                limit=probe.get("limit", 0)
+            )
+        except Exception as e:
+            result["error"] = str(e)
+            return result
+
+        winning_plan = self._winning_plan(plan)
+        stages, index_names = [], []
+        self._walk_plan(winning_plan, stages, index_names)
+        result["stages"] = stages
+        result["indexes_used"] = index_names
+        # A sorted probe should also get its order from the index, not an in-memory SORT
+        result["uses_expected_index"] = (
+            probe["expected_index"] in index_names
+            and "COLLSCAN" not in stages
+            and not (probe.get("sort") and "SORT" in stages)
+        )
+        return result
+
+    @staticmethod
+    def _winning_plan(explain_output: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        planner = explain_output.get("queryPlanner", {})
+        winning_plan = planner.get("winningPlan", {})
+        # Slot-based execution nests the classic plan under "queryPlan"
+        return winning_plan.get("queryPlan", winning_plan)
+
+    def _walk_plan(self, node: Any, stages: List[str], index_names: List[str]) -> None:
+        if isinstance(node, list):
+            for child in node:
+                self._walk_plan(child, stages, index_names)
+            return
+        if not isinstance(node, dict):
+            return
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "indexName" in node:
+            index_names.append(node["indexName"])
+        for key in ("inputStage", "inputStages", "innerStage", "outerStage"):
+            if key in node:
+                self._walk_plan(node[key], stages, index_names)
@@ -0,0 +1,368 @@
+import asyncio
+import json
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from redis.exceptions import RedisError
+from src.database.connectors.redis_connector import get_redis_client
+from src.models.document import Document
+from src.services.cache_service import (
+    HOLD_LEASE_SCRIPT, INVALIDATION_CHANNEL, RELEASE_LEASE_SCRIPT, get_document_cache
+)
+from src.settings import BackendBaseSettings
+from src.utils.database.mongo_handler import MongoHandler
+from src.utils.inverted_index import (
+    AnalyzedDocument, InvertedIndex, analyze, load_snapshot, merge_segments, parse_query, search_segments,
+    write_snapshot
+)
+
+# Bodies larger than this are tokenized in a worker thread
+INLINE_ANALYZE_CHARS = 64 * 1024
+# Merges of fewer live documents run inline; larger ones in a worker thread
+INLINE_MERGE_DOCUMENTS = 5000
+# Indexes with fewer live documents are searched inline; larger ones in a worker thread
+INLINE_SEARCH_DOCUMENTS = 20000
+RECONCILE_BATCH_SIZE = 500
+# Pending documents are made searchable by the next search, or once there are this many
+REFRESH_PENDING_DOCUMENTS = 1000
+# Workers share SEARCH_INDEX_DIR; only the holder of this lease writes to it
+SNAPSHOT_LEASE_KEY = "lease:search_index_snapshot"
+
+
+def analyze_document(document: Document) -> AnalyzedDocument:
+    return analyze(document.id, document.version, document.title, document.content, document.tags)
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int) -> List[Tuple[int, float]]:
+    """Merge ranked id lists by summing 1 / (k + rank) per list, best first"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, document_id in enumerate(ranking, start=1):
+            scores[document_id] = scores.get(document_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+class SearchService:
+    """
+    Keyword search over title, tags and content: BM25 ranking, "quoted
+    phrase" queries, tag filters and tag facets from an in-process
+    inverted index.
+
+    Writes made through this worker's DocumentService are indexed before
+    they return; writes on other workers arrive through the cache
+    invalidation channel. The index is snapshotted to SEARCH_INDEX_DIR
+    and reconciled against Mongo by document version on startup, so
+    documents missed while down or disconnected are picked up. Every
+    worker loads the shared snapshot, but only one at a time, the holder
+    of a Redis lease, writes it.
+    """
+
+    def __init__(self):
+        self.mongo_handler = MongoHandler()
+        self.redis_client = get_redis_client()
+        self.cache = get_document_cache()
+        self.collection = "documents"
+        self.directory = BackendBaseSettings.SEARCH_INDEX_DIR
+        self.snapshot_interval = BackendBaseSettings.SEARCH_SNAPSHOT_INTERVAL_S
+        # Outlives a missed snapshot or two before another worker takes over
+        self.snapshot_lease_ms = self.snapshot_interval * 3000
+        self.index = InvertedIndex(BackendBaseSettings.SEARCH_MAX_SEGMENTS, BackendBaseSettings.SEARCH_MERGE_FACTOR)
+        self.metrics = {
+            "indexed": 0,
+            "stale_skipped": 0,
+            "peer_updates": 0,
+            "peer_skipped": 0,
+            "queries": 0,
+            "merges": 0,
+            "snapshots": 0,
+            "snapshots_skipped": 0,
+            "reconciled": 0,
+        }
+        self._query_seconds = 0.0
+        self._changed = False
+        self._tasks: List[asyncio.Task] = []
+        self._merge: Optional[asyncio.Task] = None
+        self._reconcile: Optional[asyncio.Task] = None
+        # Documents written on other workers, reloaded from Mongo in batches
+        self.peer_pending: Set[int] = set()
+        self._has_peer_updates = asyncio.Event()
+
+    async def index_document(self, document: Document) -> None:
+        await self.index_many([document])
+
+    async def index_many(self, documents: List[Document]) -> None:
+        if sum(len(document.content) for document in documents) > INLINE_ANALYZE_CHARS:
+            analyzed = await asyncio.to_thread(lambda: [analyze_document(document) for document in documents])
+        else:
+            analyzed = [analyze_document(document) for document in documents]
+        for document in analyzed:
+            # Versions arriving out of order never overwrite a newer one
+            if self.index.add(document):
+                self.metrics["indexed"] += 1
+            else:
+                self.metrics["stale_skipped"] += 1
+        self._changed = True
+        if len(self.index.pending) >= REFRESH_PENDING_DOCUMENTS:
+            self.index.refresh()
+            self._schedule_merge()
+
+    def delete(self, document_id: int) -> None:
+        if self.index.delete(document_id):
+            self._changed = True
+
+    async def search(self,
+                     query: str,
+                     tags: List[str],
+                     k: int,
+                     facet_limit: int = 0) -> Tuple[List[Tuple[int, float]], int, Dict[str, int]]:
+        """Top k (document id, BM25 score) pairs, the number of matches and tag counts over all matches"""
+        terms, phrases = parse_query(query)
+        started = time.perf_counter()
+        if self.index.documents < INLINE_SEARCH_DOCUMENTS:
+            result = self.index.search(terms, phrases, tags, k, facet_limit)
+        else:
+            # The thread gets the current segments and copies of their live
+            # flags, so writes and merges meanwhile do not change its view
+            state = self.index.snapshot_state()
+            result = await asyncio.to_thread(
+                search_segments, state, self.index.documents, self.index.total_length,
+                terms, phrases, tags, k, facet_limit
+            )
+        self._query_seconds += time.perf_counter() - started
+        self.metrics["queries"] += 1
+        self._schedule_merge()
+        return result
+
+    def with_tags(self, document_ids: List[int], tags: List[str]) -> List[int]:
+        """The documents among `document_ids` that carry every tag"""
+        return self.index.filter_tags(document_ids, tags)
+
+    def _schedule_merge(self) -> None:
+        segments = self.index.merge_candidates()
+        if not segments:
+            return
+        if sum(len(segment) for segment in segments) < INLINE_MERGE_DOCUMENTS:
+            lives = self.index.begin_merge(segments)
+            self.index.finish_merge(segments, lives, merge_segments(segments, lives))
+            self.metrics["merges"] += 1
+            self._changed = True
+        elif self._merge is None or self._merge.done():
+            # One large merge at a time; small ones keep running inline meanwhile
+            lives = self.index.begin_merge(segments)
+            self._merge = asyncio.create_task(self._merge_in_thread(segments, lives))
+
+    async def _merge_in_thread(self, segments, lives) -> None:
+        try:
+            merged = await asyncio.to_thread(merge_segments, segments, lives)
+        except Exception as e:
+            logging.error(f"Search index merge failed: {str(e)}")
+            self.index.cancel_merge(segments)
+            return
+        self.index.finish_merge(segments, lives, merged)
+        self.metrics["merges"] += 1
+        self._changed = True
+
+    async def snapshot(self) -> bool:
+        """Persist the index if it changed since the last snapshot and this worker holds the snapshot lease"""
+        if not self._changed:
+            return False
+        if not await self._hold_snapshot_lease():
+            self.metrics["snapshots_skipped"] += 1
+            return False
+        self._changed = False
+        state = self.index.snapshot_state()
+        try:
+            await asyncio.to_thread(write_snapshot, self.directory, state)
+        except Exception as e:
+            logging.error(f"Error writing search index snapshot: {str(e)}")
+            self._changed = True
+            return False
+        self.metrics["snapshots"] += 1
+        if self._tasks:
+            self._schedule_merge()
+        return True
+
+    async def _hold_snapshot_lease(self) -> bool:
+        try:
+            return bool(await self.redis_client.eval(
+                HOLD_LEASE_SCRIPT, 1, SNAPSHOT_LEASE_KEY, self.cache.instance_id, self.snapshot_lease_ms
+            ))
+        except RedisError as e:
+            # Without Redis there is no telling whether another worker is writing
+            logging.error(f"Could not take the search snapshot lease: {str(e)}")
+            return False
+
+    async def _release_snapshot_lease(self) -> None:
+        try:
+            await self.redis_client.eval(RELEASE_LEASE_SCRIPT, 1, SNAPSHOT_LEASE_KEY, self.cache.instance_id)
+        except RedisError as e:
+            # It expires on its own
+            logging.error(f"Could not release the search snapshot lease: {str(e)}")
+
+    async def reconcile(self) -> Dict[str, int]:
+        """Index documents whose version differs from Mongo's and drop documents Mongo no longer has"""
+        # Read before Mongo: documents indexed during the scan are not in this
+        # set, so they cannot be mistaken for deleted ones
+        indexed_ids, indexed_versions = self.index.live_versions()
+        stored = await self.mongo_handler.find_many(
+            self.collection,
+            {},
+            limit=0,
+            projection={"_id": 0, "id": 1, "version": 1}
+        )
+        stored_ids = np.array([doc["id"] for doc in stored], dtype=np.int64)
+        stored_versions = np.array([doc["version"] for doc in stored], dtype=np.int64)
+        order = np.argsort(indexed_ids)
+        indexed_ids, indexed_versions = indexed_ids[order], indexed_versions[order]
+
+        positions = np.minimum(np.searchsorted(indexed_ids, stored_ids), max(len(indexed_ids) - 1, 0))
+        if len(indexed_ids):
+            current = (indexed_ids[positions] == stored_ids) & (indexed_versions[positions] >= stored_versions)
+        else:
+            current = np.zeros(len(stored_ids), dtype=bool)
+        outdated = stored_ids[~current].tolist()
+        removed = np.setdiff1d(indexed_ids, stored_ids, assume_unique=True).tolist()
+
+        for start in range(0, len(outdated), RECONCILE_BATCH_SIZE):
+            docs = await self.mongo_handler.find_many(
+                self.collection,
+                {"id": {"$in": outdated[start:start + RECONCILE_BATCH_SIZE]}},
+                limit=0,
+                projection={"_id": 0}
+            )
+            await self.index_many([Document.model_validate(doc) for doc in docs])
+        for document_id in removed:
+            self.delete(document_id)
+        self.metrics["reconciled"] += len(outdated) + len(removed)
+        logging.info(f"Search index reconciled: {len(outdated)} documents indexed, {len(removed)} removed")
+        return {"indexed": len(outdated), "removed": len(removed)}
+
+    def stats(self) -> Dict[str, Any]:
+        queries = self.metrics["queries"]
+        return {
+            "documents": self.index.documents,
+            "pending": len(self.index.pending),
+            "segments": [len(segment) for segment in self.index.segments],
+            "merging": len(self.index.merging),
+            "reconciling": self._reconcile is not None and not self._reconcile.done(),
+            "avg_query_ms": round(self._query_seconds * 1000 / queries, 3) if queries else 0.0,
+            **self.metrics,
+        }
+
+    async def start(self) -> None:
+        """Load the last snapshot, then catch up with Mongo and other workers in the background"""
+        if self._tasks:
+            return
+        try:
+            segments = await asyncio.to_thread(load_snapshot, self.directory)
+            self.index = InvertedIndex(self.index.max_segments, self.index.merge_factor, segments)
+            logging.info(f"Loaded search index snapshot: {self.index.documents} documents in {len(segments)} segments")
+        except Exception as e:
+            # Rebuilt from Mongo by the reconcile below
+            logging.error(f"Could not load search index snapshot: {str(e)}")
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._sync_peer_updates()),
+            asyncio.create_task(self._snapshot_periodically()),
+        ]
+        self._start_reconcile()
+
+    async def stop(self) -> None:
+        for task in [*self._tasks, self._reconcile, self._merge]:
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._tasks = []
+        self.index.cancel_merge()
+        await self.snapshot()
+        await self._release_snapshot_lease()
+
+    def _start_reconcile(self) -> None:
+        if self._reconcile is None or self._reconcile.done():
+            self._reconcile = asyncio.create_task(self._run_reconcile())
+
+    async def _run_reconcile(self) -> None:
+        try:
+            await self.reconcile()
+        except Exception as e:
+            logging.error(f"Search index reconcile failed: {str(e)}")
+
+    async def _snapshot_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+
+    def _queue_peer_update(self, document_id: int, version: Optional[int]) -> None:
+        indexed = self.index.version_of(document_id)
+        if version is not None and indexed is not None and indexed >= version:
+            self.metrics["peer_skipped"] += 1
+            return
+        self.peer_pending.add(document_id)
+        self._has_peer_updates.set()
+
+    async def _sync_peer_updates(self) -> None:
+        while True:
+            await self._has_peer_updates.wait()
+            batch = [self.peer_pending.pop() for _ in range(min(len(self.peer_pending), RECONCILE_BATCH_SIZE))]
+            if not self.peer_pending:
+                self._has_peer_updates.clear()
+            try:
+                await self._sync_documents(batch)
+            except Exception as e:
+                logging.error(f"Could not reload {len(batch)} documents updated on other workers: {str(e)}")
+                self.peer_pending.update(batch)
+                self._has_peer_updates.set()
+                await asyncio.sleep(1)
+
+    async def _sync_documents(self, document_ids: List[int]) -> None:
+        docs = await self.mongo_handler.find_many(
+            self.collection,
+            {"id": {"$in": document_ids}},
+            limit=0,
+            projection={"_id": 0}
+        )
+        await self.index_many([Document.model_validate(doc) for doc in docs])
+        for document_id in set(document_ids).difference(doc["id"] for doc in docs):
+            self.delete(document_id)
+        self.metrics["peer_updates"] += len(document_ids)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        payload = json.loads(message["data"])
+                        # This worker's own writes are indexed on the write path
+                        if payload.get("origin") != self.cache.instance_id:
+                            version = payload.get("version")
+                            self._queue_peer_update(int(payload["id"]), None if version is None else int(version))
+                    except (ValueError, TypeError, KeyError, AttributeError) as e:
+                        # One bad message says nothing about the connection
+                        logging.error(f"Ignoring invalid document update message {message['data']!r}: {str(e)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Writes may have been missed while disconnected
+                logging.error(f"Search index listener failed: {str(e)}")
+                self._start_reconcile()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+@lru_cache(maxsize=1)
+def get_search_service() -> SearchService:
+    """
+    Get the process-wide search service with LRU caching
+    :return: SearchService
+    """
+    return SearchService()
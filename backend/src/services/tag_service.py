@@ -0,0 +1,122 @@
+import logging
+import uuid
+from collections import Counter
+from fastapi import HTTPException
+from typing import Iterable, List, Optional, Tuple
+from src.database.connectors.redis_connector import get_redis_client
+from src.models.tag import TagCount, TagList
+from src.services.cache_service import RELEASE_LEASE_SCRIPT
+from src.utils.database.mongo_handler import MongoHandler
+
+TAG_COUNTS_KEY = "tags:counts"
+REBUILD_LEASE_MS = 10 * 60 * 1000
+REBUILD_BATCH_SIZE = 1000
+
+
+class TagService:
+    """
+    Number of documents per tag, kept in a Redis sorted set (tag -> count)
+    that writes adjust incrementally, so reading counts never scans the
+    documents. `rebuild` recomputes the set from Mongo when it is missing
+    or has drifted, e.g. after a failed increment.
+    """
+
+    def __init__(self):
+        self.mongo_handler = MongoHandler()
+        self.redis_client = get_redis_client()
+        self.collection = "documents"
+        self.key = TAG_COUNTS_KEY
+
+    async def record(self, added: Iterable[Iterable[str]] = (), removed: Iterable[Iterable[str]] = ()) -> None:
+        """
+        Count the tag lists of documents created (`added`) and the ones
+        they replaced or that were deleted (`removed`), in one round trip
+        """
+        delta: Counter = Counter()
+        for tags in added:
+            delta.update(set(tags))
+        for tags in removed:
+            delta.subtract(set(tags))
+        changes = {tag: change for tag, change in delta.items() if change}
+        if not changes:
+            return
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            for tag, change in changes.items():
+                pipe.zincrby(self.key, change, tag)
+            if any(change < 0 for change in changes.values()):
+                # Tags no document carries any more are dropped
+                pipe.zremrangebyscore(self.key, "-inf", 0)
+            await pipe.execute()
+
+    async def top(self, limit: int, skip: int = 0) -> Tuple[List[Tuple[str, int]], int]:
+        """(tag, count) pairs, most used first, and the number of distinct tags"""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.zrevrange(self.key, skip, skip + limit - 1, withscores=True)
+            pipe.zcard(self.key)
+            counts, total = await pipe.execute()
+        return [(self._decode(tag), int(count)) for tag, count in counts], total
+
+    async def list_counts(self, skip: int = 0, limit: int = 100) -> TagList:
+        """Tags with the number of documents carrying each, most used first"""
+        try:
+            counts, total = await self.top(limit, skip)
+        except Exception as e:
+            logging.error(f"Error reading tag counts: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to retrieve tags")
+        return TagList(
+            items=[TagCount(tag=tag, count=count) for tag, count in counts],
+            total=total,
+            skip=skip,
+            limit=limit
+        )
+
+    async def count(self, tag: str) -> int:
+        score = await self.redis_client.zscore(self.key, tag)
+        return int(score) if score else 0
+
+    async def rebuild(self) -> int:
+        """
+        Recompute every count with one aggregation over the documents and
+        swap the result in atomically. Writes that land while it runs may
+        be counted twice or not at all; run it again once they settle.
+        """
+        docs = await self.mongo_handler.aggregate(self.collection, [
+            {"$project": {"_id": 0, "tags": {"$setUnion": [{"$ifNull": ["$tags", []]}, []]}}},
+            {"$unwind": "$tags"},
+            {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+        ])
+        staging = f"{self.key}:rebuild:{uuid.uuid4().hex}"
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(docs), REBUILD_BATCH_SIZE):
+                pipe.zadd(staging, {doc["_id"]: doc["count"] for doc in docs[start:start + REBUILD_BATCH_SIZE]})
+            await pipe.execute()
+        if docs:
+            await self.redis_client.rename(staging, self.key)
+        else:
+            await self.redis_client.delete(self.key)
+        logging.info(f"Rebuilt tag counts: {len(docs)} tags")
+        return len(docs)
+
+    async def ensure_counts(self) -> Optional[int]:
+        """
+        Rebuild the counts if Redis lost them; one worker rebuilds, the
+        others skip. Failures are logged so they do not prevent startup.
+        """
+        try:
+            if await self.redis_client.exists(self.key):
+                return None
+            lease_key, token = f"lease:{self.key}", uuid.uuid4().hex
+            if not await self.redis_client.set(lease_key, token, nx=True, px=REBUILD_LEASE_MS):
+                return None
+            try:
+                return await self.rebuild()
+            finally:
+                # Left alone if the rebuild outlasted the lease and another worker took it
+                await self.redis_client.eval(RELEASE_LEASE_SCRIPT, 1, lease_key, token)
+        except Exception as e:
+            logging.error(f"Could not rebuild tag counts: {str(e)}")
+            return None
+
+    @staticmethod
+    def _decode(tag) -> str:
+        return tag.decode() if isinstance(tag, bytes) else tag
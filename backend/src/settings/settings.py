@@ -40,7 +40,72 @@ class BackendBaseSettings:
     
     DATE_FORMAT: str = "%Y-%m-%d %H:%M:%S"
     BACKUP: int = 7
+
+    # Document cache: Redis tier TTL and the in-process tier in front of it
+    DOCUMENT_CACHE_TTL: int = int(os.getenv("DOCUMENT_CACHE_TTL", 3600))
+    LOCAL_CACHE_TTL: float = float(os.getenv("LOCAL_CACHE_TTL", 30))
+    LOCAL_CACHE_MAX_ENTRIES: int = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", 1024))
+    LOCAL_CACHE_MAX_BYTES: int = int(os.getenv("LOCAL_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    # Cache fills: cross-process lease length and early refresh aggressiveness
+    CACHE_FILL_LEASE_MS: int = int(os.getenv("CACHE_FILL_LEASE_MS", 3000))
+    CACHE_EARLY_REFRESH_BETA: float = float(os.getenv("CACHE_EARLY_REFRESH_BETA", 1.0))
+
+    # Upper bounds for the bulk create and multi-get endpoints
+    MAX_BULK_DOCUMENTS: int = int(os.getenv("MAX_BULK_DOCUMENTS", 500))
+    MAX_BATCH_IDS: int = int(os.getenv("MAX_BATCH_IDS", 100))
+    # Upper bound for the ops in one PATCH
+    MAX_PATCH_OPS: int = int(os.getenv("MAX_PATCH_OPS", 1000))
+
+    # Document history: every Nth version is stored in full, the rest as deltas
+    HISTORY_SNAPSHOT_INTERVAL: int = int(os.getenv("HISTORY_SNAPSHOT_INTERVAL", 20))
+    # "sync" inserts history before a write returns; "write_behind" queues
+    # entries and flushes them in batches from a background task
+    HISTORY_WRITE_MODE: str = os.getenv("HISTORY_WRITE_MODE", "sync")
+    HISTORY_QUEUE_MAX_SIZE: int = int(os.getenv("HISTORY_QUEUE_MAX_SIZE", 10000))
+    HISTORY_FLUSH_BATCH_SIZE: int = int(os.getenv("HISTORY_FLUSH_BATCH_SIZE", 500))
+    HISTORY_FLUSH_INTERVAL_MS: int = int(os.getenv("HISTORY_FLUSH_INTERVAL_MS", 50))
+    HISTORY_ENQUEUE_TIMEOUT_MS: int = int(os.getenv("HISTORY_ENQUEUE_TIMEOUT_MS", 100))
     
+    # Stored bodies at or above this size are compressed in Redis and history;
+    # "zstd" falls back to zlib when zstandard is not installed, "none" disables
+    COMPRESSION_ALGORITHM: str = os.getenv("COMPRESSION_ALGORITHM", "zstd")
+    COMPRESSION_THRESHOLD_BYTES: int = int(os.getenv("COMPRESSION_THRESHOLD_BYTES", 4096))
+    COMPRESSION_LEVEL: int = int(os.getenv("COMPRESSION_LEVEL", 3))
+
+    # Embedding pipeline: created documents are chunked, embedded and
+    # upserted into the FAISS service in the background (needs FAISS_SERVICE_URL).
+    # EMBEDDER is "hashing" or a "package.module:Class" Embedder subclass.
+    EMBEDDER: str = os.getenv("EMBEDDER", "hashing")
+    EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", 256))
+    EMBEDDING_INDEX_NAME: str = os.getenv("EMBEDDING_INDEX_NAME", "documents")
+    EMBEDDING_INDEX_TYPE: str = os.getenv("EMBEDDING_INDEX_TYPE", "Flat")
+    EMBEDDING_CHUNK_CHARS: int = int(os.getenv("EMBEDDING_CHUNK_CHARS", 1000))
+    # Chunks per embed call and FAISS upsert, documents per pipeline batch
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+    EMBEDDING_BATCH_DOCUMENTS: int = int(os.getenv("EMBEDDING_BATCH_DOCUMENTS", 100))
+    EMBEDDING_QUEUE_MAX_SIZE: int = int(os.getenv("EMBEDDING_QUEUE_MAX_SIZE", 10000))
+
+    # Keyword search: in-process inverted index, snapshotted to SEARCH_INDEX_DIR
+    SEARCH_INDEX_DIR: str = os.getenv("SEARCH_INDEX_DIR", "search_index")
+    SEARCH_SNAPSHOT_INTERVAL_S: int = int(os.getenv("SEARCH_SNAPSHOT_INTERVAL_S", 60))
+    # Past SEARCH_MAX_SEGMENTS segments, the SEARCH_MERGE_FACTOR smallest are merged
+    SEARCH_MAX_SEGMENTS: int = int(os.getenv("SEARCH_MAX_SEGMENTS", 16))
+    SEARCH_MERGE_FACTOR: int = int(os.getenv("SEARCH_MERGE_FACTOR", 8))
+    SEARCH_FACET_LIMIT: int = int(os.getenv("SEARCH_FACET_LIMIT", 20))
+    # Hybrid search: candidates taken from each ranking and the RRF constant
+    SEARCH_RRF_WINDOW: int = int(os.getenv("SEARCH_RRF_WINDOW", 50))
+    SEARCH_RRF_K: int = int(os.getenv("SEARCH_RRF_K", 60))
+
+    # Collaborative editing over WebSocket: ops are batched for COLLAB_BATCH_WINDOW_MS
+    # before broadcast, and an edited document is written to Mongo every
+    # COLLAB_PERSIST_INTERVAL_S rather than on every op
+    COLLAB_BATCH_WINDOW_MS: int = int(os.getenv("COLLAB_BATCH_WINDOW_MS", 20))
+    COLLAB_PERSIST_INTERVAL_S: float = float(os.getenv("COLLAB_PERSIST_INTERVAL_S", 2))
+    # Frames queued for one connection before it is dropped as too slow
+    COLLAB_CLIENT_QUEUE: int = int(os.getenv("COLLAB_CLIENT_QUEUE", 1000))
+    # Session state and op log in Redis expire this long after the last edit
+    COLLAB_STATE_TTL_S: int = int(os.getenv("COLLAB_STATE_TTL_S", 86400))
+
     class Config:
         case_sensitive: bool = True
         env_file: str = f"{str(ROOT_DIR)}/.env"
@@ -0,0 +1,3 @@
+from .local_cache import LocalCache
+
+__all__ = ["LocalCache"]
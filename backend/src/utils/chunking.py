@@ -0,0 +1,61 @@
+import hashlib
+import re
+from typing import List
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def chunk_text(text: str, chunk_chars: int) -> List[str]:
+    """
+    Split text into chunks of about `chunk_chars` characters. Paragraphs
+    are packed together until a chunk reaches the target, so an edit
+    usually changes only the chunk it falls in and later boundaries stay
+    put. Paragraphs longer than the target are split on sentences, then
+    on whitespace.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for piece in _split_long(paragraph, chunk_chars):
+            current.append(piece)
+            size += len(piece)
+            if size >= chunk_chars:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _split_long(paragraph: str, chunk_chars: int) -> List[str]:
+    if len(paragraph) <= chunk_chars:
+        return [paragraph]
+    pieces: List[str] = []
+    piece = ""
+    for sentence in SENTENCE_END.split(paragraph):
+        while len(sentence) > chunk_chars:
+            # No sentence break in range: cut at the last space before the limit
+            cut = sentence.rfind(" ", 0, chunk_chars)
+            cut = cut if cut > 0 else chunk_chars
+            if piece:
+                pieces.append(piece)
+                piece = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if piece and len(piece) + len(sentence) + 1 > chunk_chars:
+            pieces.append(piece)
+            piece = ""
+        piece = f"{piece} {sentence}" if piece else sentence
+    if piece:
+        pieces.append(piece)
+    return pieces
+
+
+def chunk_hash(chunk: str) -> str:
+    """Stable content hash used to skip re-embedding unchanged chunks"""
+    return hashlib.blake2b(chunk.encode(), digest_size=16).hexdigest()
@@ -0,0 +1,114 @@
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Union
+from src.settings import BackendBaseSettings
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib from the standard library is the fallback
+    zstandard = None
+
+# Encoded values start with a one-byte format marker. Values without a
+# marker (plain JSON starts with "{", plain text is stored as str) are
+# returned unchanged, so data written before compression stays readable.
+ZSTD_MARKER = b"\x01"
+ZLIB_MARKER = b"\x02"
+
+
+class Codec:
+    """
+    Size-threshold compression for stored document bodies. Values below
+    `threshold` bytes are kept as they are; larger ones are compressed with
+    zstd when it is installed and zlib otherwise.
+    """
+
+    def __init__(self, threshold: int, level: int, algorithm: str = "zstd"):
+        self.threshold = threshold
+        self.level = level
+        if algorithm == "zstd" and zstandard is None:
+            algorithm = "zlib"
+        self.algorithm = algorithm
+        self._compressor = zstandard.ZstdCompressor(level=level) if algorithm == "zstd" else None
+        self._decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+        self.metrics = {
+            "compressed": 0,
+            "skipped": 0,
+            "decompressed": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "compress_ms": 0.0,
+            "decompress_ms": 0.0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.algorithm in ("zstd", "zlib")
+
+    def encode(self, data: bytes) -> bytes:
+        """Compress `data` if it is above the threshold and compression pays off"""
+        if not self.enabled or len(data) < self.threshold:
+            self.metrics["skipped"] += 1
+            return data
+        started = time.perf_counter()
+        if self.algorithm == "zstd":
+            encoded = ZSTD_MARKER + self._compressor.compress(data)
+        else:
+            encoded = ZLIB_MARKER + zlib.compress(data, self.level)
+        self.metrics["compress_ms"] += (time.perf_counter() - started) * 1000
+        if len(encoded) >= len(data):
+            self.metrics["skipped"] += 1
+            return data
+        self.metrics["compressed"] += 1
+        self.metrics["bytes_in"] += len(data)
+        self.metrics["bytes_out"] += len(encoded)
+        return encoded
+
+    def decode(self, data: bytes) -> bytes:
+        """Reverse `encode`; unmarked values are returned as they are"""
+        marker = data[:1]
+        if marker not in (ZSTD_MARKER, ZLIB_MARKER):
+            return data
+        started = time.perf_counter()
+        if marker == ZSTD_MARKER:
+            if self._decompressor is None:
+                raise RuntimeError("zstd-compressed value found but zstandard is not installed")
+            decoded = self._decompressor.decompress(data[1:])
+        else:
+            decoded = zlib.decompress(data[1:])
+        self.metrics["decompress_ms"] += (time.perf_counter() - started) * 1000
+        self.metrics["decompressed"] += 1
+        return decoded
+
+    def encode_text(self, text: str) -> Union[str, bytes]:
+        """Text for a Mongo field: kept as str unless compressing shrinks it"""
+        data = text.encode()
+        encoded = self.encode(data)
+        return text if encoded is data else encoded
+
+    def decode_text(self, value: Union[str, bytes]) -> str:
+        if isinstance(value, str):
+            return value
+        return self.decode(bytes(value)).decode()
+
+    def stats(self) -> Dict[str, Any]:
+        bytes_in, bytes_out = self.metrics["bytes_in"], self.metrics["bytes_out"]
+        return {
+            "algorithm": self.algorithm,
+            "threshold_bytes": self.threshold,
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.metrics.items()},
+            "ratio": round(bytes_in / bytes_out, 3) if bytes_out else None,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_codec() -> Codec:
+    """
+    Get the process-wide codec with LRU caching
+    :return: Codec
+    """
+    return Codec(
+        threshold=BackendBaseSettings.COMPRESSION_THRESHOLD_BYTES,
+        level=BackendBaseSettings.COMPRESSION_LEVEL,
+        algorithm=BackendBaseSettings.COMPRESSION_ALGORITHM
+    )
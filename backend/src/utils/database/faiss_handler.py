@@ -0,0 +1,67 @@
+from typing import Any, Dict, List, Optional
+import logging
+from src.database.connectors.faiss_connector import get_faiss_client
+
+
+class FaissHandler:
+    def __init__(self):
+        self.client = get_faiss_client()
+
+    async def create_index(self, index_name: str, dimension: int, index_type: str = "Flat") -> bool:
+        """Create an index; returns False if it already exists"""
+        try:
+            response = await self.client.post(
+                "/create_index",
+                params={"index_name": index_name, "dimension": dimension, "index_type": index_type}
+            )
+            if response.status_code == 400 and "already exists" in response.text:
+                return False
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            logging.error(f"Error creating FAISS index {index_name}: {str(e)}")
+            raise
+
+    async def upsert_vectors(self,
+                             index_name: str,
+                             ids: List[int],
+                             vectors: List[List[float]],
+                             metadata: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Add vectors, replacing any stored under the same ids"""
+        try:
+            response = await self.client.post(
+                "/upsert_vectors",
+                params={"index_name": index_name},
+                json={"ids": ids, "vectors": vectors, "metadata": metadata}
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logging.error(f"Error upserting vectors into {index_name}: {str(e)}")
+            raise
+
+    async def delete_vectors(self, index_name: str, ids: List[int]) -> int:
+        """Delete vectors by id and return how many existed"""
+        try:
+            response = await self.client.post("/delete_vectors", params={"index_name": index_name}, json={"ids": ids})
+            response.raise_for_status()
+            return response.json()["deleted"]
+        except Exception as e:
+            logging.error(f"Error deleting vectors from {index_name}: {str(e)}")
+            raise
+
+    async def search(self, index_name: str, vector: List[float], k: int) -> List[Dict[str, Any]]:
+        """Nearest stored vectors as {"id", "distance", "metadata"} hits, closest first"""
+        try:
+            response = await self.client.post(
+                "/search",
+                json={"index_name": index_name, "query_vector": vector, "k": k}
+            )
+            if response.status_code == 404:
+                # Nothing has been indexed yet
+                return []
+            response.raise_for_status()
+            return response.json()["results"]
+        except Exception as e:
+            logging.error(f"Error searching {index_name}: {str(e)}")
+            raise
+
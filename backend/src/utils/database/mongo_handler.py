@@ -2,6 +2,8 @@ from typing import Any, Dict, List, Optional, Tuple
 from src.database.connectors.mongo_connector import get_mongo_instance
 import logging
 from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
 from src.utils.serializers import serialize_doc
 
 class MongoHandler:
@@ -11,17 +13,35 @@ class MongoHandler:
     async def insert_one(self, collection: str, document: Dict[str, Any]) -> str:
         """Insert a single document into MongoDB"""
         try:
-            result = self.db[collection].insert_one(document)
+            result = await self.db[collection].insert_one(document)
             return str(result.inserted_id)
         except Exception as e:
             logging.error(f"Error inserting document: {str(e)}")
             raise
 
-    async def find_one(self, collection: str, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def insert_many(self,
+                          collection: str,
+                          documents: List[Dict[str, Any]],
+                          ordered: bool = False) -> List[str]:
+        """
+        Insert documents in one round trip. With `ordered=False` every
+        document is attempted; failures surface as a BulkWriteError.
+        """
+        try:
+            result = await self.db[collection].insert_many(documents, ordered=ordered)
+            return [str(inserted_id) for inserted_id in result.inserted_ids]
+        except Exception as e:
+            logging.error(f"Error inserting documents: {str(e)}")
+            raise
+
+    async def find_one(self,
+                       collection: str,
+                       query: Dict[str, Any],
+                       projection: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
         """Find a single document in MongoDB"""
         try:
-            doc = self.db[collection].find_one(query)
-            return serialize_doc(doc) if doc else None
+            doc = await self.db[collection].find_one(query, projection)
+            return self._serialize(doc, projection) if doc else None
         except Exception as e:
             logging.error(f"Error finding document: {str(e)}")
             raise
@@ -31,16 +51,17 @@ class MongoHandler:
                        query: Dict[str, Any], 
                        skip: int = 0, 
                        limit: int = 100,
-                       sort: List[Tuple[str, int]] = None) -> List[Dict[str, Any]]:
+                       sort: List[Tuple[str, int]] = None,
+                       projection: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Find multiple documents in MongoDB with pagination and sorting"""
         try:
-            cursor = self.db[collection].find(query)
+            cursor = self.db[collection].find(query, projection)
             
             if sort:
                 cursor = cursor.sort(sort)
             
             cursor = cursor.skip(skip).limit(limit)
-            return [serialize_doc(doc) for doc in cursor]
+            return [self._serialize(doc, projection) async for doc in cursor]
         except Exception as e:
             logging.error(f"Error finding documents: {str(e)}")
             raise
@@ -51,16 +72,61 @@ class MongoHandler:
                         update: Dict[str, Any]) -> bool:
         """Update a single document in MongoDB"""
         try:
-            result = self.db[collection].update_one(query, {"$set": update})
+            result = await self.db[collection].update_one(query, {"$set": update})
             return result.modified_count > 0
         except Exception as e:
             logging.error(f"Error updating document: {str(e)}")
             raise
 
+    async def replace_one(self,
+                          collection: str,
+                          query: Dict[str, Any],
+                          document: Dict[str, Any]) -> bool:
+        """Replace a single document in MongoDB"""
+        try:
+            result = await self.db[collection].replace_one(query, document)
+            return result.modified_count > 0
+        except Exception as e:
+            logging.error(f"Error replacing document: {str(e)}")
+            raise
+
+    async def replace_many(self,
+                           collection: str,
+                           documents: List[Dict[str, Any]],
+                           key: str = "id",
+                           version_key: Optional[str] = None) -> List[Any]:
+        """
+        Replace or insert documents matched on `key`, in one bulk write.
+        With `version_key` (and a unique index on `key`), a stored document
+        is never replaced by one with a lower version; returns the keys of
+        the documents skipped for that reason.
+        """
+        def match(document: Dict[str, Any]) -> Dict[str, Any]:
+            if version_key is None:
+                return {key: document[key]}
+            return {key: document[key], version_key: {"$lte": document[version_key]}}
+
+        try:
+            await self.db[collection].bulk_write(
+                [ReplaceOne(match(document), document, upsert=True) for document in documents],
+                ordered=False
+            )
+            return []
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            # A newer stored version fails the filter, and the upsert then hits the unique key
+            if version_key is not None and errors and all(error["code"] == 11000 for error in errors):
+                return [documents[error["index"]][key] for error in errors]
+            logging.error(f"Error replacing documents: {str(e)}")
+            raise
+        except Exception as e:
+            logging.error(f"Error replacing documents: {str(e)}")
+            raise
+
     async def delete_one(self, collection: str, query: Dict[str, Any]) -> bool:
         """Delete a single document from MongoDB"""
         try:
-            result = self.db[collection].delete_one(query)
+            result = await self.db[collection].delete_one(query)
             return result.deleted_count > 0
         except Exception as e:
             logging.error(f"Error deleting document: {str(e)}")
@@ -69,7 +135,84 @@ class MongoHandler:
     async def count_documents(self, collection: str, query: Dict[str, Any]) -> int:
         """Count documents matching a query"""
         try:
-            return self.db[collection].count_documents(query)
+            return await self.db[collection].count_documents(query)
         except Exception as e:
             logging.error(f"Error counting documents: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    async def distinct(self, collection: str, key: str, query: Dict[str, Any] = None) -> List[Any]:
+        """Return the distinct values of a field"""
+        try:
+            return await self.db[collection].distinct(key, query or {})
+        except Exception as e:
+            logging.error(f"Error reading distinct values: {str(e)}")
+            raise
+
+    async def aggregate(self, collection: str, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run an aggregation pipeline and return every result document"""
+        try:
+            cursor = await self.db[collection].aggregate(pipeline, allowDiskUse=True)
+            return [doc async for doc in cursor]
+        except Exception as e:
+            logging.error(f"Error running aggregation on {collection}: {str(e)}")
+            raise
+
+    async def estimated_document_count(self, collection: str) -> int:
+        """Count all documents in a collection from collection metadata"""
+        try:
+            return await self.db[collection].estimated_document_count()
+        except Exception as e:
+            logging.error(f"Error estimating document count: {str(e)}")
+            raise
+
+    async def create_index(self,
+                           collection: str,
+                           keys: List[Tuple[str, int]],
+                           **options: Any) -> str:
+        """Create an index if it does not exist yet and return its name"""
+        try:
+            return await self.db[collection].create_index(keys, **options)
+        except Exception as e:
+            logging.error(f"Error creating index on {collection}: {str(e)}")
+            raise
+
+    async def drop_index(self, collection: str, name: str) -> None:
+        """Drop an index by name"""
+        try:
+            await self.db[collection].drop_index(name)
+        except Exception as e:
+            logging.error(f"Error dropping index {name} on {collection}: {str(e)}")
+            raise
+
+    async def index_information(self, collection: str) -> Dict[str, Dict[str, Any]]:
+        """Return the existing indexes of a collection keyed by name"""
+        try:
+            return await self.db[collection].index_information()
+        except Exception as e:
+            logging.error(f"Error reading indexes of {collection}: {str(e)}")
+            raise
+
+    async def explain(self,
+                      collection: str,
+                      query: Dict[str, Any],
+                      sort: List[Tuple[str, int]] = None,
+                      limit: int = 0) -> Dict[str, Any]:
+        """Return the query planner output for a find"""
+        try:
+            cursor = self.db[collection].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return await cursor.explain()
+        except Exception as e:
+            logging.error(f"Error explaining query on {collection}: {str(e)}")
+            raise
+
+    @staticmethod
+    def _serialize(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # Reads that project away _id carry no BSON-only types, so they skip
+        # the recursive conversion and are returned as stored
+        if projection and projection.get("_id") in (0, False):
+            return doc
+        return serialize_doc(doc)
@@ -0,0 +1,72 @@
+import hashlib
+import importlib
+from abc import ABC, abstractmethod
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import List, Tuple
+from src.settings import BackendBaseSettings
+
+TOKEN = re.compile(r"\w+")
+
+
+class Embedder(ABC):
+    """
+    Turns texts into fixed-size vectors. Custom embedders subclass this,
+    set `dimension` and are selected with EMBEDDER="package.module:Class".
+    `embed` is called from a worker thread with batches of texts.
+    """
+    dimension: int
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """One vector of `dimension` floats per text"""
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic bag-of-words embedder that needs no model or corpus
+    statistics. Each word and adjacent word pair is hashed to one of
+    `dimension` buckets with a +/-1 sign and weighted 1 + log(tf); vectors
+    are L2-normalized so squared L2 distance ranks by cosine similarity.
+    """
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text: str) -> List[float]:
+        words = TOKEN.findall(text.lower())
+        features = Counter(words)
+        features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+        vector = [0.0] * self.dimension
+        for feature, count in features.items():
+            bucket, sign = _bucket(feature, self.dimension)
+            vector[bucket] += sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+
+@lru_cache(maxsize=65536)
+def _bucket(feature: str, dimension: int) -> Tuple[int, float]:
+    # Python's hash() is salted per process; vectors must match across restarts
+    digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+    return digest % dimension, 1.0 if digest >> 63 else -1.0
+
+
+@lru_cache(maxsize=1)
+def get_embedder() -> Embedder:
+    """
+    Get the configured embedder with LRU caching
+    :return: Embedder
+    """
+    name = BackendBaseSettings.EMBEDDER
+    if name == "hashing":
+        return HashingEmbedder(BackendBaseSettings.EMBEDDING_DIMENSION)
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"EMBEDDER must be 'hashing' or 'package.module:Class', got {name!r}")
+    return getattr(importlib.import_module(module_name), class_name)()
@@ -0,0 +1,45 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Iterable, Optional, Tuple
+
+
+def document_etag(document_id, version: int) -> str:
+    """Strong ETag for one version of a document"""
+    return f'"{document_id}-{version}"'
+
+
+def list_etag(versions: Iterable[Tuple[int, int]], *extra) -> str:
+    """Weak ETag for a page of documents, from their (id, version) pairs"""
+    digest = hashlib.sha1()
+    for document_id, version in versions:
+        digest.update(f"{document_id}:{version};".encode())
+    for value in extra:
+        digest.update(f"|{value}".encode())
+    return f'W/"{digest.hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 7232)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def http_date(timestamp: Optional[str]) -> Optional[str]:
+    """Format an ISO timestamp as an HTTP date; naive timestamps are UTC"""
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return format_datetime(parsed.astimezone(timezone.utc), usegmt=True)
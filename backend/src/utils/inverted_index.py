@@ -0,0 +1,569 @@
+import itertools
+import json
+import os
+import re
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN = re.compile(r"\w+")
+PHRASE = re.compile(r'"([^"]*)"')
+# Term frequency weight of a token by field. Fields are FIELD_GAP positions
+# apart so a phrase never matches across a field boundary.
+FIELD_WEIGHTS = (("title", 2.0), ("tags", 1.5), ("content", 1.0))
+FIELD_GAP = 8
+BM25_K1 = 1.2
+BM25_B = 0.75
+MANIFEST = "manifest.json"
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower())
+
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """
+    Split a query into scored terms and "quoted phrases". Every term,
+    including the words of phrases, adds to the score; phrases must match.
+    """
+    phrases = [words for words in map(tokenize, PHRASE.findall(query)) if words]
+    terms = tokenize(PHRASE.sub(" ", query)) + [word for words in phrases for word in words]
+    return list(dict.fromkeys(terms)), phrases
+
+
+@dataclass
+class AnalyzedDocument:
+    id: int
+    version: int
+    terms: List[str]
+    positions: List[int]
+    weights: List[float]
+    length: float
+    tags: List[str]
+
+
+def analyze(document_id: int, version: int, title: str, content: str, tags: List[str]) -> AnalyzedDocument:
+    values = {"title": title, "tags": " ".join(tags), "content": content}
+    terms: List[str] = []
+    positions: List[int] = []
+    weights: List[float] = []
+    position = 0
+    length = 0.0
+    for field, weight in FIELD_WEIGHTS:
+        tokens = tokenize(values[field])
+        terms.extend(tokens)
+        positions.extend(range(position, position + len(tokens)))
+        weights.extend([weight] * len(tokens))
+        position += len(tokens) + FIELD_GAP
+        length += weight * len(tokens)
+    return AnalyzedDocument(document_id, version, terms, positions, weights, length, list(dict.fromkeys(tags)))
+
+
+class Segment:
+    """
+    Postings for a set of documents, sorted by document id. Everything but
+    `live` is immutable once built, so searches and merges can read a
+    segment while writes only flip `live` flags.
+
+    Postings are stored CSR-style: term t owns postings
+    post_offsets[t]:post_offsets[t + 1], each with a local document number
+    and a weighted term frequency. Posting p owns token positions
+    pos_offsets[p]:pos_offsets[p + 1]. Tags are stored the same way.
+    """
+    ARRAYS = (
+        "doc_ids", "versions", "lengths", "post_offsets", "post_docs", "post_tf",
+        "pos_offsets", "positions", "tag_offsets", "tag_docs",
+    )
+
+    def __init__(self, name: str, terms: List[str], tags: List[str], live: np.ndarray, **arrays: np.ndarray):
+        self.name = name
+        self.terms = terms
+        self.vocab = {term: index for index, term in enumerate(terms)}
+        self.tags = tags
+        self.tag_lookup = {tag: index for index, tag in enumerate(tags)}
+        self.live = live
+        for key in self.ARRAYS:
+            setattr(self, key, arrays[key])
+        # Tag of every (tag, document) entry, for counting facets with bincount
+        self.tag_ids = np.repeat(np.arange(len(tags), dtype=np.int32), np.diff(self.tag_offsets))
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def postings(self, term: str) -> Optional[slice]:
+        index = self.vocab.get(term)
+        if index is None:
+            return None
+        return slice(int(self.post_offsets[index]), int(self.post_offsets[index + 1]))
+
+    def locate(self, document_id: int) -> int:
+        """Local number of a document, or -1"""
+        position = int(np.searchsorted(self.doc_ids, document_id))
+        if position < len(self.doc_ids) and self.doc_ids[position] == document_id:
+            return position
+        return -1
+
+    def tag_mask(self, tag: str) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        index = self.tag_lookup.get(tag)
+        if index is not None:
+            mask[self.tag_docs[self.tag_offsets[index]:self.tag_offsets[index + 1]]] = True
+        return mask
+
+    def has_tag(self, docno: int, tag: str) -> bool:
+        index = self.tag_lookup.get(tag)
+        if index is None:
+            return False
+        docs = self.tag_docs[self.tag_offsets[index]:self.tag_offsets[index + 1]]
+        position = int(np.searchsorted(docs, docno))
+        return position < len(docs) and docs[position] == docno
+
+    def phrase_mask(self, phrase: List[str], candidates: np.ndarray) -> np.ndarray:
+        """Documents among `candidates` that contain the words of `phrase` at consecutive positions"""
+        result = np.zeros(len(self), dtype=bool)
+        slices = [self.postings(term) for term in phrase]
+        if any(postings is None for postings in slices):
+            return result
+        # Documents with every word, starting from the rarest one
+        by_length = sorted(slices, key=lambda postings: postings.stop - postings.start)
+        docs = self.post_docs[by_length[0]]
+        docs = docs[candidates[docs]]
+        for postings in by_length[1:]:
+            docs = _intersect_sorted(docs, self.post_docs[postings])
+        keys = None
+        for offset, postings in enumerate(slices):
+            selected = postings.start + np.searchsorted(self.post_docs[postings], docs)
+            starts = self.pos_offsets[selected]
+            counts = self.pos_offsets[selected + 1] - starts
+            gather = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            # Shift each word back to where the phrase would start; (document, start) must agree for all words
+            starts_at = self.positions[gather].astype(np.int64) - offset
+            owners = np.repeat(docs.astype(np.int64), counts)
+            valid = starts_at >= 0
+            found = (owners[valid] << 32) | starts_at[valid]
+            keys = found if keys is None else _intersect_sorted(keys, found)
+            if not len(keys):
+                return result
+        result[keys >> 32] = True
+        return result
+
+    def save(self, directory: str) -> None:
+        path = os.path.join(directory, f"{self.name}.npz")
+        if not os.path.exists(path):
+            with open(f"{path}.tmp", "wb") as file:
+                np.savez(
+                    file,
+                    terms=np.frombuffer("\n".join(self.terms).encode(), dtype=np.uint8),
+                    tags=np.frombuffer(json.dumps(self.tags).encode(), dtype=np.uint8),
+                    **{key: getattr(self, key) for key in self.ARRAYS}
+                )
+            os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, directory: str, name: str, live: np.ndarray) -> "Segment":
+        with np.load(os.path.join(directory, f"{name}.npz")) as data:
+            terms = data["terms"].tobytes().decode()
+            return cls(
+                name,
+                terms.split("\n") if terms else [],
+                json.loads(data["tags"].tobytes().decode()),
+                live,
+                **{key: data[key] for key in cls.ARRAYS}
+            )
+
+
+def _intersect_sorted(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Intersection of two sorted arrays of distinct values, without re-sorting"""
+    if len(first) > len(second):
+        first, second = second, first
+    if not len(first):
+        return first
+    if len(first) * 8 < len(second):
+        positions = np.minimum(np.searchsorted(second, first), len(second) - 1)
+        return first[second[positions] == first]
+    # Similar sizes: a stable sort of two sorted runs is a linear merge
+    merged = np.concatenate([first, second])
+    merged.sort(kind="stable")
+    return merged[:-1][merged[1:] == merged[:-1]]
+
+
+def build_segment(documents: Sequence[AnalyzedDocument]) -> Segment:
+    """Build a segment from analyzed documents with distinct ids"""
+    documents = sorted(documents, key=lambda document: document.id)
+    vocab: Dict[str, int] = {}
+    total = sum(len(document.terms) for document in documents)
+    term_ids = np.fromiter(
+        (vocab.setdefault(term, len(vocab)) for document in documents for term in document.terms),
+        dtype=np.int32,
+        count=total
+    )
+    counts = [len(document.terms) for document in documents]
+    tag_vocab: Dict[str, int] = {}
+    tag_ids = [tag_vocab.setdefault(tag, len(tag_vocab)) for document in documents for tag in document.tags]
+    return _assemble(
+        terms=list(vocab),
+        term_ids=term_ids,
+        docnos=np.repeat(np.arange(len(documents), dtype=np.int32), counts),
+        positions=np.fromiter(itertools.chain.from_iterable(d.positions for d in documents), dtype=np.int32, count=total),
+        weights=np.fromiter(itertools.chain.from_iterable(d.weights for d in documents), dtype=np.float32, count=total),
+        doc_ids=np.array([document.id for document in documents], dtype=np.int64),
+        versions=np.array([document.version for document in documents], dtype=np.int64),
+        lengths=np.array([document.length for document in documents], dtype=np.float32),
+        tags=list(tag_vocab),
+        tag_ids=np.array(tag_ids, dtype=np.int32),
+        tag_docs=np.repeat(np.arange(len(documents), dtype=np.int32), [len(document.tags) for document in documents]),
+    )
+
+
+def merge_segments(segments: Sequence[Segment], lives: Sequence[np.ndarray]) -> Segment:
+    """
+    Merge the live documents of `segments` into one segment. `lives` are
+    copies of their live flags, so this can run in a thread while writes
+    keep flipping the originals.
+    """
+    doc_ids = np.concatenate([segment.doc_ids[live] for segment, live in zip(segments, lives)])
+    order = np.argsort(doc_ids, kind="stable")
+    renumber = np.empty(len(order), dtype=np.int32)
+    renumber[order] = np.arange(len(order), dtype=np.int32)
+
+    vocab: Dict[str, int] = {}
+    tag_vocab: Dict[str, int] = {}
+    parts: Dict[str, List[np.ndarray]] = {key: [] for key in ("term_ids", "docnos", "positions", "weights", "tag_ids", "tag_docs")}
+    first = 0
+    for segment, live in zip(segments, lives):
+        docmap = np.full(len(segment), -1, dtype=np.int32)
+        docmap[live] = renumber[first:first + int(np.count_nonzero(live))]
+        first += int(np.count_nonzero(live))
+
+        term_map = np.array([vocab.setdefault(term, len(vocab)) for term in segment.terms], dtype=np.int32)
+        post_terms = np.repeat(np.arange(len(segment.terms), dtype=np.int32), np.diff(segment.post_offsets))
+        counts = np.diff(segment.pos_offsets)
+        owners = np.repeat(np.arange(len(segment.post_docs), dtype=np.int32), counts)
+        keep = live[segment.post_docs][owners]
+        owners = owners[keep]
+        parts["term_ids"].append(term_map[post_terms[owners]])
+        parts["docnos"].append(docmap[segment.post_docs[owners]])
+        parts["positions"].append(segment.positions[keep])
+        # Spread each posting's frequency over its positions so _assemble sums it back
+        parts["weights"].append((segment.post_tf / np.maximum(counts, 1))[owners].astype(np.float32))
+
+        tag_map = np.array([tag_vocab.setdefault(tag, len(tag_vocab)) for tag in segment.tags], dtype=np.int32)
+        keep_tags = live[segment.tag_docs]
+        parts["tag_ids"].append(tag_map[segment.tag_ids[keep_tags]])
+        parts["tag_docs"].append(docmap[segment.tag_docs[keep_tags]])
+
+    def join(key: str, dtype) -> np.ndarray:
+        return np.concatenate(parts[key]).astype(dtype, copy=False) if parts[key] else np.zeros(0, dtype=dtype)
+
+    return _assemble(
+        terms=list(vocab),
+        term_ids=join("term_ids", np.int32),
+        docnos=join("docnos", np.int32),
+        positions=join("positions", np.int32),
+        weights=join("weights", np.float32),
+        doc_ids=doc_ids[order],
+        versions=np.concatenate([s.versions[live] for s, live in zip(segments, lives)])[order],
+        lengths=np.concatenate([s.lengths[live] for s, live in zip(segments, lives)])[order],
+        tags=list(tag_vocab),
+        tag_ids=join("tag_ids", np.int32),
+        tag_docs=join("tag_docs", np.int32),
+    )
+
+
+def _assemble(terms: List[str], term_ids: np.ndarray, docnos: np.ndarray, positions: np.ndarray,
+              weights: np.ndarray, doc_ids: np.ndarray, versions: np.ndarray, lengths: np.ndarray,
+              tags: List[str], tag_ids: np.ndarray, tag_docs: np.ndarray) -> Segment:
+    """Build the CSR arrays of a segment from one entry per token position"""
+    # Drop terms no live document uses any more
+    used, term_ids = np.unique(term_ids, return_inverse=True)
+    terms = [terms[index] for index in used.tolist()]
+    order = np.lexsort((positions, docnos, term_ids))
+    term_ids, docnos, positions, weights = term_ids[order], docnos[order], positions[order], weights[order]
+
+    key = term_ids.astype(np.int64) * max(len(doc_ids), 1) + docnos
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if len(key) else np.zeros(0, dtype=np.int64)
+    post_terms = term_ids[starts]
+
+    used_tags, tag_ids = np.unique(tag_ids, return_inverse=True)
+    tags = [tags[index] for index in used_tags.tolist()]
+    tag_order = np.lexsort((tag_docs, tag_ids))
+    return Segment(
+        uuid.uuid4().hex,
+        terms,
+        tags,
+        np.ones(len(doc_ids), dtype=bool),
+        doc_ids=doc_ids,
+        versions=versions,
+        lengths=lengths,
+        post_offsets=np.searchsorted(post_terms, np.arange(len(terms) + 1)).astype(np.int64),
+        post_docs=docnos[starts].astype(np.int32),
+        post_tf=np.add.reduceat(weights, starts).astype(np.float32) if len(starts) else np.zeros(0, dtype=np.float32),
+        pos_offsets=np.append(starts, len(key)).astype(np.int64),
+        positions=positions.astype(np.int32),
+        tag_offsets=np.searchsorted(tag_ids[tag_order], np.arange(len(tags) + 1)).astype(np.int64),
+        tag_docs=tag_docs[tag_order].astype(np.int32),
+    )
+
+
+class InvertedIndex:
+    """
+    Log-structured inverted index. Added documents wait in `pending` until
+    the next search or snapshot moves them into a new segment; a replaced
+    or deleted document is only flagged dead in its old segment. Once
+    there are more than `max_segments`, the `merge_factor` smallest are
+    merged, which also drops dead documents. Merges of disjoint segments
+    may be in flight at the same time, so small segments keep being merged
+    while a large merge runs.
+
+    Not thread-safe: mutate and search from one thread. Only
+    `merge_segments`, snapshot writes and `search_segments` over a
+    `snapshot_state()` are meant to run elsewhere.
+    """
+
+    def __init__(self, max_segments: int = 16, merge_factor: int = 8, segments: Iterable[Segment] = ()):
+        self.max_segments = max_segments
+        self.merge_factor = merge_factor
+        self.segments: List[Segment] = list(segments)
+        self.pending: Dict[int, AnalyzedDocument] = {}
+        # Segment groups being merged
+        self.merging: List[List[Segment]] = []
+        # Live document count and summed lengths, for BM25's average length
+        self.documents = sum(int(np.count_nonzero(s.live)) for s in self.segments)
+        self.total_length = float(sum(float(s.lengths[s.live].sum()) for s in self.segments))
+
+    def version_of(self, document_id: int) -> Optional[int]:
+        if document_id in self.pending:
+            return self.pending[document_id].version
+        for segment in self.segments:
+            docno = segment.locate(document_id)
+            if docno >= 0 and segment.live[docno]:
+                return int(segment.versions[docno])
+        return None
+
+    def add(self, document: AnalyzedDocument) -> bool:
+        """Add or replace a document; returns False if a newer or equal version is indexed"""
+        current = self.version_of(document.id)
+        if current is not None and current >= document.version:
+            return False
+        self.delete(document.id)
+        self.pending[document.id] = document
+        self.documents += 1
+        self.total_length += document.length
+        return True
+
+    def delete(self, document_id: int) -> bool:
+        removed = self.pending.pop(document_id, None)
+        if removed is not None:
+            self.documents -= 1
+            self.total_length -= removed.length
+            return True
+        for segment in self.segments:
+            docno = segment.locate(document_id)
+            if docno >= 0 and segment.live[docno]:
+                segment.live[docno] = False
+                self.documents -= 1
+                self.total_length -= float(segment.lengths[docno])
+                return True
+        return False
+
+    def refresh(self) -> Optional[Segment]:
+        """Make pending documents searchable as a new segment"""
+        if not self.pending:
+            return None
+        segment = build_segment(list(self.pending.values()))
+        self.pending.clear()
+        self.segments.append(segment)
+        return segment
+
+    def live_versions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and versions of every live document"""
+        self.refresh()
+        ids = [segment.doc_ids[segment.live] for segment in self.segments]
+        versions = [segment.versions[segment.live] for segment in self.segments]
+        if not ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(ids), np.concatenate(versions)
+
+    def filter_tags(self, document_ids: List[int], tags: List[str]) -> List[int]:
+        """The live documents among `document_ids` that carry every tag"""
+        self.refresh()
+        matching = []
+        for document_id in document_ids:
+            for segment in self.segments:
+                docno = segment.locate(document_id)
+                if docno >= 0 and segment.live[docno]:
+                    if all(segment.has_tag(docno, tag) for tag in tags):
+                        matching.append(document_id)
+                    break
+        return matching
+
+    def merge_candidates(self) -> List[Segment]:
+        if len(self.segments) <= self.max_segments:
+            return []
+        busy = {id(segment) for group in self.merging for segment in group}
+        available = [segment for segment in self.segments if id(segment) not in busy]
+        if len(available) < 2:
+            return []
+        return sorted(available, key=len)[:self.merge_factor]
+
+    def begin_merge(self, segments: List[Segment]) -> List[np.ndarray]:
+        self.merging.append(segments)
+        return [segment.live.copy() for segment in segments]
+
+    def finish_merge(self, segments: List[Segment], lives: List[np.ndarray], merged: Segment) -> None:
+        """Swap merged in for its inputs, carrying over deletes made while it was built"""
+        for segment, live in zip(segments, lives):
+            gone = segment.doc_ids[live & ~segment.live]
+            if len(gone):
+                merged.live[np.searchsorted(merged.doc_ids, gone)] = False
+        inputs = {id(segment) for segment in segments}
+        self.segments = [segment for segment in self.segments if id(segment) not in inputs]
+        self.segments.append(merged)
+        self.cancel_merge(segments)
+
+    def cancel_merge(self, segments: Optional[List[Segment]] = None) -> None:
+        """Forget one in-flight merge, or all of them"""
+        self.merging = [group for group in self.merging if segments is not None and group is not segments]
+
+    def merge(self) -> bool:
+        """Run one merge in the calling thread if the policy asks for it"""
+        segments = self.merge_candidates()
+        if not segments:
+            return False
+        lives = self.begin_merge(segments)
+        self.finish_merge(segments, lives, merge_segments(segments, lives))
+        return True
+
+    def search(self,
+               terms: List[str],
+               phrases: List[List[str]],
+               tags: List[str],
+               k: int,
+               facet_limit: int = 0) -> Tuple[List[Tuple[int, float]], int, Dict[str, int]]:
+        """
+        BM25 search. Documents must contain every phrase and carry every tag
+        and match at least one term. Returns the top k (id, score) pairs, the
+        number of matching documents and tag counts over all of them.
+        """
+        self.refresh()
+        state = [(segment, segment.live) for segment in self.segments]
+        return search_segments(state, self.documents, self.total_length, terms, phrases, tags, k, facet_limit)
+
+    def snapshot_state(self) -> List[Tuple[Segment, np.ndarray]]:
+        """Segments and copies of their live flags, for write_snapshot in another thread"""
+        self.refresh()
+        return [(segment, segment.live.copy()) for segment in self.segments]
+
+
+def search_segments(state: List[Tuple[Segment, np.ndarray]],
+                    documents: int,
+                    total_length: float,
+                    terms: List[str],
+                    phrases: List[List[str]],
+                    tags: List[str],
+                    k: int,
+                    facet_limit: int = 0) -> Tuple[List[Tuple[int, float]], int, Dict[str, int]]:
+    """
+    `InvertedIndex.search` over a fixed view of the index: segments with
+    their live flags, and the live document count and summed lengths.
+    With a `snapshot_state()` view it can run in another thread.
+    """
+    if not terms or not documents:
+        return [], 0, {}
+    average_length = total_length / documents
+    slices = [[segment.postings(term) for term in terms] for segment, _ in state]
+    df = np.zeros(len(terms))
+    for (segment, live), segment_slices in zip(state, slices):
+        for position, postings in enumerate(segment_slices):
+            if postings is not None:
+                df[position] += np.count_nonzero(live[segment.post_docs[postings]])
+    idf = np.log(1 + (documents - df + 0.5) / (df + 0.5))
+
+    hits: List[Tuple[int, float]] = []
+    total = 0
+    facets: Counter = Counter()
+    for (segment, live), segment_slices in zip(state, slices):
+        if all(postings is None for postings in segment_slices):
+            continue
+        mask = live.copy()
+        for tag in tags:
+            mask &= segment.tag_mask(tag)
+        for phrase in phrases:
+            if not mask.any():
+                break
+            mask &= segment.phrase_mask(phrase, mask)
+        if not mask.any():
+            continue
+
+        scores = np.zeros(len(segment), dtype=np.float32)
+        for weight, postings in zip(idf, segment_slices):
+            if postings is None:
+                continue
+            docs = segment.post_docs[postings]
+            tf = segment.post_tf[postings]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.lengths[docs] / average_length)
+            scores[docs] += weight * tf * (BM25_K1 + 1) / (tf + norm)
+        matched = np.flatnonzero(mask & (scores > 0))
+        total += len(matched)
+        if not len(matched):
+            continue
+        if facet_limit and len(segment.tags):
+            selected = np.zeros(len(segment), dtype=bool)
+            selected[matched] = True
+            counts = np.bincount(segment.tag_ids[selected[segment.tag_docs]], minlength=len(segment.tags))
+            for index in np.flatnonzero(counts).tolist():
+                facets[segment.tags[index]] += int(counts[index])
+        if k:
+            top = matched
+            if len(matched) > k:
+                # Keep every document tied with the k-th score, then break ties by id
+                kth = np.partition(scores[matched], len(matched) - k)[len(matched) - k]
+                top = matched[scores[matched] >= kth]
+            top = top[np.lexsort((segment.doc_ids[top], -scores[top]))[:k]]
+            hits.extend(zip(segment.doc_ids[top].tolist(), scores[top].tolist()))
+    hits.sort(key=lambda hit: (-hit[1], hit[0]))
+    return hits[:k], total, dict(facets.most_common(facet_limit))
+
+
+def write_snapshot(directory: str, state: List[Tuple[Segment, np.ndarray]]) -> None:
+    """
+    Write new segment files and every segment's live flags, then switch
+    the manifest over and delete the files the previous manifest used.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous = read_manifest(directory)
+    for segment, live in state:
+        segment.save(directory)
+        live_path = os.path.join(directory, f"{segment.name}.live.npy")
+        with open(f"{live_path}.tmp", "wb") as file:
+            np.save(file, live)
+        os.replace(f"{live_path}.tmp", live_path)
+    names = [segment.name for segment, _ in state]
+    manifest_path = os.path.join(directory, MANIFEST)
+    with open(f"{manifest_path}.tmp", "w") as file:
+        json.dump({"segments": names}, file)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    for name in set(previous) - set(names):
+        for suffix in (".npz", ".live.npy"):
+            try:
+                os.remove(os.path.join(directory, f"{name}{suffix}"))
+            except FileNotFoundError:
+                pass
+
+
+def read_manifest(directory: str) -> List[str]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            return json.load(file)["segments"]
+    except FileNotFoundError:
+        return []
+
+
+def load_snapshot(directory: str) -> List[Segment]:
+    return [
+        Segment.load(directory, name, np.load(os.path.join(directory, f"{name}.live.npy")))
+        for name in read_manifest(directory)
+    ]
@@ -0,0 +1,217 @@
+from difflib import SequenceMatcher
+from typing import Iterable, List, Tuple, Union
+
+# A delta is a list of ops applied left to right over the base text:
+#   ["=", n]     copy the next n characters of the base
+#   ["-", n]     skip the next n characters of the base
+#   ["+", text]  insert text
+DeltaOp = List[Union[str, int]]
+
+
+def compute_delta(old: str, new: str, exact: bool = False) -> List[DeltaOp]:
+    """
+    Compute a line-granular delta turning `old` into `new`. With `exact`,
+    a replaced run of lines keeps the characters it shares at its start and
+    end, so the delta only covers what changed within the lines.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+
+    delta: List[DeltaOp] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            _append(delta, "=", sum(len(line) for line in old_lines[i1:i2]))
+            continue
+        if exact and tag == "replace":
+            _append_replace(delta, "".join(old_lines[i1:i2]), "".join(new_lines[j1:j2]))
+            continue
+        if i2 > i1:
+            _append(delta, "-", sum(len(line) for line in old_lines[i1:i2]))
+        if j2 > j1:
+            _append(delta, "+", "".join(new_lines[j1:j2]))
+    return delta
+
+
+def apply_delta(base: str, delta: List[DeltaOp]) -> str:
+    """Apply a delta produced by `compute_delta` to its base text"""
+    parts = []
+    position = 0
+    for op, arg in delta:
+        if op == "=":
+            parts.append(base[position:position + arg])
+            position += arg
+        elif op == "-":
+            position += arg
+        elif op == "+":
+            parts.append(arg)
+        else:
+            raise ValueError(f"Unknown delta op: {op}")
+    if position != len(base):
+        raise ValueError("Delta does not match its base text")
+    return "".join(parts)
+
+
+def patch_to_delta(length: int, ops: Iterable[Tuple[str, int, Union[str, int]]]) -> List[DeltaOp]:
+    """
+    Turn ranged edits against a text of `length` characters into a delta.
+    Each op is ("insert", position, text) or ("delete", position, count);
+    positions refer to the original text, and ops must be ordered by
+    position without overlapping deletes. An insert at the position of an
+    earlier delete replaces the deleted text.
+    """
+    delta: List[DeltaOp] = []
+    position = 0
+    deleted_from = None
+    for op, at, arg in ops:
+        if op == "insert" and at == deleted_from:
+            at = position
+        if at < position:
+            raise ValueError(f"Op at {at} overlaps or precedes the previous op; order ops by position")
+        if at > length:
+            raise ValueError(f"Position {at} is past the end of the text ({length} characters)")
+        if at > position:
+            _append(delta, "=", at - position)
+            position = at
+        if op == "insert":
+            if arg:
+                _append(delta, "+", arg)
+        elif op == "delete":
+            if arg < 0 or position + arg > length:
+                raise ValueError(f"Delete of {arg} characters at {at} runs past the end of the text")
+            if arg:
+                _append(delta, "-", arg)
+                deleted_from = at
+                position += arg
+        else:
+            raise ValueError(f"Unknown patch op: {op}")
+    if length > position:
+        _append(delta, "=", length - position)
+    return delta
+
+
+def delta_to_patch(delta: List[DeltaOp]) -> List[Tuple[str, int, Union[str, int]]]:
+    """The ranged edits of a delta, in the form `patch_to_delta` takes"""
+    ops = []
+    position = 0
+    for op, arg in delta:
+        if op == "=":
+            position += arg
+        elif op == "-":
+            ops.append(("delete", position, arg))
+            position += arg
+        elif op == "+":
+            ops.append(("insert", position, arg))
+        else:
+            raise ValueError(f"Unknown delta op: {op}")
+    return ops
+
+
+def transform_delta(a: List[DeltaOp], b: List[DeltaOp]) -> Tuple[List[DeltaOp], List[DeltaOp]]:
+    """
+    Transform two deltas made concurrently against the same base text into
+    (a', b') such that applying a then b' gives the same text as b then a'.
+    Where both insert at the same position, a's text comes first.
+    """
+    a_prime: List[DeltaOp] = []
+    b_prime: List[DeltaOp] = []
+    a_ops, b_ops = iter(a), iter(b)
+    op_a, op_b = next(a_ops, None), next(b_ops, None)
+    while op_a is not None or op_b is not None:
+        if op_a is not None and op_a[0] == "+":
+            _append(a_prime, "+", op_a[1])
+            _append(b_prime, "=", len(op_a[1]))
+            op_a = next(a_ops, None)
+            continue
+        if op_b is not None and op_b[0] == "+":
+            _append(a_prime, "=", len(op_b[1]))
+            _append(b_prime, "+", op_b[1])
+            op_b = next(b_ops, None)
+            continue
+        if op_a is None or op_b is None:
+            raise ValueError("Deltas do not share a base text")
+        (kind_a, length_a), (kind_b, length_b) = op_a, op_b
+        length = min(length_a, length_b)
+        if kind_a == "=" and kind_b == "=":
+            _append(a_prime, "=", length)
+            _append(b_prime, "=", length)
+        elif kind_a == "-" and kind_b == "=":
+            _append(a_prime, "-", length)
+        elif kind_a == "=" and kind_b == "-":
+            _append(b_prime, "-", length)
+        # Text deleted by both is already gone on either side
+        op_a = [kind_a, length_a - length] if length_a > length else next(a_ops, None)
+        op_b = [kind_b, length_b - length] if length_b > length else next(b_ops, None)
+    return a_prime, b_prime
+
+
+def compose_delta(a: List[DeltaOp], b: List[DeltaOp]) -> List[DeltaOp]:
+    """Combine delta a and delta b, made against a's result, into one delta"""
+    composed: List[DeltaOp] = []
+    a_ops, b_ops = iter(a), iter(b)
+    op_a, op_b = next(a_ops, None), next(b_ops, None)
+    while op_a is not None or op_b is not None:
+        if op_a is not None and op_a[0] == "-":
+            _append(composed, "-", op_a[1])
+            op_a = next(a_ops, None)
+            continue
+        if op_b is not None and op_b[0] == "+":
+            _append(composed, "+", op_b[1])
+            op_b = next(b_ops, None)
+            continue
+        if op_a is None or op_b is None:
+            raise ValueError("The second delta does not apply to the result of the first")
+        (kind_a, arg_a), (kind_b, length_b) = op_a, op_b
+        length_a = arg_a if kind_a == "=" else len(arg_a)
+        length = min(length_a, length_b)
+        if kind_a == "=":
+            _append(composed, kind_b, length)
+            rest_a = ["=", length_a - length]
+        else:
+            # Inserted text that b keeps stays inserted; deleted by b, it never existed
+            if kind_b == "=":
+                _append(composed, "+", arg_a[:length])
+            rest_a = ["+", arg_a[length:]]
+        op_a = rest_a if length_a > length else next(a_ops, None)
+        op_b = [kind_b, length_b - length] if length_b > length else next(b_ops, None)
+    return composed
+
+
+def delta_length(delta: List[DeltaOp]) -> Tuple[int, int]:
+    """Lengths of the text a delta applies to and of the text it produces"""
+    base = target = 0
+    for op, arg in delta:
+        if op == "=":
+            base += arg
+            target += arg
+        elif op == "-":
+            base += arg
+        else:
+            target += len(arg)
+    return base, target
+
+
+def _append_replace(delta: List[DeltaOp], old: str, new: str) -> None:
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    if prefix:
+        _append(delta, "=", prefix)
+    if len(old) - prefix - suffix:
+        _append(delta, "-", len(old) - prefix - suffix)
+    if len(new) - prefix - suffix:
+        _append(delta, "+", new[prefix:len(new) - suffix])
+    if suffix:
+        _append(delta, "=", suffix)
+
+
+def _append(delta: List[DeltaOp], op: str, arg: Union[str, int]) -> None:
+    # Merge with the previous op of the same kind to keep deltas small
+    if delta and delta[-1][0] == op:
+        delta[-1][1] += arg
+    else:
+        delta.append([op, arg])
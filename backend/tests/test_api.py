@@ -1,13 +1,18 @@
 import requests
 import unittest
 import json
+import time
+import uuid
 from datetime import datetime
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
 
 class TestDocSyncAPI(unittest.TestCase):
     def setUp(self):
         self.base_url = "http://localhost:8000"
+        # Document ids are unique, so every test works on a fresh one
         self.test_doc = {
-            "id": 1,
+            "id": uuid.uuid4().int % 10**9,
             "title": "Test Document",
             "content": "This is a test document",
             "version": 1,
@@ -33,6 +38,12 @@ class TestDocSyncAPI(unittest.TestCase):
         self.assertEqual(data["title"], self.test_doc["title"])
         self.assertEqual(data["content"], self.test_doc["content"])
 
+    def test_create_document_id_range(self):
+        """Test that ids outside the embedding index's id space are rejected"""
+        for document_id in (-1, 1 << 47):
+            response = requests.post(f"{self.base_url}/v1/documents/", json={**self.test_doc, "id": document_id})
+            self.assertEqual(response.status_code, 422)
+
     def test_get_document(self):
         """Test getting a single document"""
         # First create a document
@@ -51,6 +62,49 @@ class TestDocSyncAPI(unittest.TestCase):
         data = get_response.json()
         self.assertEqual(data["title"], self.test_doc["title"])
 
+    def test_conditional_get_document(self):
+        """Test ETag validation with If-None-Match"""
+        requests.post(f"{self.base_url}/v1/documents/", json=self.test_doc)
+        doc_url = f"{self.base_url}/v1/documents/{self.test_doc['id']}"
+
+        response = requests.get(doc_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+        self.assertEqual(etag, f'"{self.test_doc["id"]}-{self.test_doc["version"]}"')
+        self.assertIn("Last-Modified", response.headers)
+
+        response = requests.get(doc_url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        response = requests.get(doc_url, headers={"If-None-Match": '"stale-0"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_document_id_forms(self):
+        """Test that ids are parsed as integers before any cache lookup"""
+        requests.post(f"{self.base_url}/v1/documents/", json=self.test_doc)
+
+        response = requests.get(f"{self.base_url}/v1/documents/0{self.test_doc['id']}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], self.test_doc["id"])
+
+        response = requests.get(f"{self.base_url}/v1/documents/version:{self.test_doc['id']}")
+        self.assertEqual(response.status_code, 422)
+
+    def test_conditional_list_documents(self):
+        """Test the weak ETag on the list endpoint"""
+        requests.post(f"{self.base_url}/v1/documents/", json=self.test_doc)
+        response = requests.get(f"{self.base_url}/v1/documents/?limit=5")
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+        self.assertTrue(etag.startswith("W/"))
+
+        response = requests.get(
+            f"{self.base_url}/v1/documents/?limit=5",
+            headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
     def test_list_documents(self):
         """Test listing all documents"""
         # Create a test document first
@@ -72,6 +126,53 @@ class TestDocSyncAPI(unittest.TestCase):
         self.assertGreater(len(data["items"]), 0)
         self.assertGreater(data["total"], 0)
 
+    def test_duplicate_document_id(self):
+        """Test that a second document with the same id is rejected"""
+        response = requests.post(f"{self.base_url}/v1/documents/", json=self.test_doc)
+        self.assertEqual(response.status_code, 201)
+        response = requests.post(f"{self.base_url}/v1/documents/", json=self.test_doc)
+        self.assertEqual(response.status_code, 409)
+
+    def test_bulk_create_documents(self):
+        """Test batch creation with per-item results"""
+        base_id = self.test_doc["id"]
+        docs = [
+            {**self.test_doc, "id": base_id + i, "title": f"Bulk Document {i}"}
+            for i in range(3)
+        ]
+        response = requests.post(f"{self.base_url}/v1/documents/bulk", json=docs)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data["created"], 3)
+        self.assertEqual(data["failed"], 0)
+
+        # A duplicate and an invalid item fail without affecting the rest
+        docs = [
+            {**self.test_doc, "id": base_id},
+            {"title": "Invalid Doc"},
+            {**self.test_doc, "id": base_id + 3},
+        ]
+        response = requests.post(f"{self.base_url}/v1/documents/bulk", json=docs)
+        self.assertEqual(response.status_code, 207)
+        data = response.json()
+        self.assertEqual(data["created"], 1)
+        self.assertEqual([item["status"] for item in data["results"]], [409, 422, 201])
+
+    def test_batch_get_documents(self):
+        """Test fetching several documents in one request"""
+        base_id = self.test_doc["id"]
+        docs = [{**self.test_doc, "id": base_id + i} for i in range(2)]
+        requests.post(f"{self.base_url}/v1/documents/bulk", json=docs)
+
+        missing_id = base_id + 10**9
+        response = requests.get(
+            f"{self.base_url}/v1/documents/batch?ids={base_id},{base_id + 1}&ids={missing_id}"
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item["id"] for item in data["items"]], [base_id, base_id + 1])
+        self.assertEqual(data["missing"], [str(missing_id)])
+
     def test_document_not_found(self):
         """Test getting a non-existent document"""
         response = requests.get(
@@ -115,6 +216,38 @@ class TestDocSyncAPI(unittest.TestCase):
         data = response.json()
         self.assertEqual(len(data["items"]), 5)
 
+    def test_list_documents_cursor_pagination(self):
+        """Test keyset pagination with opaque cursors"""
+        docs = [
+            {**self.test_doc, "id": i, "title": f"Test Document {i}"}
+            for i in range(1, 15)
+        ]
+        for doc in docs:
+            requests.post(f"{self.base_url}/v1/documents/", json=doc)
+
+        # First page hands out a cursor for the next one
+        response = requests.get(f"{self.base_url}/v1/documents/?limit=5&count=none")
+        self.assertEqual(response.status_code, 200)
+        first_page = response.json()
+        self.assertEqual(len(first_page["items"]), 5)
+        self.assertIsNone(first_page["total"])
+        self.assertIsNotNone(first_page["next_cursor"])
+
+        # Second page continues strictly after the last id of the first
+        response = requests.get(
+            f"{self.base_url}/v1/documents/?limit=5&after={first_page['next_cursor']}"
+        )
+        self.assertEqual(response.status_code, 200)
+        second_page = response.json()
+        self.assertEqual(len(second_page["items"]), 5)
+        self.assertGreater(
+            second_page["items"][0]["id"], first_page["items"][-1]["id"]
+        )
+
+        # Malformed cursors are rejected
+        response = requests.get(f"{self.base_url}/v1/documents/?after=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
     def test_document_history(self):
         """Test document history retrieval"""
         # Create a document
@@ -141,6 +274,333 @@ class TestDocSyncAPI(unittest.TestCase):
         self.assertEqual(entry["version"], self.test_doc["version"])
         self.assertIn("timestamp", entry)
 
+    def test_document_version(self):
+        """Test reconstructing a recorded document version"""
+        create_response = requests.post(
+            f"{self.base_url}/v1/documents/",
+            json=self.test_doc
+        )
+        self.assertEqual(create_response.status_code, 201)
+        doc_id = self.test_doc["id"]
+        version = self.test_doc["version"]
+
+        response = requests.get(f"{self.base_url}/v1/documents/{doc_id}/versions/{version}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content"], self.test_doc["content"])
+
+        response = requests.get(f"{self.base_url}/v1/documents/{doc_id}/versions/{version + 1}")
+        self.assertEqual(response.status_code, 404)
+
+    def test_index_diagnostics(self):
+        """Test the index diagnostic report"""
+        response = requests.get(f"{self.base_url}/v1/diagnostics/indexes")
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertIn("healthy", report)
+        self.assertEqual(report["missing_indexes"], [])
+        names = {index["name"] for index in report["indexes"]}
+        self.assertIn("id_unique", names)
+        self.assertIn("document_id_timestamp_desc", names)
+
+    def test_cache_stats(self):
+        """Test per-tier cache counters"""
+        requests.post(f"{self.base_url}/v1/documents/", json=self.test_doc)
+        requests.get(f"{self.base_url}/v1/documents/{self.test_doc['id']}")
+
+        response = requests.get(f"{self.base_url}/v1/diagnostics/cache")
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+        for tier in ("local", "redis"):
+            self.assertIn(tier, stats)
+            self.assertIn("hits", stats[tier])
+            self.assertIn("misses", stats[tier])
+        self.assertIn("evictions", stats["local"])
+        self.assertIn("evictions", stats["redis"])
+        self.assertGreater(stats["local"]["hits"], 0)
+
+    def test_search_documents(self):
+        """Test that a created document becomes searchable by embedding similarity"""
+        marker = uuid.uuid4().hex
+        doc = {**self.test_doc, "content": f"Quarterly zeppelin maintenance schedule {marker}"}
+        requests.post(f"{self.base_url}/v1/documents/", json=doc)
+
+        # Documents are indexed in the background
+        deadline = time.monotonic() + 10
+        while True:
+            response = requests.get(
+                f"{self.base_url}/v1/documents/search",
+                params={"q": f"zeppelin {marker}", "k": 5, "mode": "vector"}
+            )
+            if response.status_code == 503:
+                self.skipTest("Search is not configured")
+            self.assertEqual(response.status_code, 200)
+            ids = [hit["document"]["id"] for hit in response.json()["items"]]
+            if doc["id"] in ids or time.monotonic() > deadline:
+                break
+            time.sleep(0.2)
+        self.assertEqual(ids[0], doc["id"])
+
+    def test_keyword_search(self):
+        """Test BM25 keyword search with phrases, tag filters and facets"""
+        marker = uuid.uuid4().hex
+        first = {**self.test_doc, "content": f"{marker} red kite over the hill", "tags": ["birds", marker]}
+        second = {
+            **self.test_doc,
+            "id": self.test_doc["id"] + 1,
+            "content": f"{marker} the hill over a red kite",
+            "tags": ["kites", marker]
+        }
+        for doc in (first, second):
+            requests.post(f"{self.base_url}/v1/documents/", json=doc)
+
+        url = f"{self.base_url}/v1/documents/search"
+        response = requests.get(url, params={"q": f"{marker} kite", "mode": "keyword"})
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result["total"], 2)
+        self.assertEqual({hit["document"]["id"] for hit in result["items"]}, {first["id"], second["id"]})
+        self.assertEqual(result["facets"][marker], 2)
+        self.assertEqual(result["facets"]["birds"], 1)
+
+        response = requests.get(url, params={"q": f'{marker} "red kite over"', "mode": "keyword"})
+        self.assertEqual([hit["document"]["id"] for hit in response.json()["items"]], [first["id"]])
+
+        response = requests.get(url, params={"q": f"{marker} kite", "mode": "keyword", "tag": [marker, "kites"]})
+        self.assertEqual([hit["document"]["id"] for hit in response.json()["items"]], [second["id"]])
+
+        # Hybrid search returns keyword matches whether or not vectors are configured
+        response = requests.get(url, params={"q": f'"{marker}"', "tag": "birds"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([hit["document"]["id"] for hit in response.json()["items"]], [first["id"]])
+
+        response = requests.get(url, params={"q": ""})
+        self.assertEqual(response.status_code, 422)
+
+    def test_patch_document(self):
+        """Test ranged edits, version history and tag changes through PATCH"""
+        doc = {**self.test_doc, "content": "hello world", "tags": ["draft"]}
+        requests.post(f"{self.base_url}/v1/documents/", json=doc)
+        url = f"{self.base_url}/v1/documents/{doc['id']}"
+
+        response = requests.patch(url, json={"version": 1, "ops": [
+            {"op": "delete", "pos": 0, "length": 5},
+            {"op": "insert", "pos": 0, "text": "goodbye"},
+            {"op": "insert", "pos": 11, "text": "!"}
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content"], "goodbye world!")
+        self.assertEqual(response.json()["version"], 2)
+        self.assertIn("ETag", response.headers)
+        self.assertEqual(requests.get(url).json()["content"], "goodbye world!")
+
+        response = requests.patch(url, json={"version": 2, "title": "Renamed", "tags": ["final"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["title"], response.json()["tags"]), ("Renamed", ["final"]))
+        self.assertEqual(response.json()["content"], "goodbye world!")
+
+        for version, content in ((1, "hello world"), (2, "goodbye world!"), (3, "goodbye world!")):
+            response = requests.get(f"{url}/versions/{version}")
+            self.assertEqual(response.json()["content"], content)
+        kinds = {entry["version"]: entry["kind"] for entry in requests.get(f"{url}/history").json()}
+        self.assertEqual(kinds, {1: "snapshot", 2: "delta", 3: "delta"})
+
+    def test_patch_document_conflicts(self):
+        """Test stale versions, invalid ops and missing documents"""
+        requests.post(f"{self.base_url}/v1/documents/", json=self.test_doc)
+        url = f"{self.base_url}/v1/documents/{self.test_doc['id']}"
+        insert = {"op": "insert", "pos": 0, "text": "x"}
+        self.assertEqual(requests.patch(url, json={"version": 1, "ops": [insert]}).status_code, 200)
+
+        # A second edit against version 1 lost the race
+        response = requests.patch(url, json={"version": 1, "ops": [insert]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["detail"]["current_version"], 2)
+
+        response = requests.patch(url, json={"version": 2, "ops": [{"op": "delete", "pos": 20, "length": 50}]})
+        self.assertEqual(response.status_code, 422)
+        response = requests.patch(url, json={"version": 2, "ops": [{"op": "move", "pos": 0}]})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(requests.get(url).json()["version"], 2)
+
+        missing = f"{self.base_url}/v1/documents/{self.test_doc['id'] + 10**9}"
+        self.assertEqual(requests.patch(missing, json={"version": 1, "ops": []}).status_code, 404)
+
+    def _read_until_acked(self, editor, client_id, seq):
+        """Read "ops" batches from an editing session until one acknowledges seq"""
+        entries = []
+        while True:
+            frame = json.loads(editor.recv(timeout=10))
+            self.assertEqual(frame["type"], "ops")
+            entries.extend(frame["ops"])
+            if any(entry["client"] == client_id and entry["seq"] == seq for entry in frame["ops"]):
+                return entries
+
+    def _wait_for_version(self, url, version):
+        for _ in range(50):
+            document = requests.get(url).json()
+            if document["version"] >= version:
+                return document
+            time.sleep(0.1)
+        self.fail(f"Document did not reach version {version}")
+
+    def test_collaborative_editing(self):
+        """Test concurrent edits over WebSocket converge and are persisted when the session ends"""
+        requests.post(f"{self.base_url}/v1/documents/", json=self.test_doc)
+        url = f"{self.base_url}/v1/documents/{self.test_doc['id']}"
+        ws_url = f"ws://localhost:8000/v1/documents/{self.test_doc['id']}/ws"
+        with connect(ws_url) as first, connect(ws_url) as second:
+            first_init, second_init = json.loads(first.recv(timeout=10)), json.loads(second.recv(timeout=10))
+            self.assertEqual(first_init["type"], "init")
+            self.assertEqual(first_init["content"], self.test_doc["content"])
+            revision = first_init["revision"]
+            self.assertEqual(second_init["revision"], revision)
+
+            # Both edit the same revision; the server transforms the second
+            end = len(self.test_doc["content"])
+            first.send(json.dumps({"type": "op", "revision": revision, "seq": 1,
+                                   "ops": [{"op": "insert", "pos": 0, "text": "Dear "}]}))
+            second.send(json.dumps({"type": "op", "revision": revision, "seq": 1,
+                                    "ops": [{"op": "insert", "pos": end, "text": "!"}]}))
+            first_seen = self._read_until_acked(first, first_init["client"], 1)
+            second_seen = self._read_until_acked(second, second_init["client"], 1)
+            while len(first_seen) < 2:
+                first_seen.extend(json.loads(first.recv(timeout=10))["ops"])
+            while len(second_seen) < 2:
+                second_seen.extend(json.loads(second.recv(timeout=10))["ops"])
+            self.assertEqual(first_seen, second_seen)
+
+            # Ops against a revision that does not exist come back as errors
+            first.send(json.dumps({"type": "op", "revision": revision + 10, "seq": 2, "ops": []}))
+            error = json.loads(first.recv(timeout=10))
+            self.assertEqual((error["type"], error["seq"]), ("error", 2))
+            first.send(json.dumps({"type": "op", "revision": revision + 2, "seq": 3,
+                                   "ops": [{"op": "delete", "pos": 0, "length": 1000}]}))
+            error = json.loads(first.recv(timeout=10))
+            self.assertEqual((error["type"], error["seq"]), ("error", 3))
+
+        document = self._wait_for_version(url, 2)
+        self.assertEqual(document["content"], "Dear " + self.test_doc["content"] + "!")
+        history = requests.get(f"{url}/history").json()
+        self.assertEqual(history[0]["version"], 2)
+
+    def test_collaborative_editing_with_patch(self):
+        """Test a PATCH made during an editing session is merged into it, and missing documents"""
+        requests.post(f"{self.base_url}/v1/documents/", json=self.test_doc)
+        url = f"{self.base_url}/v1/documents/{self.test_doc['id']}"
+        with connect(f"ws://localhost:8000/v1/documents/{self.test_doc['id']}/ws") as editor:
+            init = json.loads(editor.recv(timeout=10))
+            response = requests.patch(url, json={"version": 1, "ops": [{"op": "insert", "pos": 0, "text": "Draft: "}]})
+            self.assertEqual(response.status_code, 200)
+            editor.send(json.dumps({"type": "op", "revision": init["revision"], "seq": 1,
+                                    "ops": [{"op": "insert", "pos": len(init["content"]), "text": "."}]}))
+            self._read_until_acked(editor, init["client"], 1)
+
+        document = self._wait_for_version(url, 3)
+        self.assertEqual(document["content"], "Draft: " + self.test_doc["content"] + ".")
+
+        missing = f"ws://localhost:8000/v1/documents/{self.test_doc['id'] + 10**9}/ws"
+        with connect(missing) as editor:
+            with self.assertRaises(ConnectionClosed) as closed:
+                editor.recv(timeout=10)
+        self.assertEqual(closed.exception.rcvd.code, 4404)
+
+    def test_list_documents_by_tag(self):
+        """Test tag-filtered listing with all/any matching and the tag total"""
+        red, blue = f"red-{uuid.uuid4().hex}", f"blue-{uuid.uuid4().hex}"
+        tag_sets = [[red], [red, blue], [blue], [red, blue, red]]
+        ids = [self.test_doc["id"] + offset for offset in range(len(tag_sets))]
+        for document_id, tags in zip(ids, tag_sets):
+            requests.post(f"{self.base_url}/v1/documents/", json={**self.test_doc, "id": document_id, "tags": tags})
+
+        url = f"{self.base_url}/v1/documents/"
+        response = requests.get(url, params={"tag": red})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([doc["id"] for doc in data["items"]], [ids[0], ids[1], ids[3]])
+        self.assertEqual(data["total"], 3)
+
+        response = requests.get(url, params={"tag": [red, blue]})
+        self.assertEqual([doc["id"] for doc in response.json()["items"]], [ids[1], ids[3]])
+        self.assertIsNone(response.json()["total"])
+
+        response = requests.get(url, params={"tag": [red, blue], "match": "any", "count": "exact"})
+        self.assertEqual([doc["id"] for doc in response.json()["items"]], ids)
+        self.assertEqual(response.json()["total"], 4)
+
+        # Cursor pages stay within the filter
+        first = requests.get(url, params={"tag": blue, "limit": 1}).json()
+        second = requests.get(url, params={"tag": blue, "limit": 2, "after": first["next_cursor"]}).json()
+        self.assertEqual([doc["id"] for doc in first["items"] + second["items"]], ids[1:])
+
+        response = requests.get(url, params={"tag": red, "match": "some"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_list_tags(self):
+        """Test per-tag document counts"""
+        tag = f"counted-{uuid.uuid4().hex}"
+        for offset in range(3):
+            requests.post(
+                f"{self.base_url}/v1/documents/",
+                json={**self.test_doc, "id": self.test_doc["id"] + offset, "tags": [tag, tag]}
+            )
+        requests.post(f"{self.base_url}/v1/documents/bulk", json=[
+            {**self.test_doc, "id": self.test_doc["id"] + 3, "tags": [tag]},
+            {**self.test_doc, "id": self.test_doc["id"] + 4, "tags": ["other"]},
+        ])
+
+        response = requests.get(f"{self.base_url}/v1/tags", params={"limit": 1000})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        counts = {item["tag"]: item["count"] for item in data["items"]}
+        self.assertEqual(counts[tag], 4)
+        self.assertEqual(data["total"], len(counts))
+        self.assertEqual([item["count"] for item in data["items"]],
+                         sorted((item["count"] for item in data["items"]), reverse=True))
+
+        response = requests.get(f"{self.base_url}/v1/tags", params={"limit": 0})
+        self.assertEqual(response.status_code, 422)
+
+    def test_search_stats(self):
+        """Test search index counters"""
+        response = requests.get(f"{self.base_url}/v1/diagnostics/search")
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+        for key in ("documents", "segments", "queries", "avg_query_ms"):
+            self.assertIn(key, stats)
+
+    def test_embedding_stats(self):
+        """Test embedding pipeline queue, lag and throughput counters"""
+        response = requests.get(f"{self.base_url}/v1/diagnostics/embeddings")
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+        for key in ("enabled", "queue_depth", "lag_ms", "chunks_per_second", "chunks_skipped"):
+            self.assertIn(key, stats)
+
+    def test_large_document_round_trip(self):
+        """Test that large bodies read back intact from cache and history"""
+        content = "".join(f"## Section {i}\n\nSome notes for section {i}.\n\n" for i in range(2000))
+        large_doc = {**self.test_doc, "content": content}
+        response = requests.post(f"{self.base_url}/v1/documents/", json=large_doc)
+        self.assertEqual(response.status_code, 201)
+
+        for _ in range(2):
+            response = requests.get(f"{self.base_url}/v1/documents/{large_doc['id']}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["content"], content)
+
+        response = requests.get(f"{self.base_url}/v1/documents/{large_doc['id']}/history")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["content"], content)
+
+        response = requests.get(
+            f"{self.base_url}/v1/documents/{large_doc['id']}/versions/{large_doc['version']}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content"], content)
+
+        stats = requests.get(f"{self.base_url}/v1/diagnostics/cache").json()
+        self.assertGreater(stats["compression"]["compressed"], 0)
+
     def test_invalid_pagination_params(self):
         """Test invalid pagination parameters"""
         # Test negative skip
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+try:
+    import faiss
+    import numpy as np
+    from metadata_index import id_selector, validate_filter
+    from metadata_store import MetadataStore
+except ImportError:
+    faiss = None
+
+
+@unittest.skipIf(faiss is None, "faiss-cpu is not installed")
+class TestMetadataStore(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="faiss-test-"), "test.metadata.db")
+        self.store = MetadataStore(self.path)
+        self.store.put_many([1, 2, 3, 4], [
+            {"owner": "ann", "tags": ["a", "b"], "year": 2024},
+            {"owner": "bob", "tags": ["b"], "year": "2024"},
+            {"owner": "ann", "tags": ["c"], "nested": {"x": 1}},
+            None,
+        ])
+
+    def tearDown(self):
+        self.store.destroy()
+
+    def test_bulk_get_and_filters(self):
+        self.assertEqual(sorted(self.store.get_many([1, 3, 4, 99])), [1, 3])
+        self.assertEqual(self.store.get_many([3])[3]["nested"], {"x": 1})
+        self.assertEqual(self.store.match({"owner": "ann"}).tolist(), [1, 3])
+        self.assertEqual(self.store.match({"tags": "b"}).tolist(), [1, 2])
+        self.assertEqual(self.store.match({"owner": ["ann", "bob"], "tags": "b"}).tolist(), [1, 2])
+        # Values keep their JSON type
+        self.assertEqual(self.store.match({"year": 2024}).tolist(), [1])
+        self.assertEqual(self.store.match({"owner": "ann", "missing": 1}).tolist(), [])
+        for bad in ({}, {"nested": {"x": 1}}, {"tags": []}):
+            with self.assertRaises(ValueError):
+                validate_filter(bad)
+
+    def test_updates_replace_terms_and_persist(self):
+        self.assertEqual(self.store.match({"owner": "ann"}).tolist(), [1, 3])
+        self.store.put_many([1], [{"owner": "cy"}])
+        # The cached posting list for "ann" is dropped by the update
+        self.assertEqual(self.store.match({"owner": "ann"}).tolist(), [3])
+        self.assertEqual(self.store.match({"tags": "a"}).tolist(), [])
+        self.store.checkpoint()
+        self.store.close()
+
+        self.store = MetadataStore(self.path)
+        self.assertEqual(self.store.count(), 3)
+        self.assertEqual(self.store.match({"owner": "cy"}).tolist(), [1])
+
+    def test_selector_restricts_search(self):
+        vectors = np.random.default_rng(0).random((500, 8), dtype=np.float32)
+        index = faiss.IndexIDMap(faiss.IndexFlatL2(8))
+        index.add_with_ids(vectors, np.arange(500, dtype=np.int64) * 10)
+        for ids in (np.arange(0, 5000, 20), np.array([40, 4990])):
+            selector = id_selector(ids)
+            _, found = index.search(vectors[:3], 5, params=faiss.SearchParameters(sel=selector))
+            self.assertTrue(set(found[found >= 0].tolist()) <= set(ids.tolist()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+INDEX_DIR = tempfile.mkdtemp(prefix="faiss-test-")
+os.environ["FAISS_INDEX_DIR"] = INDEX_DIR
+# Compactions are started by the tests
+os.environ["FAISS_COMPACT_TOMBSTONE_RATIO"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+try:
+    import faiss
+    import numpy as np
+    import faiss_service as service
+except ImportError:
+    faiss = None
+
+DIMENSION = 8
+
+
+def tearDownModule():
+    shutil.rmtree(INDEX_DIR, ignore_errors=True)
+
+
+@unittest.skipIf(faiss is None, "faiss-cpu is not installed")
+class TestVectorMutations(unittest.TestCase):
+    """Deletes and upserts, with remove_ids (Flat) and tombstones (HNSWFlat)"""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.vectors = np.random.default_rng(0).random((500, DIMENSION), dtype=np.float32)
+
+    def tearDown(self):
+        for name in list(service.index_metadata):
+            self.wait(service.delete_index(name))
+        self.loop.close()
+
+    def wait(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def create(self, index_type: str) -> str:
+        name = f"mutations_{index_type.lower()}"
+        self.wait(service.create_index(name, DIMENSION, index_type=index_type))
+        self.wait(service.add_vectors(name, service.VectorData(
+            vectors=self.vectors.tolist(), metadata=[{"half": i % 2} for i in range(len(self.vectors))]
+        )))
+        return name
+
+    def nearest(self, name: str, vector, **options):
+        query = service.SearchQuery(index_name=name, query_vector=list(map(float, vector)), k=3, **options)
+        return self.wait(service.search(query))["results"]
+
+    def check_mutations(self, index_type: str):
+        name = self.create(index_type)
+        deleted = self.wait(service.delete_vectors(name, service.VectorIds(ids=[0, 1, 2, 1000])))
+        self.assertEqual(deleted["deleted"], 3)
+        self.assertNotIn(0, [hit["id"] for hit in self.nearest(name, self.vectors[0])])
+
+        moved = self.vectors[10] + 10
+        upserted = self.wait(service.upsert_vectors(name, service.VectorData(
+            vectors=[moved.tolist()], ids=[10], metadata=[{"half": "moved"}]
+        )))
+        self.assertEqual(upserted["replaced"], 1)
+        self.assertNotIn(10, [hit["id"] for hit in self.nearest(name, self.vectors[10])])
+        hit = self.nearest(name, moved)[0]
+        self.assertEqual((hit["id"], hit["metadata"]), (10, {"half": "moved"}))
+        self.assertEqual([hit["id"] for hit in self.nearest(name, self.vectors[0], filter={"half": "moved"})], [10])
+        self.assertEqual(service.index_metadata[name]["count"], 497)
+
+        # Snapshot, then replay a later delete from the WAL on reload
+        self.wait(service.snapshot_index(name))
+        self.wait(service.delete_vectors(name, service.VectorIds(ids=[20])))
+        service.unload_index(name)
+        self.assertEqual(self.nearest(name, moved)[0]["id"], 10)
+        self.assertNotIn(20, [hit["id"] for hit in self.nearest(name, self.vectors[20])])
+        self.assertEqual(service.index_metadata[name]["count"], 496)
+        return name
+
+    def test_flat_removes_vectors(self):
+        name = self.check_mutations("Flat")
+        self.assertEqual(service.indexes[name].ntotal, 496)
+        self.assertEqual(len(service.tombstones.get(name, [])), 0)
+
+    def test_hnsw_tombstones_and_compaction(self):
+        name = self.check_mutations("HNSWFlat")
+        self.assertEqual(len(service.tombstones[name]), 5)
+
+        # Hold the rebuild until an upsert and a delete have landed on the old index
+        release = threading.Event()
+        rebuild = service.rebuild_index
+        service.rebuild_index = lambda *args: release.wait(10) and rebuild(*args)
+        try:
+            async def compact_during_writes():
+                compaction = asyncio.ensure_future(service.compact(name))
+                while name not in service.compactions:
+                    await asyncio.sleep(0.01)
+                await service.upsert_vectors(name, service.VectorData(vectors=[self.vectors[0].tolist()], ids=[0]))
+                await service.delete_vectors(name, service.VectorIds(ids=[30]))
+                # Searches are not blocked by the rebuild
+                found = await service.search(service.SearchQuery(index_name=name, query_vector=self.vectors[40].tolist(), k=3))
+                self.assertEqual(found["results"][0]["id"], 40)
+                release.set()
+                return await compaction
+
+            self.assertTrue(self.wait(compact_during_writes())["compacted"])
+        finally:
+            service.rebuild_index = rebuild
+
+        self.assertEqual(len(service.tombstones[name]), 1)
+        self.assertEqual(service.indexes[name].ntotal, 497)
+        self.assertEqual(self.nearest(name, self.vectors[0])[0]["id"], 0)
+        self.assertNotIn(30, [hit["id"] for hit in self.nearest(name, self.vectors[30])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+FAISS_SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service")
+
+try:
+    import faiss  # noqa: F401
+    import numpy as np
+except ImportError:
+    faiss = None
+
+BATCH = 50
+
+# Creates the index (or continues a recovered one) and adds batches of BATCH
+# vectors with consecutive ids and metadata, printing the acknowledged total
+# after each
+WRITER = textwrap.dedent(f"""
+    import numpy as np
+    from fastapi.testclient import TestClient
+    import faiss_service
+
+    with TestClient(faiss_service.app) as client:
+        client.post("/create_index", params={{"index_name": "crash", "dimension": 16}})
+        acked = faiss_service.index_metadata["crash"]["count"]
+        while True:
+            ids = np.arange(acked, acked + {BATCH}, dtype="<i8")
+            vectors = np.random.random(({BATCH}, 16)).astype("<f4")
+            metadata = "\\n".join('{{"n": %d}}' % i for i in ids.tolist())
+            response = client.post("/add_vectors_binary", params={{"index_name": "crash"}}, files={{
+                "vectors": ("vectors.f32", vectors.tobytes()),
+                "ids": ("ids.i64", ids.tobytes()),
+                "metadata": ("metadata.ndjson", metadata.encode()),
+            }})
+            assert response.status_code == 200, response.text
+            acked += {BATCH}
+            print("acked", acked, flush=True)
+""")
+
+# Starts the service on the same directory and reports what it recovered
+READER = textwrap.dedent("""
+    import json
+    import faiss
+    from fastapi.testclient import TestClient
+    import faiss_service
+
+    with TestClient(faiss_service.app) as client:
+        # Indexes load on first use
+        client.post("/search", json={"index_name": "crash", "query_vector": [0.0] * 16})
+        index = faiss_service.indexes["crash"]
+        ids = faiss.vector_to_array(index.id_map).tolist()
+        metadata = faiss_service.metadata_stores["crash"].get_many(ids)
+        print(json.dumps({
+            "ntotal": index.ntotal,
+            "count": faiss_service.index_metadata["crash"]["count"],
+            "ids": ids,
+            "metadata_ok": all(metadata.get(i) == {"n": i} for i in ids),
+        }))
+""")
+
+
+@unittest.skipIf(faiss is None, "faiss-cpu is not installed")
+class TestFaissPersistence(unittest.TestCase):
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp(prefix="faiss-test-")
+        self.env = {
+            **os.environ,
+            "PYTHONPATH": FAISS_SERVICE_DIR,
+            "FAISS_INDEX_DIR": self.index_dir,
+            "FAISS_PERSISTENCE_MODE": "wal",
+            # Snapshot constantly so the kill also lands mid-snapshot
+            "FAISS_SNAPSHOT_INTERVAL_S": "0.01",
+            "FAISS_WAL_MAX_BYTES": "16384",
+        }
+
+    def _run(self, script: str) -> str:
+        result = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", script],
+            env=self.env, capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.strip().splitlines()[-1]
+
+    def test_kill_during_ingest(self):
+        """Acknowledged batches survive a SIGKILL, including after a recovery"""
+        for target in (BATCH * 5, BATCH * 40):
+            writer = subprocess.Popen(
+                [sys.executable, "-W", "ignore", "-c", WRITER],
+                env=self.env, stdout=subprocess.PIPE, text=True
+            )
+            acked = 0
+            for line in writer.stdout:
+                if not line.startswith("acked"):
+                    continue
+                acked = int(line.split()[1])
+                if acked >= target:
+                    break
+            writer.send_signal(signal.SIGKILL)
+            writer.wait()
+
+            recovered = json.loads(self._run(READER))
+            self.assertGreaterEqual(recovered["ntotal"], acked)
+            self.assertEqual(recovered["ntotal"], recovered["count"])
+            self.assertEqual(recovered["ntotal"] % BATCH, 0)
+            self.assertEqual(recovered["ids"], list(range(recovered["ntotal"])))
+            self.assertTrue(recovered["metadata_ok"])
+
+    def test_deferred_training_is_replayed(self):
+        """An index trained after its last snapshot is trained again from the WAL"""
+        script = textwrap.dedent("""
+            import json, os
+            import numpy as np
+            from fastapi.testclient import TestClient
+            import faiss_service
+
+            vectors = np.random.default_rng(0).random((1200, 16), dtype="<f4")
+            client = TestClient(faiss_service.app)
+            client.__enter__()
+            if "MODE" == "write":
+                client.post("/create_index", params={
+                    "index_name": "sq", "dimension": 16, "index_type": "IVFSQ8", "nlist": 8, "train_size": 500
+                })
+                for start in range(0, 1200, 300):
+                    client.post("/add_vectors_binary", params={"index_name": "sq"},
+                                files={"vectors": ("vectors.f32", vectors[start:start + 300].tobytes())})
+            response = client.post("/search_batch", json={
+                "index_name": "sq", "query_vectors": vectors[:20].tolist(), "k": 5, "nprobe": 2
+            })
+            listed = client.get("/list_indexes").json()["indexes"][0]
+            print(json.dumps({"results": response.json()["results"], "trained": listed["trained"]}))
+            # Exit without the shutdown snapshot
+            os._exit(0)
+        """)
+        self.env.update(FAISS_SNAPSHOT_INTERVAL_S="3600", FAISS_WAL_MAX_BYTES=str(2 ** 30))
+        before = json.loads(self._run(script.replace("MODE", "write")))
+        after = json.loads(self._run(script.replace("MODE", "read")))
+        self.assertTrue(before["trained"])
+        self.assertTrue(after["trained"])
+        self.assertEqual(after["results"], before["results"])
+
+    def test_torn_wal_tail_is_truncated(self):
+        """A partially written WAL frame is cut off on replay"""
+        sys.path.insert(0, FAISS_SERVICE_DIR)
+        from wal import WriteAheadLog
+
+        wal = WriteAheadLog(self.index_dir, "torn", fsync=False)
+        for start in (0, 10, 20):
+            wal.append(np.arange(start, start + 10), np.random.random((10, 4)), [{"n": start}] * 10)
+        wal.close()
+        segment = wal.segments()[-1]
+        with open(segment, "r+b") as f:
+            f.truncate(os.path.getsize(segment) - 7)
+
+        replayed = WriteAheadLog(self.index_dir, "torn")
+        records = list(replayed.replay())
+        self.assertEqual([record.lsn for record in records], [1, 2])
+        self.assertEqual(records[1].ids.tolist(), list(range(10, 20)))
+        self.assertEqual(records[1].metadata[0], {"n": 10})
+        self.assertEqual(replayed.append(np.arange(20, 30), np.random.random((10, 4))), 3)
+        replayed.close()
+        self.assertEqual([record.lsn for record in WriteAheadLog(self.index_dir, "torn").replay()], [1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
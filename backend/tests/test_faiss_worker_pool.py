@@ -0,0 +1,59 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_service"))
+
+from worker_pool import RWLock, WorkerPool  # noqa: E402
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_readers_share_and_writers_exclude(self):
+        """Readers overlap; a writer waits for them and holds back new readers"""
+        async def scenario():
+            lock = RWLock()
+            events = []
+
+            async def reader(name, hold):
+                async with lock.read():
+                    events.append(f"{name} in")
+                    await asyncio.sleep(hold)
+                    events.append(f"{name} out")
+
+            async def writer():
+                async with lock.write():
+                    events.append("writer in")
+                    await asyncio.sleep(0.01)
+                    events.append("writer out")
+
+            first = asyncio.create_task(reader("r1", 0.05))
+            second = asyncio.create_task(reader("r2", 0.05))
+            await asyncio.sleep(0.01)
+            write = asyncio.create_task(writer())
+            await asyncio.sleep(0.01)
+            late = asyncio.create_task(reader("r3", 0))
+            await asyncio.gather(first, second, write, late)
+            return events
+
+        events = asyncio.run(scenario())
+        self.assertEqual(events[:2], ["r1 in", "r2 in"])
+        self.assertEqual(events[4:], ["writer in", "writer out", "r3 in", "r3 out"])
+
+    def test_runs_off_the_event_loop_and_reports(self):
+        async def scenario():
+            pool = WorkerPool(2)
+            thread = await pool.run("search", threading.get_ident)
+            await asyncio.gather(*(pool.run("add", sum, [1, 2]) for _ in range(3)))
+            return thread, pool.report()
+
+        thread, report = asyncio.run(scenario())
+        self.assertNotEqual(thread, threading.get_ident())
+        self.assertEqual(report["search"]["calls"], 1)
+        self.assertEqual(report["add"]["calls"], 3)
+        self.assertGreaterEqual(report["add"]["queue_wait_ms_max"], report["add"]["queue_wait_ms_mean"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+# The backend package reads these at import time; nothing is contacted
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("REDIS_URI", "redis://localhost:6379")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.inverted_index import (
+    InvertedIndex, analyze, load_snapshot, merge_segments, parse_query, search_segments, tokenize, write_snapshot
+)
+
+WORDS = [f"w{i}" for i in range(40)]
+TAGS = ["a", "b", "c"]
+
+
+class TestInvertedIndex(unittest.TestCase):
+    """Search results checked against a brute-force scan, across refreshes, merges and snapshots"""
+
+    def setUp(self):
+        self.rng = random.Random(0)
+        self.documents = {}
+        self.index = InvertedIndex(max_segments=3, merge_factor=2)
+        for document_id in range(300):
+            self.put(document_id, 1)
+            if document_id % 37 == 0:
+                self.index.refresh()
+                self.index.merge()
+        for document_id in range(0, 300, 7):
+            self.put(document_id, 2)
+        for document_id in range(0, 300, 11):
+            self.index.delete(document_id)
+            self.documents.pop(document_id, None)
+            if document_id % 3 == 0:
+                self.index.refresh()
+                self.index.merge()
+
+    def put(self, document_id: int, version: int):
+        title = " ".join(self.rng.choices(WORDS, k=3))
+        content = " ".join(self.rng.choices(WORDS, k=30))
+        tags = self.rng.sample(TAGS, self.rng.randint(0, 2))
+        self.documents[document_id] = (title, content, tags)
+        self.index.add(analyze(document_id, version, title, content, tags))
+
+    def expected(self, phrase, tags):
+        matches = set()
+        for document_id, (title, content, document_tags) in self.documents.items():
+            if not all(tag in document_tags for tag in tags):
+                continue
+            for field in (title, " ".join(document_tags), content):
+                tokens = tokenize(field)
+                if any(tokens[i:i + len(phrase)] == phrase for i in range(len(tokens))):
+                    matches.add(document_id)
+                    break
+        return matches
+
+    def test_phrases_and_tags_match_brute_force(self):
+        for _ in range(200):
+            phrase = self.rng.sample(WORDS, 2)
+            tags = self.rng.sample(TAGS, self.rng.randint(0, 1))
+            hits, total, _ = self.index.search(phrase, [phrase], tags, 1000)
+            expected = self.expected(phrase, tags)
+            self.assertEqual({document_id for document_id, _ in hits}, expected)
+            self.assertEqual(total, len(expected))
+
+    def test_terms_and_facets(self):
+        hits, total, facets = self.index.search(["w1"], [], [], 1000, facet_limit=10)
+        expected = {
+            document_id for document_id, (title, content, _) in self.documents.items()
+            if "w1" in tokenize(f"{title} {content}")
+        }
+        self.assertEqual({document_id for document_id, _ in hits}, expected)
+        counts = {}
+        for document_id in expected:
+            for tag in self.documents[document_id][2]:
+                counts[tag] = counts.get(tag, 0) + 1
+        self.assertEqual(facets, counts)
+        self.assertEqual(self.index.documents, len(self.documents))
+
+    def test_older_versions_are_ignored(self):
+        self.assertFalse(self.index.add(analyze(1, 1, "stale", "stale", [])))
+        self.assertEqual(self.index.search(["stale"], [], [], 10)[1], 0)
+
+    def test_merge_keeps_ranking(self):
+        before = self.index.search(["w3", "w4"], [], [], 20)[0]
+        self.index.max_segments, self.index.merge_factor = 0, 100
+        self.assertTrue(self.index.merge())
+        self.assertEqual(len(self.index.segments), 1)
+        after = self.index.search(["w3", "w4"], [], [], 20)[0]
+        self.assertEqual([hit[0] for hit in before], [hit[0] for hit in after])
+        for (_, score_before), (_, score_after) in zip(before, after):
+            self.assertAlmostEqual(score_before, score_after, places=4)
+
+    def test_merges_in_flight_overlap(self):
+        first = self.index.merge_candidates() or sorted(self.index.segments, key=len)[:2]
+        lives = self.index.begin_merge(first)
+        for document_id in range(300, 320):
+            self.put(document_id, 1)
+            self.index.refresh()
+        # Deleted while the first merge is in flight
+        gone = int(first[0].doc_ids[first[0].live][0])
+        self.index.delete(gone)
+        del self.documents[gone]
+        second = self.index.merge_candidates()
+        self.assertTrue(second)
+        self.assertFalse({id(segment) for segment in first} & {id(segment) for segment in second})
+        self.assertTrue(self.index.merge())
+        self.index.finish_merge(first, lives, merge_segments(first, lives))
+        self.assertEqual(self.index.merging, [])
+        for phrase in (["w1", "w2"], ["w5", "w7"]):
+            hits, _, _ = self.index.search(phrase, [phrase], [], 1000)
+            self.assertEqual({document_id for document_id, _ in hits}, self.expected(phrase, []))
+
+    def test_search_over_fixed_view(self):
+        """A view taken before writes and merges keeps answering as of when it was taken"""
+        queries = [(["w3", "w4"], [], ["a"], 50, 5), (["w1", "w2"], [["w1", "w2"]], [], 50, 5)]
+        state = self.index.snapshot_state()
+        documents, total_length = self.index.documents, self.index.total_length
+        before = [self.index.search(*query) for query in queries]
+        self.assertTrue(all(hits for hits, _, _ in before))
+        for document_id in range(0, 300, 2):
+            self.index.delete(document_id)
+        self.index.max_segments, self.index.merge_factor = 0, 100
+        self.index.merge()
+        after = [search_segments(state, documents, total_length, *query) for query in queries]
+        self.assertEqual(after, before)
+
+    def test_snapshot_round_trip(self):
+        directory = tempfile.mkdtemp(prefix="search-index-test-")
+        self.addCleanup(shutil.rmtree, directory, True)
+        write_snapshot(directory, self.index.snapshot_state())
+        loaded = InvertedIndex(3, 2, load_snapshot(directory))
+        self.assertEqual(loaded.documents, self.index.documents)
+        self.assertEqual(loaded.search(["w3", "w4"], [], ["a"], 20, 5), self.index.search(["w3", "w4"], [], ["a"], 20, 5))
+
+        # Files of merged-away segments are removed by the next snapshot
+        self.index.max_segments, self.index.merge_factor = 0, 100
+        self.index.merge()
+        write_snapshot(directory, self.index.snapshot_state())
+        self.assertEqual(len(os.listdir(directory)), 3)
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query('Red "big  Kite" hill'), (["red", "hill", "big", "kite"], [["big", "kite"]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import random
+import sys
+import unittest
+
+# The backend package reads these at import time; nothing is contacted
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("REDIS_URI", "redis://localhost:6379")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.text_delta import (
+    apply_delta, compose_delta, compute_delta, delta_length, delta_to_patch, patch_to_delta, transform_delta
+)
+
+
+class TestTextDelta(unittest.TestCase):
+    """Transform, compose and patch conversion checked on random edits of random texts"""
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def text(self):
+        return "".join(self.rng.choice("ab \n") for _ in range(self.rng.randint(0, 20)))
+
+    def edit(self, text):
+        """A random delta against `text`"""
+        patch = []
+        position = 0
+        while position < len(text) and self.rng.random() < 0.7:
+            position += self.rng.randint(0, len(text) - position)
+            if self.rng.random() < 0.5:
+                patch.append(("insert", position, self.rng.choice(["x", "yz", "\n"])))
+            elif position < len(text):
+                length = self.rng.randint(1, len(text) - position)
+                patch.append(("delete", position, length))
+                position += length
+        return patch_to_delta(len(text), patch)
+
+    def test_transform_converges(self):
+        for _ in range(2000):
+            text = self.text()
+            a, b = self.edit(text), self.edit(text)
+            a_prime, b_prime = transform_delta(a, b)
+            self.assertEqual(apply_delta(apply_delta(text, a), b_prime), apply_delta(apply_delta(text, b), a_prime))
+
+    def test_transform_orders_inserts_at_one_position(self):
+        a, b = patch_to_delta(2, [("insert", 1, "A")]), patch_to_delta(2, [("insert", 1, "B")])
+        a_prime, b_prime = transform_delta(a, b)
+        self.assertEqual(apply_delta(apply_delta("xy", a), b_prime), "xABy")
+        self.assertEqual(apply_delta(apply_delta("xy", b), a_prime), "xABy")
+
+    def test_compose(self):
+        for _ in range(2000):
+            text = self.text()
+            a = self.edit(text)
+            middle = apply_delta(text, a)
+            b = self.edit(middle)
+            composed = compose_delta(a, b)
+            self.assertEqual(apply_delta(text, composed), apply_delta(middle, b))
+            self.assertEqual(delta_length(composed), (len(text), len(apply_delta(middle, b))))
+
+    def test_patch_round_trip(self):
+        for _ in range(2000):
+            text = self.text()
+            delta = self.edit(text)
+            self.assertEqual(apply_delta(text, patch_to_delta(len(text), delta_to_patch(delta))), apply_delta(text, delta))
+
+    def test_exact_delta(self):
+        for _ in range(2000):
+            old, new = self.text(), self.text()
+            self.assertEqual(apply_delta(old, compute_delta(old, new, exact=True)), new)
+        self.assertEqual(compute_delta("a test\n", "a short test\n", exact=True), [["=", 2], ["+", "short "], ["=", 5]])
+
+
+if __name__ == "__main__":
+    unittest.main()